@@ -29,6 +29,7 @@ BPMN Package - Activities
 from Core.Foundation.models import BaseElement
 from Core.Common.models import FlowNode, FlowElementsContainer
 from Core.Common.fonctions import residual_args
+from Core.Common.ErrorModels import ModelError
 
 class Activity(FlowNode):
     '''
@@ -99,16 +100,17 @@ class Activity(FlowNode):
         self.properties = kwargs.pop('properties', [])
         self.boundaryEventRefs = kwargs.pop('boundaryEventRefs',[])
         self.dataInputAssociations = kwargs.pop('dataInputAssociations', [])
+        self.dataOutputAssociations = kwargs.pop('dataOutputAssociations', [])
         start_quantity = kwargs.pop('startQuantity', 1)
         if start_quantity >= 1:
             self.startQuantity = int(start_quantity)
         else:
-            raise Exception # à préciser
+            raise ModelError('startQuantity of %s must not be less than 1'%id)
         completion_quantity = kwargs.pop('completionQuantity', 1)
         if completion_quantity >=1:
             self.completionQuantity = int(completion_quantity)
         else:
-            raise Exception # à préciser
+            raise ModelError('completionQuantity of %s must not be less than 1'%id)
             
         if self.__class__.__name__ == 'Activity':
             residual_args(self.__init__, **kwargs)
@@ -169,7 +171,7 @@ class SendTask(Task):
         self.implementation = implementation
         self.messageRef = kwargs.pop('messageRef', None)
         #Send Task conditions to ba add
-        if self.__calss__.__name__=='SendTask':
+        if self.__class__.__name__=='SendTask':
             residual_args(self.__init__, **kwargs)
         
 class ReceiveTask(Task):
@@ -208,7 +210,7 @@ class ReceiveTask(Task):
         self.instantiate = kwargs.pop('instantiate', False)
         #ReceiveTask conditions to ba add
         if self.__class__.__name__=='ReceiveTask':
-            residual_args(slf.__init__, **kwargs)
+            residual_args(self.__init__, **kwargs)
             
 class BusinessRuleTask(Task):
     '''
@@ -255,30 +257,22 @@ class ScriptTask(Task):
             
 class CallActivity(Activity):
     '''
+    A Call Activity identifies a point in the Process where a global Process or a Global Task is used.
+    The Call Activity acts as a "wrapper" for the invocation of a global Process or Global Task within the execution.
     '''
     def __init__(self, id, **kwargs):
         '''
-        calledElementRef:???
+        calledElementRef:CallableElement
+            The element to be called, which will be either a Process or a GlobalTask.
+            Other CallableElements, such as Choreography, GlobalChoreographyTask, Conversation,
+            and GlobalCommunication MUST NOT be called by the Call Activity.
         '''
         super(CallActivity, self).__init__(id, **kwargs)
-        self.calledElementRef = kwargs.pop('calledElementRef', None) #?
+        self.calledElementRef = kwargs.pop('calledElementRef', None)
         
         if self.__class__.__name__=='CallActivity':
             residual_args(self.__init__, **kwargs)
         
-class SubProcess(Activity, FlowElementsContainer):
-    '''
-    '''
-    def __init__(self, id, **kwargs):
-        '''
-        triggeredByEvent:bool (default=False)
-        '''
-        super(SubProcess, self).__init__(id, **kwargs) #comment ça se comporte en cas d'heritage multiple
-        self.triggeredByEvent = kwargs.pop('triggeredByEvent', False)
-        
-        if self.__class__.__name__=='SubProcess':
-            residual_args(self.__init__, **kwarg)
-
 class ResourceRole(BaseElement):
     '''
     '''
@@ -298,7 +292,7 @@ class ResourceRole(BaseElement):
         '''
         super(ResourceRole, self).__init__(id, **kwargs)
         if kwargs.has_key('resourceRef') and kwargs.has_key('resourceAssignmentExpression'):
-            raise Exception # à préciser
+            raise ModelError('resourceRef and resourceAssignmentExpression of %s are exclusive'%id)
         self.resourceRef = kwargs.pop('resourceRef', None)
         self.resourceAssignmentExpression = kwargs.pop('resourceAssignmentExpression', None)
         self.resourceParameterBindings = kwargs.pop('resourceParameterBindings', [])
@@ -340,8 +334,43 @@ class ResourceParameterBindings(BaseElement):
             residual_args(self.__init__, **kwargs)
 
 
+#Loop characteristics
+class LoopCharacteristics(BaseElement):
+    '''
+    Activities MAY be repeated sequentially, essentially behaving like a loop.
+    The presence of LoopCharacteristics signifies that the Activity has looping behavior.
+    LoopCharacteristics is an abstract class.
+    '''
+    pass
+    
+class MultiInstanceLoopCharacteristics(LoopCharacteristics):
+    '''
+    The multi-instance (MI) characteristic allows for creation of a desired number of Activity instances.
+    The instances MAY execute in parallel or MAY be sequential.
+    '''
+    def __init__(self, id, isSequential=False, **kwargs):
+        '''
+        isSequential:bool (default=False)
+            This attribute is a flag that controls whether the Activity instances will execute sequentially or in parallel.
+            
+        loopCardinality:Expression
+            A numeric Expression that controls the number of Activity instances that will be created.
+            
+        completionCondition:Expression
+            This attribute defines a Boolean Expression that when evaluated to true, cancels the remaining Activity instances
+            and produces a token.
+        '''
+        super(MultiInstanceLoopCharacteristics, self).__init__(id, **kwargs)
+        self.isSequential = isSequential
+        self.loopCardinality = kwargs.pop('loopCardinality', None)
+        self.completionCondition = kwargs.pop('completionCondition', None)
+        
+        if self.__class__.__name__=='MultiInstanceLoopCharacteristics':
+            residual_args(self.__init__, **kwargs)
+            
+            
 #Sub-process
-class SubProcess(Activitiy, FlowElementsContainer):
+class SubProcess(Activity, FlowElementsContainer):
     '''
     '''
     def __init__(self, id, **kwargs):
@@ -361,7 +390,6 @@ class SubProcess(Activitiy, FlowElementsContainer):
         if self.__class__.__name__=='SubProcess':
             residual_args(self.__init__, **kwargs)
     
-class 
 #LoopCharacteristics
 #StandardLoopCharacteristics
 #MultiInstanceLoopCharaceristics
@@ -33,11 +33,12 @@ Collaboration. When a Collaboration is defined it is contained in Definitions.
 
 from Core.Foundation.models import BaseElement, RootElement
 from Core.Common.fonctions import residual_args
+from Core.Common.ErrorModels import ModelError
 
 class Collaboration(RootElement):
     '''
     '''
-    def __init__(self, id, name, isClosed=False, **kwarg):
+    def __init__(self, id, name, isClosed=False, **kwargs):
         '''
         name:str
             Name is a text description of the Collaboration.
@@ -107,7 +108,7 @@ class Collaboration(RootElement):
         self.participants = kwargs.pop('participants',[])
         self.participantAssociations = kwargs.pop('participantAssociations',[])
         self.messageFlow = kwargs.pop('messageFlow',[])
-        self.messageFlowAssociations = kwargs.pop('messageFlowAssociations:',[])
+        self.messageFlowAssociations = kwargs.pop('messageFlowAssociations',[])
         
         if self.__class__.__name__=='Collaboration':
             residual_args(self.__init__, **kwargs)
@@ -189,10 +190,10 @@ class ParticipantMultiplicity(object):
             The value of maximum MUST be one or greater, AND MUST be equal or greater than the minimum value.
         '''
         self.minimum = minimum
-        if (maximum is None) or (maximum>minimum and maximum>0):
+        if (maximum is None) or (maximum>=minimum and maximum>0):
             self.maximum = maximum
         else:
-            raise Exception # to precise
+            raise ModelError('maximum of ParticipantMultiplicity must be greater or equal to minimum and greater than 0')
         
         # instance attribute default value
         self.numParticipants = None
@@ -242,7 +243,7 @@ class MessageFlow(BaseElement):
         self.name = name
         self.sourceRef = sourceRef
         self.targetRef = targetRef
-        self.messageRef = kwargs.pop('messagRef', None)
+        self.messageRef = kwargs.pop('messageRef', None)
         
         if self.__class__.__name__=='MessageFlow':
             residual_args(self.__init__, **kwargs)
@@ -75,6 +75,9 @@ class SubConversation(ConversationNode):
         '''
         super(SubConversation, self).__init__(id, participantRefs, **kwargs)
         self.conversationNodes = kwargs.pop('conversationNodes',[])
+        
+        if self.__class__.__name__=='SubConversation':
+            residual_args(self.__init__, **kwargs)
 
 class CallConversation(ConversationNode):
     '''
@@ -91,7 +94,8 @@ class CallConversation(ConversationNode):
 
         //Note - The ConversationNode attribute messageFlowRef doesn't apply to Call Conversations.
         '''
-        super(CallConversation, self).__init__(id, participantRefs, messageFlowRef=[], **kwargs)
+        kwargs.pop('messageFlowRefs', None)
+        super(CallConversation, self).__init__(id, participantRefs, messageFlowRefs=[], **kwargs)
         self.calledCollaborationRef = kwargs.pop('calledCollaborationRef', None)
         self.participantAssociations = kwargs.pop('participantAssociations', [])
         
@@ -128,7 +132,7 @@ class ConversationLink(BaseElement):
         name:str
             This attribute specifies the name of the Conversation Link.        
         '''
-        super(ConvesationNode, self).__init__(id, **kwargs)
+        super(ConversationLink, self).__init__(id, **kwargs)
         self.sourceRef = sourceRef
         self.targetRef = targetRef
         self.name = kwargs.pop('name', None)
@@ -28,10 +28,81 @@ Core BPMN Package - Common
 Exceptions definition
 '''
 
-from Foundation.models import RootElement, BaseElement
-from fonctions import residual_args
-
-
 ##########################################################
 # Exception
 
+class BPMNException(Exception):
+    '''
+    Base class of all the exceptions raised by pyBPMN20engine.
+    '''
+    pass
+    
+class ModelError(BPMNException):
+    '''
+    Raised when a BPMN element is built with attribute values forbidden by the specification.
+    '''
+    pass
+    
+class EngineError(BPMNException):
+    '''
+    Raised when the engine cannot execute a model or an instance operation.
+    '''
+    pass
+    
+class TaskConflict(EngineError):
+    '''
+    Raised when a human task operation is based on a stale version of the task, or is not allowed in its current state.
+    '''
+    pass
+    
+class ThrownError(BPMNException):
+    '''
+    Raised by an activity implementation (script, service...) to throw a BPMN Error.
+    The engine propagates it to the nearest boundary Event or Event Sub-Process catching it.
+    '''
+    def __init__(self, error, variables=None):
+        '''
+        error:Error|str
+            The thrown Error, or its errorCode.
+            
+        variables:dict
+            Payload of the Error, set in the scope of the handler.
+        '''
+        super(ThrownError, self).__init__(getattr(error, 'errorCode', error))
+        self.code = getattr(error, 'errorCode', error)
+        self.error = error
+        self.variables = variables
+        
+class ThrownEscalation(BPMNException):
+    '''
+    Raised by an activity implementation to throw a BPMN Escalation.
+    '''
+    def __init__(self, escalation, variables=None):
+        '''
+        escalation:Escalation|str
+            The thrown Escalation, or its escalationCode.
+            
+        variables:dict
+            Payload of the Escalation, set in the scope of the handler.
+        '''
+        super(ThrownEscalation, self).__init__(getattr(escalation, 'escalationCode', escalation))
+        self.code = getattr(escalation, 'escalationCode', escalation)
+        self.escalation = escalation
+        self.variables = variables
+        
+class ServiceFault(BPMNException):
+    '''
+    Raised by a service adapter when an Operation answers with a fault.
+    The invocation layer turns it into the ThrownError of the matching errorRef of the Operation.
+    '''
+    def __init__(self, code, variables=None):
+        '''
+        code:str
+            errorCode of the fault.
+            
+        variables:dict
+            Content of the fault.
+        '''
+        super(ServiceFault, self).__init__(code)
+        self.code = code
+        self.variables = variables
@@ -28,6 +28,7 @@ Core BPMN Package - Common
 
 from Core.Foundation.models import RootElement, BaseElement
 from Core.Common.fonctions import residual_args
+from Core.Common.ErrorModels import ModelError
 
 
 ##########################################################
@@ -68,7 +69,7 @@ class Association(Artifact):
         if associationDirection in AssociationDirection:
             self.associationDirection = associationDirection
         else:
-            raise Exception #to be precised
+            raise ModelError('associationDirection %s is not an AssociationDirection'%associationDirection)
         
         if self.__class__.__name__=='Association':
             residual_args(self.__init__, **kwargs)
@@ -108,7 +109,7 @@ class Category(RootElement):
         self.categoryValue = kwargs.pop('categoryValue',[])
         
         if self.__class__.__name__=='Category':
-            residual_args(self.__init__, **kwags)
+            residual_args(self.__init__, **kwargs)
         
 class CategoryValue(BaseElement):
     '''
@@ -316,6 +317,7 @@ class Escalation(RootElement):
         structureRef:ItemDefinition
             An ItemDefinition is used to define the "payload" of the Escalation.
         '''
+        super(Escalation,self).__init__(id, **kwargs)
         self.name = name
         self.escalationCode = escalationCode
         self.structureRef = kwargs.pop('structureRef', None)
@@ -362,7 +364,7 @@ class FormalExpression(Expression):
             Overrides the Expression language specified in the Definitions.
             The language MUST be specified in a URI format.
         '''
-        super(FormalExpression,self).__init__(self, id, **kwargs)
+        super(FormalExpression,self).__init__(id, **kwargs)
         self.body = body
         self.evaluatesToTypeRef = evaluatesToTypeRef
         self.language = kwargs.pop('language', None)
@@ -387,6 +389,47 @@ class FormalExpression(Expression):
 ##########################################################
 # Flows
 
+class Auditing(BaseElement):
+    '''
+    Auditing is a hook for specifying audit related properties of a Process or of a FlowElement.
+    The engine writes an audit record of each transition of the audited elements to a sink (see Engine.auditing).
+    '''
+    def __init__(self, id, sink='audit', **kwargs):
+        '''
+        sink:str (default='audit')
+            Name of the sink receiving the audit records.
+            
+        transitions:str list
+            The transitions recorded (None for all of them) :
+            'entered', 'completed', 'cancelled' for a FlowNode, 'started', 'completed', 'failed', 'terminated' for a Process.
+        '''
+        super(Auditing, self).__init__(id, **kwargs)
+        self.sink = sink
+        self.transitions = kwargs.pop('transitions', None)
+        
+        if self.__class__.__name__=='Auditing':
+            residual_args(self.__init__, **kwargs)
+            
+class Monitoring(BaseElement):
+    '''
+    Monitoring is a hook for specifying monitoring related properties of a Process or of a FlowElement.
+    The engine sends a monitoring event of each transition of the monitored elements to a sink (see Engine.auditing).
+    '''
+    def __init__(self, id, sink='monitoring', **kwargs):
+        '''
+        sink:str (default='monitoring')
+            Name of the sink receiving the monitoring events.
+            
+        transitions:str list
+            The transitions sent (None for all of them), as for Auditing.
+        '''
+        super(Monitoring, self).__init__(id, **kwargs)
+        self.sink = sink
+        self.transitions = kwargs.pop('transitions', None)
+        
+        if self.__class__.__name__=='Monitoring':
+            residual_args(self.__init__, **kwargs)
+            
 class FlowElement(BaseElement):
     '''
     FlowElement is the abstract super class for all elements that can appear in a Process flow, which are FlowNodes.
@@ -401,11 +444,11 @@ class FlowElement(BaseElement):
 
         auditing:Auditing
             A hook for specifying audit related properties.
-            Auditing can only be defined for a Process.
+            When None, the Auditing of the enclosing Process (or Sub-Process) applies.
         
         monitoring:Monitoring
             A hook for specifying monitoring related properties.
-            Monitoring can only be defined for a Process.
+            When None, the Monitoring of the enclosing Process (or Sub-Process) applies.
         '''
         super(FlowElement, self).__init__(id, **kwargs)
         self.name = kwargs.pop('name', None)
@@ -441,30 +484,6 @@ class FlowElementsContainer(BaseElement):
         if self.__class__.__name__=='FlowElementsContainer':
             residual_args(self.__init__, **kwargs) 
 
-GatewayDirection = ['Unspecified','Converging','Diverging','Mixed']
-            
-class Gateway(FlowElement):
-    '''
-    The Gateway class is an abstract type.
-    Its concrete subclasses define the specific semantics of individual Gateway types, defining how the Gateway behaves in different situations.
-    '''
-    def __init__(self, id, gatewayDirection='Unspecified', **kwargs):
-        '''
-        gatewayDirection:GatewayDirection enum (default='Unspecified') {'Unspecified'|'Converging'|'Diverging'|'Mixed'}
-            An attribute that adds constraints on how the Gateway MAY be used :
-                Unspecified: There are no constraints. The Gateway MAY have any number of incoming and outgoing Sequence Flows.
-                Converging: This Gateway MAY have multiple incoming Sequence Flows but MUST have no more than one outgoing Sequence Flow.
-                Diverging: This Gateway MAY have multiple outgoing Sequence Flows but MUST have no more than one incoming Sequence Flow.
-                Mixed: This Gateway contains multiple outgoing and multiple incoming Sequence Flows.
-        '''
-        super(Gateway,self).__init__(id, **kwargs)
-        if gatewayDirection in GatewayDirection:
-            self.gatewayDirection = gatewayDirection
-        else:
-            raise Exception #to be detailed
-        if self.__calss__.__name__=='Gateway':
-            residual_args(self.__init__, **kwargs)
-
 ##########################################################
 # Item Definition
 
@@ -498,7 +517,7 @@ class ItemDefinition(RootElement):
         if itemKind in ItemKind:
             self.itemKind = itemKind
         else:
-            raise Exception #tbd
+            raise ModelError('itemKind %s is not an ItemKind'%itemKind)
         self.isCollection = isCollection
         self.structureRef = kwargs.pop('structureRef',None)
         #self.import is not valid in python, use of import_ instead
@@ -649,6 +668,63 @@ class FlowNode(FlowElement): #once again inconsistency between figures and text
         if self.__class__.__name__=='FlowNode':
             residual_args(self.__init__, **kwargs)
             
+##########################################################
+# Gateways
+
+GatewayDirection = ['Unspecified','Converging','Diverging','Mixed']
+            
+class Gateway(FlowNode):
+    '''
+    The Gateway class is an abstract type.
+    Its concrete subclasses define the specific semantics of individual Gateway types, defining how the Gateway behaves in different situations.
+    '''
+    def __init__(self, id, gatewayDirection='Unspecified', **kwargs):
+        '''
+        gatewayDirection:GatewayDirection enum (default='Unspecified') {'Unspecified'|'Converging'|'Diverging'|'Mixed'}
+            An attribute that adds constraints on how the Gateway MAY be used :
+                Unspecified: There are no constraints. The Gateway MAY have any number of incoming and outgoing Sequence Flows.
+                Converging: This Gateway MAY have multiple incoming Sequence Flows but MUST have no more than one outgoing Sequence Flow.
+                Diverging: This Gateway MAY have multiple outgoing Sequence Flows but MUST have no more than one incoming Sequence Flow.
+                Mixed: This Gateway contains multiple outgoing and multiple incoming Sequence Flows.
+        '''
+        super(Gateway,self).__init__(id, **kwargs)
+        if gatewayDirection in GatewayDirection:
+            self.gatewayDirection = gatewayDirection
+        else:
+            raise ModelError('gatewayDirection %s is not a GatewayDirection'%gatewayDirection)
+        if self.__class__.__name__=='Gateway':
+            residual_args(self.__init__, **kwargs)
+            
+class ExclusiveGateway(Gateway):
+    '''
+    A diverging Exclusive Gateway (Decision) is used to create alternative paths within a Process flow.
+    This is basically the "diversion point in the road" for a Process. For a given instance of the Process, only one of the paths can be taken.
+    '''
+    def __init__(self, id, gatewayDirection='Unspecified', **kwargs):
+        '''
+        default:SequenceFlow
+            The Sequence Flow that will receive a token when none of the conditionExpressions on other outgoing Sequence Flows evaluate to True.
+            The default Sequence Flow should not have a conditionExpression. Any such Expression SHALL be ignored.
+        '''
+        super(ExclusiveGateway, self).__init__(id, gatewayDirection, **kwargs)
+        self.default = kwargs.pop('default', None)
+        
+        if self.__class__.__name__=='ExclusiveGateway':
+            residual_args(self.__init__, **kwargs)
+            
+class ParallelGateway(Gateway):
+    '''
+    A Parallel Gateway is used to synchronize (combine) parallel flows and to create parallel flows.
+    A Parallel Gateway creates parallel paths without checking any conditions; each outgoing Sequence Flow receives a token upon execution of this Gateway.
+    For incoming flows, the Parallel Gateway will wait for all incoming flows before triggering the flow through its outgoing Sequence Flows.
+    '''
+    def __init__(self, id, gatewayDirection='Unspecified', **kwargs):
+        '''
+        '''
+        super(ParallelGateway, self).__init__(id, gatewayDirection, **kwargs)
+        if self.__class__.__name__=='ParallelGateway':
+            residual_args(self.__init__, **kwargs)
+
 ##########################################################
 # Entities and Organisations
 
@@ -701,6 +777,234 @@ class PartnerRole(BaseElement):
 # affect the sequence or timing of Activities of a Process.
 
 
+class Event(FlowNode):
+    '''
+    The Event element inherits the attributes and model associations of FlowElement, but adds no additional attributes or model associations.
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        properties:Property list
+            Modeler-defined properties MAY be added to an Event.
+            These properties are contained within the Event.
+        '''
+        super(Event, self).__init__(id, **kwargs)
+        self.properties = kwargs.pop('properties', [])
+        
+        if self.__class__.__name__=='Event':
+            residual_args(self.__init__, **kwargs)
+            
+class CatchEvent(Event):
+    '''
+    Events that catch a trigger. All Start Events and some Intermediate Events are catching Events.
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        eventDefinitions:EventDefinition list
+            Defines the event EventDefinitions that are triggers expected for a catch Event.
+            If there is no EventDefinition defined, then this is considered a catch None Event and the Event will not have an internal marker.
+            If there is more than one EventDefinition defined, this is considered a Catch Multiple Event.
+            
+        eventDefinitionRefs:EventDefinition list
+            References the reusable EventDefinitions that are triggers expected for a catch Event.
+            
+        parallelMultiple:bool (default=False)
+            This attribute is only relevant when the catch Event has more than one EventDefinition (Multiple).
+            If this value is true, then all of the types of triggers that are listed in the catch Event MUST be triggered before the Event is triggered.
+        '''
+        super(CatchEvent, self).__init__(id, **kwargs)
+        self.eventDefinitions = kwargs.pop('eventDefinitions', [])
+        self.eventDefinitionRefs = kwargs.pop('eventDefinitionRefs', [])
+        self.parallelMultiple = kwargs.pop('parallelMultiple', False)
+        
+        if self.__class__.__name__=='CatchEvent':
+            residual_args(self.__init__, **kwargs)
+            
+class ThrowEvent(Event):
+    '''
+    Events that throw a Result. All End Events and some Intermediate Events are throwing Events.
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        eventDefinitions:EventDefinition list
+            Defines the event EventDefinitions that are results for a throw Event.
+            If there is no EventDefinition defined, then this is considered a throw None Event.
+            
+        eventDefinitionRefs:EventDefinition list
+            References the reusable EventDefinitions that are results for a throw Event.
+        '''
+        super(ThrowEvent, self).__init__(id, **kwargs)
+        self.eventDefinitions = kwargs.pop('eventDefinitions', [])
+        self.eventDefinitionRefs = kwargs.pop('eventDefinitionRefs', [])
+        
+        if self.__class__.__name__=='ThrowEvent':
+            residual_args(self.__init__, **kwargs)
+            
+class StartEvent(CatchEvent):
+    '''
+    The Start Event indicates where a particular Process or Choreography will start.
+    '''
+    def __init__(self, id, isInterrupting=True, **kwargs):
+        '''
+        isInterrupting:bool (default=True)
+            This attribute only applies to Start Events of Event Sub-Processes; it is ignored for other Start Events.
+            This attribute denotes whether the Sub-Process encompassing the Event Sub-Process should be cancelled or not.
+        '''
+        super(StartEvent, self).__init__(id, **kwargs)
+        self.isInterrupting = isInterrupting
+        
+        if self.__class__.__name__=='StartEvent':
+            residual_args(self.__init__, **kwargs)
+            
+class EndEvent(ThrowEvent):
+    '''
+    The End Event indicates where a Process will end.
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        '''
+        super(EndEvent, self).__init__(id, **kwargs)
+        if self.__class__.__name__=='EndEvent':
+            residual_args(self.__init__, **kwargs)
+            
+class IntermediateCatchEvent(CatchEvent):
+    '''
+    Intermediate Events occur between a Start Event and an End Event and wait for their trigger in the normal flow.
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        '''
+        super(IntermediateCatchEvent, self).__init__(id, **kwargs)
+        if self.__class__.__name__=='IntermediateCatchEvent':
+            residual_args(self.__init__, **kwargs)
+            
+class IntermediateThrowEvent(ThrowEvent):
+    '''
+    Intermediate Events occur between a Start Event and an End Event and throw their result in the normal flow.
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        '''
+        super(IntermediateThrowEvent, self).__init__(id, **kwargs)
+        if self.__class__.__name__=='IntermediateThrowEvent':
+            residual_args(self.__init__, **kwargs)
+            
+class BoundaryEvent(CatchEvent):
+    '''
+    Intermediate Events attached to the boundary of an Activity.
+    '''
+    def __init__(self, id, attachedToRef, cancelActivity=True, **kwargs):
+        '''
+        attachedToRef:Activity
+            Denotes the Activity that boundary Event is attached to.
+            
+        cancelActivity:bool (default=True)
+            Denotes whether the Activity should be cancelled or not, i.e., whether the boundary catch Event acts as an Error or an Escalation.
+            If the Activity is not cancelled, multiple instances of that handler can run concurrently.
+        '''
+        super(BoundaryEvent, self).__init__(id, **kwargs)
+        self.attachedToRef = attachedToRef
+        self.cancelActivity = cancelActivity
+        
+        if self.__class__.__name__=='BoundaryEvent':
+            residual_args(self.__init__, **kwargs)
+            
+class EventDefinition(RootElement):
+    '''
+    EventDefinition is the abstract super class for all the trigger or result definitions of Events.
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        '''
+        super(EventDefinition, self).__init__(id, **kwargs)
+        if self.__class__.__name__=='EventDefinition':
+            residual_args(self.__init__, **kwargs)
+            
+class MessageEventDefinition(EventDefinition):
+    '''
+    A Message Event waits for (catch) or sends (throw) a Message.
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        messageRef:Message
+            The Message MUST have the same ItemDefinition as the Event's DataOutput (catch) or DataInput (throw).
+            
+        operationRef:Operation
+            This attribute specifies the Operation that is used by the Message Event.
+        '''
+        super(MessageEventDefinition, self).__init__(id, **kwargs)
+        self.messageRef = kwargs.pop('messageRef', None)
+        self.operationRef = kwargs.pop('operationRef', None)
+        
+        if self.__class__.__name__=='MessageEventDefinition':
+            residual_args(self.__init__, **kwargs)
+            
+class ErrorEventDefinition(EventDefinition):
+    '''
+    An Error Event throws (End Event) or catches (Start Event of an Event Sub-Process, boundary Event) an Error.
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        errorRef:Error
+            If the trigger is an Error, then an Error payload MAY be provided.
+            A catching Error Event without errorRef catches any Error.
+        '''
+        super(ErrorEventDefinition, self).__init__(id, **kwargs)
+        self.errorRef = kwargs.pop('errorRef', None)
+        
+        if self.__class__.__name__=='ErrorEventDefinition':
+            residual_args(self.__init__, **kwargs)
+            
+class EscalationEventDefinition(EventDefinition):
+    '''
+    An Escalation Event throws or catches an Escalation.
+    Unlike an Error, an Escalation MAY be caught without interrupting the Activity it comes from.
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        escalationRef:Escalation
+            If the trigger is an Escalation, then an Escalation payload MAY be provided.
+            A catching Escalation Event without escalationRef catches any Escalation.
+        '''
+        super(EscalationEventDefinition, self).__init__(id, **kwargs)
+        self.escalationRef = kwargs.pop('escalationRef', None)
+        
+        if self.__class__.__name__=='EscalationEventDefinition':
+            residual_args(self.__init__, **kwargs)
+            
+class CompensateEventDefinition(EventDefinition):
+    '''
+    A Compensation Event triggers (throw) or handles (boundary Event) the compensation of completed Activities.
+    '''
+    def __init__(self, id, waitForCompletion=True, **kwargs):
+        '''
+        activityRef:Activity
+            For a Start Event: This Event "catches" the compensation for an Event Sub-Process. No further information is REQUIRED.
+            For an End Event: The Activity to be compensated MAY be supplied. If an Activity is not supplied, then the compensation is broadcast to all completed Activities in the current Sub-Process (if present), or the entire Process instance (if at the global level).
+            For an Intermediate Event within normal flow: The Activity to be compensated MAY be supplied. If an Activity is not supplied, then the compensation is broadcast to all completed Activities in the current Sub-Process (if present), or the entire Process instance (if at the global level).
+            For an Intermediate Event attached to the boundary of an Activity: This Event "catches" the compensation. No further information is REQUIRED.
+            
+        waitForCompletion:bool (default=True)
+            For a throw Compensation Event, this flag determines whether the throw Intermediate Event waits for the triggered compensation to complete (the default), or just triggers the compensation and immediately continues (the BPMN 1.2 behavior).
+        '''
+        super(CompensateEventDefinition, self).__init__(id, **kwargs)
+        self.activityRef = kwargs.pop('activityRef', None)
+        self.waitForCompletion = waitForCompletion
+        
+        if self.__class__.__name__=='CompensateEventDefinition':
+            residual_args(self.__init__, **kwargs)
+            
+class TerminateEventDefinition(EventDefinition):
+    '''
+    A Terminate End Event ends all the activities of the Process (or Sub-Process) containing it, without compensation or event handling.
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        '''
+        super(TerminateEventDefinition, self).__init__(id, **kwargs)
+        if self.__class__.__name__=='TerminateEventDefinition':
+            residual_args(self.__init__, **kwargs)
+            
+
 ##########################################################
 # TBD
 
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+Core BPMN Package - Foundation
+
+Extensions loading.
+
+When Definitions are built, the ExtensionAttributeDefinitions of their Extensions are compiled into an
+ExtensionAttributes class : one slot (an accessor descriptor) per attribute, so that every element stores the values of
+its extension attributes compactly and reads them in O(1) with element.extensionAttributes.get(name),
+instead of searching its extensionValues list.
+Extensions which mustUnderstand MUST be understood (see understand) or the Definitions are rejected.
+'''
+
+from Core.Foundation.models import BaseElement
+from Core.Common.ErrorModels import ModelError
+
+#ExtensionDefinition names understood by the loaded plugins
+Understood = set()
+
+#ExtensionAttributeDefinition type -> Python type of the values
+AttributeTypes = {'bool': bool, 'boolean': bool,
+                  'int': int, 'integer': int,
+                  'float': (int, long, float), 'double': (int, long, float), 'decimal': (int, long, float),
+                  'str': basestring, 'string': basestring}
+                  
+def understand(definition):
+    '''
+    Declare an ExtensionDefinition (or its name) understood, so that Extensions which mustUnderstand it can be loaded.
+    '''
+    Understood.add(getattr(definition, 'name', definition))
+    
+def elements(roots):
+    '''
+    Yield the BaseElements reachable from roots through their attributes, once each.
+    '''
+    seen = set()
+    stack = list(roots)
+    while stack:
+        element = stack.pop()
+        if id(element) in seen:
+            continue
+        seen.add(id(element))
+        yield element
+        for value in vars(element).values():
+            if isinstance(value, BaseElement):
+                stack.append(value)
+            elif isinstance(value, (list, tuple)):
+                stack.extend(item for item in value if isinstance(item, BaseElement))
+                
+class ExtensionAttributes(object):
+    '''
+    Base class of the compiled storage of the extension attribute values of an element.
+    Subclasses are built by ExtensionRegistry with one slot per ExtensionAttributeDefinition.
+    Slots are named after their position (x0, x1...) : attribute names need not be identifiers, may be the names of
+    methods, and may be defined by several ExtensionDefinitions. Values are read by name with get.
+    '''
+    __slots__ = ()
+    
+    #set on the subclasses : attribute name of each slot, and
+    #attribute name or (ExtensionDefinition name, attribute name) -> slots
+    names = ()
+    index = {}
+    
+    def __init__(self):
+        for slot in self.__slots__:
+            setattr(self, slot, None)
+            
+    def get(self, name, definition=None, default=None):
+        '''
+        Return the value of the extension attribute name (of the ExtensionDefinition named definition, if given), or default.
+        When several ExtensionDefinitions define name, the first one with a value gives it.
+        '''
+        for slot in self.index.get(name if definition is None else (definition, name), ()):
+            value = getattr(self, slot)
+            if value is not None:
+                return value
+        return default
+        
+    def items(self):
+        return [(name, getattr(self, slot)) for name, slot in zip(self.names, self.__slots__)]
+        
+    def __repr__(self):
+        return '<%s %r>'%(self.__class__.__name__, [(name, value) for name, value in self.items() if value is not None])
+        
+class ExtensionRegistry(object):
+    '''
+    Extension attributes of Definitions.
+    '''
+    def __init__(self, extensions, roots):
+        '''
+        extensions:Extension list
+            The Extensions bound by the Definitions.
+            
+        roots:BaseElement list
+            The root elements of the Definitions : their extensionValues and the ones of the elements they contain are compiled.
+            
+        attributes:ExtensionAttributeDefinition list
+            The attribute of each slot.
+            
+        slots:dict
+            id of an ExtensionAttributeDefinition -> its slot name.
+            
+        attributes_class:class
+            ExtensionAttributes subclass with a slot per attribute.
+            
+        empty:ExtensionAttributes
+            Shared by the elements without extension values.
+        '''
+        super(ExtensionRegistry, self).__init__()
+        self.attributes = []
+        self.slots = {}
+        index = {}
+        for extension in extensions:
+            definition = extension.definition
+            if definition is None:
+                continue
+            if extension.mustUnderstand and definition.name not in Understood:
+                raise ModelError('Extension %s must be understood'%definition.name)
+            for attribute in definition.extensionAttributeDefinitions:
+                self._declare(attribute, definition, index)
+        found = [element for element in elements(roots) if element.extensionDefinitions or element.extensionValues]
+        for element in found:
+            for definition in element.extensionDefinitions:
+                for attribute in definition.extensionAttributeDefinitions:
+                    self._declare(attribute, definition, index)
+            for value in element.extensionValues:
+                self._declare(value.extensionAttributeDefinition, None, index)
+        self.attributes_class = type('ExtensionAttributes', (ExtensionAttributes,),
+                                     {'__slots__': tuple('x%d'%slot for slot in range(len(self.attributes))),
+                                      'names': tuple(attribute.name for attribute in self.attributes),
+                                      'index': dict((key, tuple(slots)) for key, slots in index.items())})
+        self.empty = self.attributes_class()
+        for element in elements(roots):
+            element.extensionAttributes = self.empty
+        for element in found:
+            element.extensionAttributes = self.compile(element)
+            
+    def _declare(self, attribute, definition, index):
+        '''
+        Give attribute a slot, indexed by its name and by the name of its ExtensionDefinition (when known).
+        '''
+        slot = self.slots.get(id(attribute))
+        if slot is None:
+            slot = self.slots[id(attribute)] = 'x%d'%len(self.attributes)
+            self.attributes.append(attribute)
+            index.setdefault(attribute.name, []).append(slot)
+        if definition is not None:
+            slots = index.setdefault((definition.name, attribute.name), [])
+            if slot not in slots:
+                slots.append(slot)
+                
+    def compile(self, element):
+        '''
+        Return the ExtensionAttributes of element, checking the type of its values.
+        '''
+        attributes = self.attributes_class()
+        for value in element.extensionValues:
+            definition = value.extensionAttributeDefinition
+            content = value.valueRef if definition.isReference else value.value
+            expected = AttributeTypes.get(definition.type)
+            if expected is not None and content is not None and not isinstance(content, expected):
+                raise ModelError('Extension attribute %s of %s is not a %s'%(definition.name, element.id, definition.type))
+            setattr(attributes, self.slots[id(definition)], content)
+        return attributes
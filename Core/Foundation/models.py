@@ -29,6 +29,7 @@ The Foundation package contains classes that are shared among other packages in
 '''
 
 from Core.Common.fonctions import residual_args
+from Core.Common.ErrorModels import ModelError
 
 RelationshipDirection = ['None','Forward','Backward','Both']
 
@@ -37,6 +38,9 @@ class BaseElement(object):
     BaseElement is the abstract super class for most BPMN elements.
     It provides the attributes id and documentation, which other elements will inherit.
     '''
+    #ExtensionAttributes compiled when the Definitions are loaded (see Core.Foundation.extensions)
+    extensionAttributes = None
+    
     def __init__(self, id, **kwargs):
         '''
         id:str
@@ -68,8 +72,10 @@ class RootElement(BaseElement):
     
     The RootElement element inherits the attributes and model associations of BaseElement, but does not have any further attributes or model associations.
     '''
-    def __init__(self):
-        super(RootElement,self).__init__()
+    def __init__(self, id, **kwargs):
+        super(RootElement,self).__init__(id, **kwargs)
+        if self.__class__.__name__ == 'RootElement':
+            residual_args(self.__init__, **kwargs)
     
 class Relationship(BaseElement):
     '''
@@ -94,7 +100,7 @@ class Relationship(BaseElement):
         if direction in RelationshipDirection:
             self.direction = direction
         else:
-            raise Exception #to be detailed
+            raise ModelError('direction %s is not a RelationshipDirection'%direction)
         self.sources = sources
         self.targets = targets
     
@@ -157,7 +163,7 @@ class ExtensionDefinition(object):
         '''
         super(ExtensionDefinition,self).__init__()
         self.name = name
-        self.extensionAttributeDefinitions = kwargs.pop('extentionAttributeDefinitions',[])
+        self.extensionAttributeDefinitions = kwargs.pop('extensionAttributeDefinitions', kwargs.pop('extentionAttributeDefinitions',[]))
         
         if self.__class__.__name__ == 'ExtensionDefinition':
             residual_args(self.__init__, **kwargs)
@@ -69,7 +69,7 @@ class EndPoint(RootElement):
     def __init__(self, id, **kwargs):
         '''
         '''
-        super(EndPoint).__init__(id, **kwargs)
+        super(EndPoint, self).__init__(id, **kwargs)
         if self.__class__.__name__=='EndPoint':
             residual_args(self.__init__, **kwargs)
             
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Data
+
+The Data package contains classes used to model the data that is produced, consumed and stored by a Process.
+'''
+
+from Core.Foundation.models import BaseElement
+from Core.Common.models import FlowElement
+from Core.Common.fonctions import residual_args
+
+class ItemAwareElement(BaseElement):
+    '''
+    Several elements in BPMN are subject to store or convey items during process execution.
+    These elements are referenced generally as "item-aware elements".
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        itemSubjectRef:ItemDefinition
+            Specification of the items that are stored by the ItemAwareElement.
+            
+        dataState:DataState
+            A reference to the DataState, which defines certain behaviors/properties of the ItemAwareElement.
+        '''
+        super(ItemAwareElement, self).__init__(id, **kwargs)
+        self.itemSubjectRef = kwargs.pop('itemSubjectRef', None)
+        self.dataState = kwargs.pop('dataState', None)
+        
+        if self.__class__.__name__=='ItemAwareElement':
+            residual_args(self.__init__, **kwargs)
+            
+class DataState(BaseElement):
+    '''
+    Every Data Object Reference MAY optionally reference a DataState element, which is the state of the data contained in the Data Object.
+    '''
+    def __init__(self, id, name, **kwargs):
+        '''
+        name:str
+            Defines the name of the DataState.
+        '''
+        super(DataState, self).__init__(id, **kwargs)
+        self.name = name
+        
+        if self.__class__.__name__=='DataState':
+            residual_args(self.__init__, **kwargs)
+            
+class Property(ItemAwareElement):
+    '''
+    Properties, like Data Objects, are item-aware elements.
+    But, unlike Data Objects, they are not visually displayed on a Process diagram.
+    Only Processes, Activities, and Events MAY be associated with Properties.
+    '''
+    def __init__(self, id, name, **kwargs):
+        '''
+        name:str
+            Defines the name of the Property.
+        '''
+        super(Property, self).__init__(id, **kwargs)
+        self.name = name
+        
+        if self.__class__.__name__=='Property':
+            residual_args(self.__init__, **kwargs)
+            
+class DataObject(FlowElement, ItemAwareElement):
+    '''
+    The primary construct for modeling data within the Process flow is the DataObject element.
+    A DataObject has a well-defined lifecycle, with resulting access constraints.
+    '''
+    def __init__(self, id, isCollection=False, **kwargs):
+        '''
+        isCollection:bool (default=False)
+            Defines if the DataObject represents a collection of elements.
+            It is needed when no itemDefinition is referenced. If an itemDefinition is referenced, then this
+            attribute MUST have the same value as the isCollection attribute of the referenced itemDefinition.
+        '''
+        super(DataObject, self).__init__(id, **kwargs)
+        self.isCollection = isCollection
+        
+        if self.__class__.__name__=='DataObject':
+            residual_args(self.__init__, **kwargs)
+            
+class DataInput(ItemAwareElement):
+    '''
+    A Data Input is a declaration that a particular kind of data will be used as input of the InputOutputSpecification.
+    '''
+    def __init__(self, id, name, isCollection=False, **kwargs):
+        '''
+        name:str
+            A descriptive name for the element.
+            
+        inputSetRefs:InputSet list (min len = 1)
+            The InputSets that include this DataInput.
+            
+        isCollection:bool (default=False)
+            Defines if the DataInput represents a collection of elements.
+        '''
+        super(DataInput, self).__init__(id, **kwargs)
+        self.name = name
+        self.isCollection = isCollection
+        self.inputSetRefs = kwargs.pop('inputSetRefs', [])
+        
+        if self.__class__.__name__=='DataInput':
+            residual_args(self.__init__, **kwargs)
+            
+class DataOutput(ItemAwareElement):
+    '''
+    A Data Output is a declaration that a particular kind of data can be produced as output of the InputOutputSpecification.
+    '''
+    def __init__(self, id, name, isCollection=False, **kwargs):
+        '''
+        name:str
+            A descriptive name for the element.
+            
+        outputSetRefs:OutputSet list (min len = 1)
+            The OutputSets that include this DataOutput.
+            
+        isCollection:bool (default=False)
+            Defines if the DataOutput represents a collection of elements.
+        '''
+        super(DataOutput, self).__init__(id, **kwargs)
+        self.name = name
+        self.isCollection = isCollection
+        self.outputSetRefs = kwargs.pop('outputSetRefs', [])
+        
+        if self.__class__.__name__=='DataOutput':
+            residual_args(self.__init__, **kwargs)
+            
+class InputSet(BaseElement):
+    '''
+    An InputSet is a collection of DataInput elements that together define a valid set of data inputs for an InputOutputSpecification.
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        name:str
+            A descriptive name for the input set.
+            
+        dataInputRefs:DataInput list
+            The DataInput elements that collectively make up this data requirement.
+            
+        optionalInputRefs:DataInput list
+            The DataInput elements that are a part of the InputSet that can be in the state of "unavailable" when the Activity starts executing.
+            
+        whileExecutingInputRefs:DataInput list
+            The DataInput elements that are a part of the InputSet that can be evaluated while the Activity is executing.
+            
+        outputSetRefs:OutputSet list
+            Specifies an Input/Output rule that defines which OutputSet is expected to be created by the Activity when this InputSet became valid.
+        '''
+        super(InputSet, self).__init__(id, **kwargs)
+        self.name = kwargs.pop('name', None)
+        self.dataInputRefs = kwargs.pop('dataInputRefs', [])
+        self.optionalInputRefs = kwargs.pop('optionalInputRefs', [])
+        self.whileExecutingInputRefs = kwargs.pop('whileExecutingInputRefs', [])
+        self.outputSetRefs = kwargs.pop('outputSetRefs', [])
+        
+        if self.__class__.__name__=='InputSet':
+            residual_args(self.__init__, **kwargs)
+            
+class OutputSet(BaseElement):
+    '''
+    An OutputSet is a collection of DataOutputs elements that together can be produced as output from an Activity or Event.
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        name:str
+            A descriptive name for the output set.
+            
+        dataOutputRefs:DataOutput list
+            The DataOutput elements that MAY collectively be outputted.
+            
+        optionalOutputRefs:DataOutput list
+            The DataOutput elements that are a part of the OutputSet that do not have to be produced when the Activity completes executing.
+            
+        whileExecutingOutputRefs:DataOutput list
+            The DataOutput elements that are a part of the OutputSet that can be produced while the Activity is executing.
+            
+        inputSetRefs:InputSet list
+            Specifies an Input/Output rule that defines which InputSet has to become valid to expect the creation of this OutputSet.
+        '''
+        super(OutputSet, self).__init__(id, **kwargs)
+        self.name = kwargs.pop('name', None)
+        self.dataOutputRefs = kwargs.pop('dataOutputRefs', [])
+        self.optionalOutputRefs = kwargs.pop('optionalOutputRefs', [])
+        self.whileExecutingOutputRefs = kwargs.pop('whileExecutingOutputRefs', [])
+        self.inputSetRefs = kwargs.pop('inputSetRefs', [])
+        
+        if self.__class__.__name__=='OutputSet':
+            residual_args(self.__init__, **kwargs)
+            
+class InputOutputSpecification(BaseElement):
+    '''
+    The InputOutputSpecification defines the inputs and outputs and the InputSets and OutputSets for an Activity or a Process.
+    '''
+    def __init__(self, id, **kwargs):
+        '''
+        dataInputs:DataInput list
+            An optional reference to the Data Inputs of the InputOutputSpecification.
+            If not specified, the InputOutputSpecification is treated as having no Data Inputs.
+            
+        dataOutputs:DataOutput list
+            An optional reference to the Data Outputs of the InputOutputSpecification.
+            If not specified, the InputOutputSpecification is treated as having no Data Outputs.
+            
+        inputSets:InputSet list (min len = 1)
+            A reference to the InputSets defined by the InputOutputSpecification.
+            
+        outputSets:OutputSet list (min len = 1)
+            A reference to the OutputSets defined by the InputOutputSpecification.
+        '''
+        super(InputOutputSpecification, self).__init__(id, **kwargs)
+        self.dataInputs = kwargs.pop('dataInputs', [])
+        self.dataOutputs = kwargs.pop('dataOutputs', [])
+        self.inputSets = kwargs.pop('inputSets', [])
+        self.outputSets = kwargs.pop('outputSets', [])
+        
+        if self.__class__.__name__=='InputOutputSpecification':
+            residual_args(self.__init__, **kwargs)
+            
+class DataAssociation(BaseElement):
+    '''
+    Data Associations are used to move data between Data Objects, Properties, and inputs and outputs of Activities, Processes, and GlobalTasks.
+    '''
+    def __init__(self, id, targetRef, **kwargs):
+        '''
+        sourceRef:ItemAwareElement list
+            Identifies the source of the Data Association.
+            The source MUST be an ItemAwareElement.
+            
+        targetRef:ItemAwareElement
+            Identifies the target of the Data Association.
+            The target MUST be an ItemAwareElement.
+            
+        transformation:FormalExpression
+            Specifies an optional transformation Expression.
+            The actual scope of accessible data for that Expression is defined by the source and target of the specific Data Association types.
+            
+        assignment:Assignment list
+            Specifies one or more data elements Assignments.
+            By using an Assignment, single data structure elements can be assigned from the source structure to the target structure.
+        '''
+        super(DataAssociation, self).__init__(id, **kwargs)
+        self.targetRef = targetRef
+        self.sourceRef = kwargs.pop('sourceRef', [])
+        self.transformation = kwargs.pop('transformation', None)
+        self.assignment = kwargs.pop('assignment', [])
+        
+        if self.__class__.__name__=='DataAssociation':
+            residual_args(self.__init__, **kwargs)
+            
+class DataInputAssociation(DataAssociation):
+    '''
+    The DataInputAssociation can be used to associate an ItemAwareElement to a DataInput contained within an Activity.
+    The source of such a DataAssociation can be every ItemAwareElement accessible in the current scope, e.g., a Data Object, a Property, or an Expression.
+    '''
+    pass
+    
+class DataOutputAssociation(DataAssociation):
+    '''
+    The DataOutputAssociation can be used to associate a DataOutput contained within an Activity with any ItemAwareElement accessible in the scope the association will be executed in.
+    '''
+    pass
+    
+class Assignment(BaseElement):
+    '''
+    The Assignment class is used to specify a simple mapping of data elements using a specified Expression language.
+    '''
+    def __init__(self, id, from_, to, **kwargs):
+        '''
+        from_:Expression
+            The Expression that evaluates the source of the Assignment.
+            (from is not valid in python, use of from_ instead)
+            
+        to:Expression
+            The Expression that defines the actual Assignment operation and the target data element.
+        '''
+        super(Assignment, self).__init__(id, **kwargs)
+        self.from_ = from_
+        self.to = to
+        
+        if self.__class__.__name__=='Assignment':
+            residual_args(self.__init__, **kwargs)
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Audit records and monitoring events.
+
+The Auditing and Monitoring of a Process, of a Sub-Process or of a FlowElement name the sink their records are written to
+(the ones of an element default to the ones of its container). The engine emits a record for each transition of the
+audited and monitored elements : (time, channel, process id, instance id, element id, transition), channel being
+'auditing' or 'monitoring'.
+The records are appended to the bounded buffer of an AuditLog (a deque : appending takes no lock) and written to their
+sinks by a background thread, so that the transitions of the instances never wait for the sinks ; when the buffer
+is full, the new records are dropped and counted.
+The records a sink failed to write are put back in front of the buffer and retried at the next drains, as long as the
+buffer has room for them, until the sink has failed retries drains in a row.
+
+A sink implements write(records) and close(). Provided sinks : a rotating file, a sqlite table, a local socket.
+'''
+
+import json
+import os
+import socket
+import sqlite3
+from collections import deque
+from threading import Thread, Event
+
+def json_line(record):
+    return json.dumps(record, separators=(',', ':'), default=str) + '\n'
+    
+class AuditLog(object):
+    '''
+    Bounded buffer of records drained to named sinks by a daemon thread.
+    '''
+    def __init__(self, sinks, engine=None, capacity=65536, interval=0.1, retries=5):
+        '''
+        sinks:dict
+            Sink name -> sink.
+            
+        engine:Engine
+            The engine emitting the records : the log is attached as engine.auditing.
+            
+        capacity:int (default=65536)
+            Maximum number of records in the buffer.
+            
+        interval:float (default=0.1)
+            Seconds between two drains of the buffer by the background thread (see start).
+            
+        retries:int (default=5)
+            Number of drains in a row a failing sink is retried at before its records are dropped.
+            
+        dropped:int
+            Records dropped because the buffer was full, their sink unknown, or failing more than retries times.
+            
+        written:int
+            Records written to their sinks.
+            
+        failures:dict
+            Sink name -> number of its last writes in a row which failed.
+        '''
+        self.sinks = sinks
+        self.capacity = capacity
+        self.interval = interval
+        self.retries = retries
+        self.dropped = 0
+        self.written = 0
+        self.failures = {}
+        self._buffer = deque()
+        self._stop = Event()
+        self._thread = None
+        if engine is not None:
+            engine.auditing = self
+            
+    def emit(self, sink, record):
+        buffer = self._buffer
+        if len(buffer) >= self.capacity:
+            self.dropped += 1
+            return
+        buffer.append((sink, record))
+        
+    def drain(self):
+        '''
+        Write the buffered records to their sinks, one write per sink ; the records of a failing sink are put back
+        in front of the buffer (see retries).
+        Return the number of records taken from the buffer.
+        '''
+        buffer = self._buffer
+        popleft = buffer.popleft
+        batches = {}
+        taken = 0
+        try:
+            while True:
+                sink, record = popleft()
+                batches.setdefault(sink, []).append(record)
+                taken += 1
+        except IndexError:
+            pass
+        failed = []
+        for name, records in batches.items():
+            sink = self.sinks.get(name)
+            if sink is None:
+                self.dropped += len(records)
+                continue
+            try:
+                sink.write(records)
+                self.written += len(records)
+                self.failures.pop(name, None)
+            except Exception:
+                failures = self.failures[name] = self.failures.get(name, 0) + 1
+                if failures > self.retries:
+                    self.dropped += len(records)
+                    del self.failures[name]
+                else:
+                    failed.append((name, records))
+        for name, records in failed:
+            #the oldest records are dropped first when the buffer has no room for all of them
+            room = max(self.capacity - len(buffer), 0)
+            if len(records) > room:
+                self.dropped += len(records) - room
+                records = records[len(records) - room:]
+            buffer.extendleft((name, record) for record in reversed(records))
+        return taken
+        
+    def start(self):
+        '''
+        Drain the buffer every interval seconds in a daemon thread.
+        '''
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name='AuditLog')
+        self._thread.daemon = True
+        self._thread.start()
+        
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.drain()
+            
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.drain()
+        
+    def close(self):
+        self.stop()
+        for sink in self.sinks.values():
+            sink.close()
+            
+class RotatingFileSink(object):
+    '''
+    Sink writing the records as JSON lines to a file, renamed path.1 (path.2...) when it exceeds size bytes.
+    '''
+    def __init__(self, path, size=10485760, count=5):
+        '''
+        path:str
+            Location of the current file.
+            
+        size:int (default=10485760)
+            Size in bytes beyond which the file is rotated.
+            
+        count:int (default=5)
+            Number of rotated files kept, the oldest ones are removed first.
+        '''
+        self.path = path
+        self.size = size
+        self.count = count
+        self.file = open(path, 'ab')
+        
+    def write(self, records):
+        self.file.write(''.join(json_line(record) for record in records))
+        self.file.flush()
+        if self.file.tell() >= self.size:
+            self.rotate()
+            
+    def rotate(self):
+        self.file.close()
+        for index in range(self.count - 1, 0, -1):
+            source = '%s.%s'%(self.path, index)
+            if os.path.exists(source):
+                os.rename(source, '%s.%s'%(self.path, index + 1))
+        if self.count:
+            os.rename(self.path, '%s.1'%self.path)
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, 'ab')
+        
+    def close(self):
+        self.file.close()
+        
+class SQLiteSink(object):
+    '''
+    Sink inserting the records in a sqlite table, one transaction per batch.
+    '''
+    def __init__(self, path=':memory:', table='audit'):
+        '''
+        path:str (default=':memory:')
+            Location of the sqlite database.
+            
+        table:str (default='audit')
+            Name of the table, created if needed.
+        '''
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.table = table
+        self.connection.execute('CREATE TABLE IF NOT EXISTS %s (time REAL, channel TEXT, process TEXT, instance INTEGER, '
+                                'element TEXT, transition TEXT)'%table)
+        self.connection.commit()
+        
+    def write(self, records):
+        with self.connection:
+            self.connection.executemany('INSERT INTO %s VALUES (?, ?, ?, ?, ?, ?)'%self.table, records)
+            
+    def close(self):
+        self.connection.close()
+        
+class SocketSink(object):
+    '''
+    Sink sending the records as JSON lines to a local stream socket, reconnecting after a failure.
+    '''
+    def __init__(self, address, timeout=1.0):
+        '''
+        address:str|tuple
+            Path of a Unix domain socket, or (host, port) of a TCP socket.
+            
+        timeout:float (default=1.0)
+            Timeout in seconds of the connection and of the sends.
+        '''
+        self.address = address
+        self.timeout = timeout
+        self.socket = None
+        
+    def connect(self):
+        family = socket.AF_UNIX if isinstance(self.address, basestring) else socket.AF_INET
+        connection = socket.socket(family, socket.SOCK_STREAM)
+        connection.settimeout(self.timeout)
+        connection.connect(self.address)
+        self.socket = connection
+        
+    def write(self, records):
+        if self.socket is None:
+            self.connect()
+        try:
+            self.socket.sendall(''.join(json_line(record) for record in records))
+        except socket.error:
+            self.close()
+            raise
+            
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
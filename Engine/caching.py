@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Result cache of idempotent Activities.
+
+Service Tasks and Business Rule Tasks marked as cacheable (extension attribute 'cache' of CacheExtension)
+have their results kept by a ResultCache, keyed by the Operation (or the task) and a digest of their declared inputs
+only (see CompiledProcess.cache_inputs), encoded canonically so that the key does not depend on the order of a dict.
+A hit completes the task at once, without calling the service or the rules.
+The cache holds the most recently used results in memory and can keep them across restarts in a shelve file.
+The shelve file is not locked : it MUST only be opened by one process (one ResultCache) at a time.
+Cached results are shared by all the instances receiving them : they must not be modified in place.
+'''
+
+import hashlib
+import shelve
+import time
+from array import array
+from collections import OrderedDict
+from threading import Lock
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+    
+from Core.Foundation.models import ExtensionDefinition, ExtensionAttributeDefinition
+from Core.Foundation.extensions import understand
+
+#Extension of the cacheable Activities : 'cache' marks them cacheable, 'cacheTtl' is the lifetime of their results
+CacheExtension = ExtensionDefinition('cache', extensionAttributeDefinitions=[ExtensionAttributeDefinition('cache', 'bool'),
+                                                                             ExtensionAttributeDefinition('cacheTtl', 'float')])
+understand(CacheExtension)
+
+def canonical(value):
+    '''
+    Return value with its dicts and sets as sorted tuples and its sequences as tuples, so that equal values pickle alike.
+    '''
+    if isinstance(value, dict):
+        return ('dict', tuple(sorted((canonical(name), canonical(item)) for name, item in value.items())))
+    if isinstance(value, (set, frozenset)):
+        return ('set', tuple(sorted(canonical(item) for item in value)))
+    if isinstance(value, (list, tuple, array)):
+        return tuple(canonical(item) for item in value)
+    return value
+
+class ResultCache(object):
+    '''
+    LRU cache of results with expiry, and an optional shelve tier owned by a single process.
+    Expired results are dropped when they are looked up, or all at once by purge.
+    '''
+    def __init__(self, size=10000, ttl=None, path=None):
+        '''
+        size:int (default=10000)
+            Maximum number of results kept in memory, the least recently used ones are evicted first.
+            
+        ttl:float (default=None)
+            Default lifetime of the results in seconds (None for no expiry).
+            
+        path:str (default=None)
+            File of the shelve persisting the results (None for a memory only cache).
+            Only one process may open it at a time.
+            
+        hits, misses:int
+            Lookup counters.
+        '''
+        super(ResultCache, self).__init__()
+        self.size = size
+        self.ttl = ttl
+        self.path = path
+        self.entries = OrderedDict()
+        self.shelf = shelve.open(path, protocol=pickle.HIGHEST_PROTOCOL) if path else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        
+    def key(self, owner, inputs, names=None):
+        '''
+        Return the key of the result of owner (Operation or task id) for the values of names in inputs (mapping),
+        or None if the inputs cannot be digested.
+        
+        names:str iterable
+            The input names (by default, all the names of inputs).
+        '''
+        if names is None:
+            names = inputs.keys()
+        items = [(name, canonical(inputs.get(name))) for name in sorted(names)]
+        try:
+            digest = hashlib.sha1(pickle.dumps(items, pickle.HIGHEST_PROTOCOL)).hexdigest()
+        except (pickle.PicklingError, TypeError):
+            return None
+        return '%s:%s'%(owner, digest)
+        
+    def get(self, key):
+        '''
+        Return the result cached for key, or None.
+        '''
+        now = time.time()
+        with self._lock:
+            entry = self.entries.pop(key, None)
+            if entry is None and self.shelf is not None:
+                entry = self.shelf.get(key)
+            if entry is None or (entry[0] is not None and entry[0] < now):
+                if entry is not None and self.shelf is not None:
+                    self.shelf.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries[key] = entry
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+            self.hits += 1
+            return entry[1]
+            
+    def put(self, key, result, ttl=None):
+        '''
+        Cache result for ttl seconds (by default, the ttl of the cache).
+        '''
+        ttl = ttl if ttl is not None else self.ttl
+        entry = (time.time() + ttl if ttl is not None else None, result)
+        with self._lock:
+            self.entries.pop(key, None)
+            self.entries[key] = entry
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+            if self.shelf is not None:
+                self.shelf[key] = entry
+                
+    def purge(self):
+        '''
+        Remove the expired results, from memory and from the shelve. Return the number of removed keys.
+        '''
+        now = time.time()
+        with self._lock:
+            expired = set(key for key, entry in self.entries.items() if entry[0] is not None and entry[0] < now)
+            for key in expired:
+                del self.entries[key]
+            if self.shelf is not None:
+                for key in self.shelf.keys():
+                    expiry = self.shelf[key][0]
+                    if expiry is not None and expiry < now:
+                        del self.shelf[key]
+                        expired.add(key)
+            return len(expired)
+            
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            if self.shelf is not None:
+                self.shelf.clear()
+                
+    def close(self):
+        if self.shelf is not None:
+            self.shelf.close()
+            self.shelf = None
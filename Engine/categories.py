@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Category index of the compiled processes, for the monitoring queries grouping the load by CategoryValue.
+
+The FlowNodes of a CompiledProcess and of its Sub-Processes are numbered by position (the node index plus the offset of
+its CompiledProcess), and each CategoryValue is compiled into a bitset of the positions of the nodes it categorizes
+(an int, bit p standing for position p), through FlowElement.categoryValueRef or CategoryValue.categorizedFlowElements.
+Grouping a per-node statistic by category is then an intersection of the bitset of the nodes having a value with the
+bitset of each CategoryValue, instead of a walk of the FlowElements.
+The load of a category is read from the NodeCounters of the compiled processes, without visiting any instance.
+'''
+
+from collections import defaultdict
+
+from Core.Common.ErrorModels import EngineError
+
+def bits(mask):
+    '''
+    Yield the positions of the bits set in mask.
+    '''
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+        
+def label(value):
+    '''
+    Return the label of a CategoryValue : the name of its Category and its value separated by '.'.
+    '''
+    if value.category is None:
+        return value.value
+    return '%s.%s'%(value.category.name, value.value)
+    
+class CategoryIndex(object):
+    '''
+    Bitsets of the nodes of a CompiledProcess (Sub-Processes included) per CategoryValue.
+    '''
+    def __init__(self, compiled):
+        '''
+        compiled:CompiledProcess
+            The compiled Process to index.
+            
+        offsets:dict
+            id of a CompiledProcess of the hierarchy -> position of its first node.
+            
+        processes:CompiledProcess list
+            The CompiledProcesses of the hierarchy, in position order.
+            
+        nodes:FlowNode list
+            The nodes of the hierarchy, the position in the list is the node position.
+            
+        masks:dict
+            CategoryValue label -> bitset of the positions of the nodes it categorizes.
+            
+        categories:dict
+            Category name -> bitset of the positions of the nodes categorized by one of its values.
+        '''
+        super(CategoryIndex, self).__init__()
+        self.compiled = compiled
+        self.offsets = {}
+        self.processes = []
+        self.nodes = []
+        self.masks = defaultdict(int)
+        self.categories = defaultdict(int)
+        
+        positions = {}
+        self._number(compiled, positions)
+        values = {}
+        for node in self.nodes:
+            for value in node.categoryValueRef:
+                values[id(value)] = value
+        for value in values.values():
+            for element in value.categorizedFlowElements:
+                if id(element) in positions:
+                    self._add(value, positions[id(element)])
+        for position, node in enumerate(self.nodes):
+            for value in node.categoryValueRef:
+                self._add(value, position)
+        self.masks = dict(self.masks)
+        self.categories = dict(self.categories)
+        
+    def _number(self, compiled, positions):
+        if id(compiled) in self.offsets:
+            return
+        self.offsets[id(compiled)] = len(self.nodes)
+        self.processes.append(compiled)
+        for node in compiled.nodes:
+            positions[id(node)] = len(self.nodes)
+            self.nodes.append(node)
+        for child in compiled.children.values():
+            if child.depth:
+                self._number(child, positions)
+                
+    def _add(self, value, position):
+        self.masks[label(value)] |= 1 << position
+        if value.category is not None:
+            self.categories[value.category.name] |= 1 << position
+            
+    def mask(self, *labels):
+        '''
+        Return the bitset of the nodes categorized by all the CategoryValues labels (or by all the values of the Categories).
+        '''
+        mask = (1 << len(self.nodes)) - 1
+        for name in labels:
+            if name in self.masks:
+                mask &= self.masks[name]
+            elif name in self.categories:
+                mask &= self.categories[name]
+            else:
+                raise EngineError('%s has no CategoryValue %s'%(self.compiled.id, name))
+        return mask
+        
+    def select(self, *labels):
+        '''
+        Return the FlowNodes categorized by all the CategoryValues labels.
+        '''
+        return [self.nodes[position] for position in bits(self.mask(*labels))]
+        
+    ##########################################################
+    # Queries
+    
+    def tokens(self):
+        '''
+        Return the number of live tokens on each node position of the instances of the indexed process,
+        from the counters of the nodes (entered - completed - cancelled).
+        '''
+        counts = []
+        for compiled in self.processes:
+            counts.extend(compiled.counters.read()[3])
+        return counts
+        
+    def aggregate(self, stats, labels=None):
+        '''
+        Return the sums of stats per CategoryValue label.
+        
+        stats:dict|list
+            node position -> statistic (live tokens, completions, durations...).
+            
+        labels:str list (default=None)
+            The CategoryValues labels to aggregate (None for all).
+        '''
+        if not isinstance(stats, dict):
+            stats = dict((position, value) for position, value in enumerate(stats) if value)
+        present = 0
+        for position in stats:
+            present |= 1 << position
+        masks = self.masks if labels is None else dict((name, self.mask(name)) for name in labels)
+        return dict((name, sum(stats[position] for position in bits(mask & present)))
+                    for name, mask in masks.items())
+        
+    def load(self, labels=None):
+        '''
+        Return the number of live tokens of the instances per CategoryValue label.
+        '''
+        return self.aggregate(self.tokens(), labels)
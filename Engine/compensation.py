@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Compensation log of process instances.
+
+Each completed compensable Activity appends a record (scope, activity index, snapshot) to the log of its instance.
+Snapshots are copy-on-write diffs : a snapshot only holds the variables whose value changed since the previous
+snapshot of the same variables, and refers to that previous snapshot for the others.
+The immutable values are shared by reference ; the mutable ones (lists, dicts, arrays) are copied in the snapshot,
+and compared by value rather than by identity, so that a value modified in place is snapshotted as well.
+The tracker of a variables mapping is released with its scope.
+
+Compensation handlers run on CompensationVariables : they read the snapshot of the compensated Activity
+and write the live variables of its scope.
+'''
+
+from array import array
+from copy import copy
+
+from Engine.variables import Variables, Collection
+
+Missing = object()
+
+#Values copied in the snapshots
+Mutable = (list, dict, set, array)
+
+class Snapshot(object):
+    '''
+    Values of a variables mapping when a compensable Activity completed.
+    '''
+    __slots__ = ('previous', 'changes')
+    
+    def __init__(self, previous, changes):
+        '''
+        previous:Snapshot
+            The previous snapshot of the same variables (None for the first one).
+            
+        changes:dict
+            The values changed since previous (Missing for removed variables).
+        '''
+        self.previous = previous
+        self.changes = changes
+        
+    def get(self, name, default=None):
+        snapshot = self
+        while snapshot is not None:
+            value = snapshot.changes.get(name, Missing)
+            if value is not Missing or name in snapshot.changes:
+                return default if value is Missing else value
+            snapshot = snapshot.previous
+        return default
+        
+    def __getitem__(self, name):
+        value = self.get(name, Missing)
+        if value is Missing:
+            raise KeyError(name)
+        return value
+        
+    def resolve(self):
+        '''
+        Return the snapshotted variables as a new dict.
+        '''
+        chain = []
+        snapshot = self
+        while snapshot is not None:
+            chain.append(snapshot.changes)
+            snapshot = snapshot.previous
+        values = {}
+        for changes in reversed(chain):
+            values.update(changes)
+        return dict((name, value) for name, value in values.items() if value is not Missing)
+        
+class CompensationVariables(Variables):
+    '''
+    Variables of a compensation handler : the variables not written by the handler yet are read from the Snapshot
+    of the compensated Activity, every write goes to the live Variables of its scope.
+    '''
+    __slots__ = ('live', 'snapshot', 'opened', 'written')
+    
+    def __init__(self, live, snapshot):
+        '''
+        live:Variables
+            The variables of the scope of the compensated Activity.
+            
+        snapshot:Snapshot
+            The variables when the compensated Activity completed.
+            
+        opened:dict
+            Values of live when the handler started, to detect the variables written since then
+            (by data output associations, which write the slots directly).
+            
+        written:set
+            Names of the variables written by the handler.
+        '''
+        self.live = live
+        self.snapshot = snapshot
+        self.opened = dict(live.items())
+        self.written = set()
+        
+    layout = property(lambda self: self.live.layout, lambda self, layout: setattr(self.live, 'layout', layout))
+    values = property(lambda self: self.live.values, lambda self, values: setattr(self.live, 'values', values))
+    extra = property(lambda self: self.live.extra, lambda self, extra: setattr(self.live, 'extra', extra))
+    
+    def _snapshotted(self, name, value):
+        '''
+        Return the snapshotted value of name if the handler did not write it (value is its live value), else Missing.
+        '''
+        if name in self.written or value is not self.opened.get(name, Missing):
+            return Missing
+        value = self.snapshot.get(name, Missing)
+        return Missing if value.__class__ is Collection else value
+        
+    def get_slot(self, slot):
+        live = self.live
+        value = self._snapshotted(live.layout.names[slot], live.values[slot])
+        return live.get_slot(slot) if value is Missing else value
+        
+    def set_slot(self, slot, value):
+        live = self.live
+        self.written.add(live.layout.names[slot])
+        live.values[slot] = value
+        
+    def __getitem__(self, name):
+        live = self.live
+        slot = live.layout.index.get(name)
+        if slot is not None:
+            return self.get_slot(slot)
+        value = self._snapshotted(name, live.extra.get(name, Missing) if live.extra else Missing)
+        return live[name] if value is Missing else value
+        
+    def __setitem__(self, name, value):
+        self.written.add(name)
+        self.live[name] = value
+        
+    def __delitem__(self, name):
+        self.written.add(name)
+        del self.live[name]
+        
+    def __contains__(self, name):
+        try:
+            self[name]
+        except KeyError:
+            return False
+        return True
+        
+    def __len__(self):
+        return len(self.items())
+        
+    def keys(self):
+        return [name for name, value in self.items()]
+        
+    def items(self):
+        pairs = []
+        for name, value in self.live.items():
+            snapshotted = self._snapshotted(name, value)
+            pairs.append((name, value if snapshotted is Missing else snapshotted))
+        live = self.live
+        for name, value in self.snapshot.resolve().items():
+            if name not in live and name not in self.written and value.__class__ is not Collection:
+                pairs.append((name, value))
+        return pairs
+        
+    def dump(self):
+        return self.live.dump()
+        
+class CompensationLog(object):
+    '''
+    Ordered records of the compensable Activities completed by an instance.
+    '''
+    __slots__ = ('records', 'trackers')
+    
+    def __init__(self):
+        '''
+        records:(scope, activity index, Snapshot) list
+            Completed compensable Activities, in completion order.
+            
+        trackers:dict
+            id of a variables mapping -> [variables, last values, last Snapshot].
+        '''
+        self.records = []
+        self.trackers = {}
+        
+    def __len__(self):
+        return len(self.records)
+        
+    def snapshot(self, variables):
+        '''
+        Return a Snapshot of variables, sharing the unchanged values with the previous one.
+        '''
+        tracker = self.trackers.get(id(variables))
+        if tracker is None or tracker[0] is not variables:
+            tracker = self.trackers[id(variables)] = [variables, {}, None]
+        last, head = tracker[1], tracker[2]
+        changes = {}
+        for name, value in variables.items():
+            previous = last.get(name, Missing)
+            if previous is value:
+                continue
+            if isinstance(value, Mutable):
+                if previous.__class__ is value.__class__ and previous == value:
+                    continue
+                value = copy(value)
+            changes[name] = value
+        for name in last:
+            if name not in variables:
+                changes[name] = Missing
+        if changes or head is None:
+            for name, value in changes.items():
+                if value is Missing:
+                    del last[name]
+                else:
+                    last[name] = value
+            head = tracker[2] = Snapshot(head, changes)
+        return head
+        
+    def release(self, variables):
+        '''
+        Forget the tracker of variables, once their scope is gone.
+        '''
+        tracker = self.trackers.get(id(variables))
+        if tracker is not None and tracker[0] is variables:
+            del self.trackers[id(variables)]
+            
+    def record(self, scope, activity):
+        self.records.append((scope, activity, self.snapshot(scope.variables)))
+        
+    def take(self, scope, activity=None):
+        '''
+        Remove from the log and return, most recent first, the records of the Activities completed in scope
+        (or in the Sub-Processes of scope), or of activity only if given.
+        '''
+        taken = []
+        kept = []
+        for record in self.records:
+            owner = record[0]
+            if activity is not None:
+                match = owner is scope and record[1] == activity
+            else:
+                while owner is not None and owner is not scope:
+                    owner = owner.parent
+                match = owner is scope
+            if match:
+                taken.append(record)
+            else:
+                kept.append(record)
+        self.records[:] = kept
+        taken.reverse()
+        return taken
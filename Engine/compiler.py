@@ -0,0 +1,586 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Compilation of FlowElementsContainers into flat, index based graphs.
+The engine never walks the model objects at run time : every FlowNode is given an index
+and all the information needed to move tokens is precomputed in lists addressed by that index.
+'''
+
+from Core.Common.models import FlowNode, SequenceFlow, FormalExpression
+from Core.Common.models import ExclusiveGateway, ParallelGateway
+from Core.Common.models import StartEvent, EndEvent, IntermediateCatchEvent, IntermediateThrowEvent, BoundaryEvent
+from Core.Common.models import MessageEventDefinition, TerminateEventDefinition
+from Core.Common.models import ErrorEventDefinition, EscalationEventDefinition, CompensateEventDefinition
+from Core.Common.models import Association
+from Core.Common.ErrorModels import EngineError
+from Activities.models import CallActivity, SubProcess, ScriptTask, ReceiveTask, SendTask, ServiceTask, BusinessRuleTask
+from HumanInteraction.models import UserTask, ManualTask
+from Data.models import DataObject
+from Engine.variables import VariableLayout
+from Engine.mapping import DataMapping
+from Engine.monitoring import NodeCounters
+
+PythonFormats = [None, 'text/x-python', 'text/python', 'application/x-python']
+
+def event_definitions(event):
+    '''
+    Return all the EventDefinitions (contained and referenced) of an Event.
+    '''
+    return list(getattr(event, 'eventDefinitions', [])) + list(getattr(event, 'eventDefinitionRefs', []))
+
+def message_key(message):
+    '''
+    Messages are identified by id at run time, so that a Message or its id can be used indifferently.
+    '''
+    return getattr(message, 'id', message)
+
+def event_codes(event):
+    '''
+    Return the (kind, code) pairs of the Error and Escalation EventDefinitions of an Event,
+    kind being 'error' or 'escalation' and code None for a definition without reference.
+    '''
+    codes = []
+    for definition in event_definitions(event):
+        if isinstance(definition, ErrorEventDefinition):
+            codes.append(('error', getattr(definition.errorRef, 'errorCode', None)))
+        elif isinstance(definition, EscalationEventDefinition):
+            codes.append(('escalation', getattr(definition.escalationRef, 'escalationCode', None)))
+    return codes
+    
+def shadow(table, level):
+    '''
+    Remove from table the entries hidden by the catch-all handlers of a nearer level.
+    '''
+    for kind, code in level:
+        if code is None:
+            for key in [key for key in table if key[0] == kind]:
+                del table[key]
+                
+def node_kind(node):
+    '''
+    Return the behaviour of a FlowNode for the engine :
+        pass: the token goes through the node as soon as it arrives
+        wait: the token waits for an external completion (human work, message)
+        script: the script of the node is executed then the token goes through
+        service: the Operation of the node is invoked (with the other calls of the run) then the token goes through
+        rule: the business rules of the node are evaluated then the token goes through
+        subprocess: an embedded Sub-Process frame is started
+        eventsubprocess: an Event Sub-Process, out of the normal flow
+        call: a frame running the called element is started
+        boundary: a boundary Event, out of the normal flow
+        exclusive: the token takes the first outgoing Sequence Flow whose condition is True
+        parallel: the node waits for all its incoming tokens then fires all its outgoing Sequence Flows
+        terminate: all the tokens of the container are removed
+        throw: the Errors and Escalations of the node are thrown then the token goes through
+        send: the Message of the node is posted on the message bus of the engine then the token goes through
+        compensate: the completed activities are compensated then the token goes through
+    '''
+    if isinstance(node, SubProcess):
+        if node.triggeredByEvent:
+            return 'eventsubprocess'
+        return 'subprocess'
+    if isinstance(node, CallActivity):
+        return 'call'
+    if isinstance(node, ScriptTask):
+        return 'script' if node.script else 'pass'
+    if isinstance(node, (UserTask, ManualTask, ReceiveTask, IntermediateCatchEvent)):
+        return 'wait'
+    if isinstance(node, SendTask):
+        return 'send'
+    if isinstance(node, ServiceTask):
+        return 'service' if node.operationRef is not None else 'pass'
+    if isinstance(node, BusinessRuleTask):
+        return 'rule'
+    if isinstance(node, BoundaryEvent):
+        return 'boundary'
+    if isinstance(node, ExclusiveGateway):
+        return 'exclusive'
+    if isinstance(node, ParallelGateway):
+        return 'parallel'
+    if isinstance(node, (EndEvent, IntermediateThrowEvent)):
+        for definition in event_definitions(node):
+            if isinstance(definition, TerminateEventDefinition):
+                return 'terminate'
+            if isinstance(definition, CompensateEventDefinition):
+                return 'compensate'
+        if event_codes(node):
+            return 'throw'
+        for definition in event_definitions(node):
+            if isinstance(definition, MessageEventDefinition):
+                return 'send'
+    return 'pass'
+
+def extension_value(element, name, default=None):
+    '''
+    Return the value of the extension attribute name of element, or default.
+    '''
+    attributes = getattr(element, 'extensionAttributes', None)
+    if attributes is not None:
+        return attributes.get(name, default=default)
+    for value in getattr(element, 'extensionValues', []):
+        if value.extensionAttributeDefinition.name == name:
+            return value.valueRef if value.extensionAttributeDefinition.isReference else value.value
+    return default
+    
+def audit_entries(auditing, monitoring):
+    '''
+    Return the (channel, sink, transitions) tuple of an Auditing and a Monitoring (either may be None).
+    '''
+    entries = []
+    for channel, hook in (('auditing', auditing), ('monitoring', monitoring)):
+        if hook is not None:
+            transitions = frozenset(hook.transitions) if hook.transitions is not None else None
+            entries.append((channel, hook.sink, transitions))
+    return tuple(entries)
+    
+def compile_expression(expression, mode='eval'):
+    '''
+    Compile the body of a FormalExpression, or return None when the Expression is not executable.
+    '''
+    if not isinstance(expression, FormalExpression) or not expression.body:
+        return None
+    return compile(expression.body, expression.id or '<expression>', mode)
+
+class CompiledProcess(object):
+    '''
+    Flat representation of a FlowElementsContainer (Process or Sub-Process).
+    A CompiledProcess is built once and shared by all the instances running the container.
+    '''
+    def __init__(self, container, depth=0, layout=None):
+        '''
+        container:FlowElementsContainer
+            The Process (or Sub-Process) to compile.
+            
+        nodes:FlowNode list
+            The FlowNodes of the container, the position in the list is the node index.
+            
+        node_index:dict
+            FlowNode id -> node index.
+            
+        kinds:str list
+            Behaviour of each node (see node_kind).
+            
+        flows:SequenceFlow list
+            The SequenceFlows of the container, the position in the list is the flow index.
+            
+        flow_target:int list
+            Target node index of each flow.
+            
+        conditions:code list
+            Compiled conditionExpression of each flow (None when the flow is unconditional).
+            
+        outgoing:tuple list
+            Outgoing flow indexes of each node.
+            
+        incoming:tuple list
+            Incoming flow indexes of each node.
+            
+        default_flow:int list
+            Index of the default flow of each node (None when no default flow).
+            
+        start_nodes:int tuple
+            Indexes of the nodes receiving a token when the container is instantiated.
+            
+        scripts:dict
+            node index -> compiled script of Script Tasks.
+            
+        children:dict
+            node index -> CompiledProcess of embedded Sub-Processes and, once resolved by the engine, of called elements.
+            
+        message_waits:dict
+            Message id -> indexes of the nodes waiting for that Message.
+            
+        message_starts:dict
+            Message id -> (event sub-process node index, start node index in the sub-process, isInterrupting) list.
+            
+        start_messages:dict
+            Message id -> indexes of the Message Start Events instantiating the container on that Message.
+            
+        sends:dict
+            node index -> Message id sent by the node (None when the node has no Message).
+            
+        throws:dict
+            node index -> (kind, code) list of the Errors and Escalations thrown by the node.
+            
+        attached:dict
+            boundary Event node index -> index of the Activity it is attached to.
+            
+        compensations:dict
+            index of a compensable Activity -> index of its compensation handler.
+            
+        compensate_targets:dict
+            index of a compensation throw Event -> index of the Activity to compensate (None for all).
+            
+        handlers:dict list
+            Handler table of each node : (kind, code) -> (up, target, start, interrupting) where
+            up is the number of scopes to climb from the scope of the node,
+            target is the index of the catching boundary Event or Event Sub-Process in that scope,
+            start is the index of the catching Start Event in the Event Sub-Process (None for a boundary Event).
+            The tables cover the whole hierarchy of embedded Sub-Processes, so that finding the handler
+            of an Error is a single lookup per called element.
+            
+        depth:int
+            Number of embedded Sub-Processes between the container and its Process.
+            
+        version:int
+            Version of the process id, numbered by the engine the process is registered to (None for a Sub-Process).
+            
+        layout:VariableLayout
+            Slots of the properties and Data Objects of the container, of its Activities and of its Sub-Processes,
+            shared with its embedded Sub-Processes.
+            
+        mappings:dict
+            node index -> DataMapping of the Activities with Data Associations.
+            
+        caches:dict
+            node index -> lifetime in seconds (None for the default of the cache) of the results of the cacheable Service
+            and Business Rule Tasks, i.e. the ones with a true extension attribute 'cache' (and 'cacheTtl' for the lifetime).
+            
+        cache_inputs:dict
+            node index -> names of the inputs digested in the cache keys of the cacheable tasks.
+            
+        counters:NodeCounters
+            Token counters of the nodes and flows, read by the LoadMonitor.
+            
+        humans:frozenset
+            Indexes of the User Tasks and Manual Tasks, opened as HumanTasks when a TaskList is attached to the engine.
+            
+        audits:dict
+            node index -> (channel, sink, transitions) tuple of the audited and monitored nodes, channel being
+            'auditing' or 'monitoring' and transitions the recorded ones (None for all of them).
+            
+        audit:tuple
+            (channel, sink, transitions) of the container itself.
+        '''
+        super(CompiledProcess, self).__init__()
+        self.container = container
+        self.id = container.id
+        self.nodes = []
+        self.node_index = {}
+        self.kinds = []
+        self.flows = []
+        self.flow_target = []
+        self.conditions = []
+        self.outgoing = []
+        self.incoming = []
+        self.default_flow = []
+        self.start_nodes = ()
+        self.scripts = {}
+        self.children = {}
+        self.message_waits = {}
+        self.message_starts = {}
+        self.start_messages = {}
+        self.sends = {}
+        self.throws = {}
+        self.attached = {}
+        self.compensations = {}
+        self.compensate_targets = {}
+        self.handlers = []
+        self.depth = depth
+        self.version = None
+        self.layout = layout if layout is not None else VariableLayout()
+        self.mappings = {}
+        self.caches = {}
+        self.cache_inputs = {}
+        self.humans = frozenset()
+        self.audits = {}
+        self.audit = ()
+        
+        self._compile_nodes()
+        self._compile_flows()
+        self.counters = NodeCounters(len(self.nodes), self.incoming)
+        self._compile_properties()
+        self._compile_mappings()
+        self._compile_caches()
+        self._compile_children()
+        self._compile_compensations()
+        self._compile_messages()
+        self.start_nodes = tuple(self._start_nodes())
+        if depth == 0:
+            self._compile_handlers()
+            self._compile_audits()
+        
+    def _compile_nodes(self):
+        for element in self.container.flowElements:
+            if isinstance(element, FlowNode):
+                self.node_index[element.id] = len(self.nodes)
+                self.nodes.append(element)
+                self.kinds.append(node_kind(element))
+        for index, node in enumerate(self.nodes):
+            if self.kinds[index] == 'script':
+                if node.scriptFormat not in PythonFormats:
+                    raise EngineError('Script format %s of %s is not supported'%(node.scriptFormat, node.id))
+                self.scripts[index] = compile(node.script, node.id, 'exec')
+            elif self.kinds[index] == 'throw':
+                self.throws[index] = event_codes(node)
+            elif self.kinds[index] == 'boundary':
+                self.attached[index] = self.node_index[node.attachedToRef.id]
+            if self.kinds[index] in ('service', 'rule') and extension_value(node, 'cache'):
+                self.caches[index] = extension_value(node, 'cacheTtl')
+        self.humans = frozenset(index for index, node in enumerate(self.nodes) if isinstance(node, (UserTask, ManualTask)))
+        for index, node in enumerate(self.nodes):
+            for boundary in getattr(node, 'boundaryEventRefs', []):
+                self.attached[self.node_index[boundary.id]] = index
+                
+    def _compile_flows(self):
+        outgoing = [[] for node in self.nodes]
+        incoming = [[] for node in self.nodes]
+        flow_index = {}
+        for element in self.container.flowElements:
+            if isinstance(element, SequenceFlow):
+                index = len(self.flows)
+                source = self.node_index[element.sourceRef.id]
+                target = self.node_index[element.targetRef.id]
+                flow_index[element.id] = index
+                self.flows.append(element)
+                self.flow_target.append(target)
+                self.conditions.append(compile_expression(element.conditionExpression))
+                outgoing[source].append(index)
+                incoming[target].append(index)
+        self.outgoing = [tuple(flows) for flows in outgoing]
+        self.incoming = [tuple(flows) for flows in incoming]
+        for node in self.nodes:
+            default = getattr(node, 'default', None)
+            self.default_flow.append(flow_index[default.id] if default is not None else None)
+            
+    def _compile_properties(self):
+        layout = self.layout
+        for property in getattr(self.container, 'properties', []):
+            layout.add(property.name, property.itemSubjectRef)
+        for element in self.container.flowElements:
+            if isinstance(element, DataObject):
+                layout.add(element.name, element.itemSubjectRef)
+        for index, node in enumerate(self.nodes):
+            if self.kinds[index] not in ('subprocess', 'eventsubprocess'):
+                for property in getattr(node, 'properties', []):
+                    layout.add(property.name, property.itemSubjectRef)
+        
+    def _compile_mappings(self):
+        '''
+        The data inputs and outputs of an Activity are the ones of its ioSpecification, completed by the
+        targets of its DataInputAssociations and the sources of its DataOutputAssociations.
+        Any other ItemAwareElement is a variable of the scope of the Activity, found by name.
+        '''
+        for index, node in enumerate(self.nodes):
+            inputs = getattr(node, 'dataInputAssociations', [])
+            outputs = getattr(node, 'dataOutputAssociations', [])
+            if not inputs and not outputs:
+                continue
+            layout = VariableLayout()
+            specification = getattr(node, 'ioSpecification', None)
+            data_inputs = list(getattr(specification, 'dataInputs', []))
+            data_outputs = list(getattr(specification, 'dataOutputs', []))
+            data_inputs.extend(association.targetRef for association in inputs)
+            for association in outputs:
+                data_outputs.extend(association.sourceRef)
+            mapping = DataMapping(layout,
+                                  [(element.name, layout.add(element.name, element.itemSubjectRef)) for element in data_inputs],
+                                  [(element.name, layout.add(element.name, element.itemSubjectRef)) for element in data_outputs])
+            for association in inputs:
+                self._compile_association(node, association, self.layout, layout,
+                                          mapping.input_copies, mapping.input_expressions)
+            for association in outputs:
+                self._compile_association(node, association, layout, self.layout,
+                                          mapping.output_copies, mapping.output_expressions)
+            self.mappings[index] = mapping
+            
+    def _compile_caches(self):
+        '''
+        The inputs of a cacheable task are its data inputs when it has Data Associations, else the DataInputs of its
+        ioSpecification, else the fields of the Message of its Operation (an ItemDefinition whose structureRef is a dict).
+        A task whose inputs are not declared is not cached : its result could depend on any variable of its scope.
+        '''
+        for index in list(self.caches):
+            node = self.nodes[index]
+            if index in self.mappings:
+                names = [name for name, slot in self.mappings[index].inputs]
+            else:
+                names = [data.name for data in getattr(getattr(node, 'ioSpecification', None), 'dataInputs', [])]
+                if not names:
+                    message = getattr(getattr(node, 'operationRef', None), 'inMessageRef', None)
+                    structure = getattr(getattr(message, 'itemRef', None), 'structureRef', None)
+                    if isinstance(structure, dict):
+                        names = list(structure)
+            if names:
+                self.cache_inputs[index] = tuple(sorted(set(names)))
+            else:
+                del self.caches[index]
+                
+    def _compile_association(self, node, association, source, target, copies, expressions):
+        '''
+        An association with a single source and neither transformation nor assignment is a slot copy;
+        its transformation and assignments are compiled against the names of source.
+        '''
+        transformation = compile_expression(association.transformation)
+        target_slot = target.add(association.targetRef.name, association.targetRef.itemSubjectRef)
+        if transformation is not None:
+            expressions.append((transformation, target_slot))
+        elif len(association.sourceRef) == 1:
+            element = association.sourceRef[0]
+            copies.append((source.add(element.name, element.itemSubjectRef), target_slot))
+        elif association.sourceRef:
+            raise EngineError('Data Association %s of %s has several sources and no transformation'%(association.id, node.id))
+        for assignment in association.assignment:
+            code = compile_expression(assignment.from_)
+            name = getattr(assignment.to, 'body', None)
+            if code is None or not name:
+                raise EngineError('Assignment %s of %s is not executable'%(assignment.id, node.id))
+            expressions.append((code, target.add(name.strip())))
+            
+    def _compile_children(self):
+        for index, kind in enumerate(self.kinds):
+            if kind in ('subprocess', 'eventsubprocess'):
+                self.children[index] = CompiledProcess(self.nodes[index], self.depth + 1, self.layout)
+                
+    def _compile_compensations(self):
+        '''
+        A compensable Activity has a compensation boundary Event associated to its handler (an Activity with isForCompensation).
+        '''
+        handlers = {}
+        for artifact in getattr(self.container, 'artifacts', []):
+            if isinstance(artifact, Association):
+                handlers[artifact.sourceRef.id] = artifact.targetRef.id
+        for boundary, activity in self.attached.items():
+            node = self.nodes[boundary]
+            for definition in event_definitions(node):
+                if isinstance(definition, CompensateEventDefinition) and node.id in handlers:
+                    self.compensations[activity] = self.node_index[handlers[node.id]]
+        for index, kind in enumerate(self.kinds):
+            if kind != 'compensate':
+                continue
+            self.compensate_targets[index] = None
+            for definition in event_definitions(self.nodes[index]):
+                if isinstance(definition, CompensateEventDefinition) and definition.activityRef is not None:
+                    self.compensate_targets[index] = self.node_index[definition.activityRef.id]
+                    
+    def _compile_messages(self):
+        for index, node in enumerate(self.nodes):
+            if self.kinds[index] == 'send':
+                messages = [getattr(node, 'messageRef', None)]
+                messages.extend(definition.messageRef for definition in event_definitions(node)
+                                if isinstance(definition, MessageEventDefinition))
+                messages = [message for message in messages if message is not None]
+                self.sends[index] = message_key(messages[0]) if messages else None
+            elif isinstance(node, StartEvent):
+                for definition in event_definitions(node):
+                    if isinstance(definition, MessageEventDefinition) and definition.messageRef is not None:
+                        self.start_messages.setdefault(message_key(definition.messageRef), []).append(index)
+        for index, node in enumerate(self.nodes):
+            if self.kinds[index] != 'wait':
+                continue
+            messages = [getattr(node, 'messageRef', None)]
+            messages.extend(definition.messageRef for definition in event_definitions(node)
+                            if isinstance(definition, MessageEventDefinition))
+            for message in messages:
+                if message is not None:
+                    self.message_waits.setdefault(message_key(message), []).append(index)
+        for index, kind in enumerate(self.kinds):
+            if kind != 'eventsubprocess':
+                continue
+            child = self.children[index]
+            for start, node in enumerate(child.nodes):
+                if not isinstance(node, StartEvent):
+                    continue
+                for definition in event_definitions(node):
+                    if isinstance(definition, MessageEventDefinition) and definition.messageRef is not None:
+                        self.message_starts.setdefault(message_key(definition.messageRef), []).append(
+                            (index, start, node.isInterrupting))
+                        
+    def _compile_handlers(self, outer=None):
+        '''
+        Build the handler tables of the nodes from the handlers visible from the activity containing the container (outer),
+        then the ones of the Event Sub-Processes of the container, then the boundary Events of each node.
+        Nearer handlers override farther ones.
+        '''
+        base = {}
+        if outer:
+            for key, (up, target, start, interrupting) in outer.items():
+                base[key] = (up + 1, target, start, interrupting)
+        level = {}
+        for index, kind in enumerate(self.kinds):
+            if kind != 'eventsubprocess':
+                continue
+            for start, node in enumerate(self.children[index].nodes):
+                if isinstance(node, StartEvent):
+                    for key in event_codes(node):
+                        level[key] = (0, index, start, key[0] == 'error' or node.isInterrupting)
+        shadow(base, level)
+        base.update(level)
+        
+        boundaries = {}
+        for boundary, activity in self.attached.items():
+            node = self.nodes[boundary]
+            for key in event_codes(node):
+                interrupting = key[0] == 'error' or node.cancelActivity
+                boundaries.setdefault(activity, {})[key] = (0, boundary, None, interrupting)
+        self.handlers = [base] * len(self.nodes)
+        for activity, level in boundaries.items():
+            table = dict(base)
+            shadow(table, level)
+            table.update(level)
+            self.handlers[activity] = table
+            
+        for index, child in self.children.items():
+            child._compile_handlers(self.handlers[index])
+            
+    def _compile_audits(self, outer=(None, None)):
+        '''
+        The Auditing and Monitoring of an element default to the ones of its container, and so on up to the Process.
+        '''
+        hooks = (self.container.auditing or outer[0], self.container.monitoring or outer[1])
+        self.audit = audit_entries(*hooks)
+        for index, node in enumerate(self.nodes):
+            entries = audit_entries(node.auditing or hooks[0], node.monitoring or hooks[1])
+            if entries:
+                self.audits[index] = entries
+        for index, child in self.children.items():
+            if child.depth:
+                child._compile_audits(hooks)
+                
+    def _start_nodes(self):
+        '''
+        The None Start Events of the container are instantiated with it.
+        Without Start Event, all the nodes without incoming Sequence Flow are instantiated with the container.
+        '''
+        starts = [index for index, node in enumerate(self.nodes) if isinstance(node, StartEvent)]
+        if starts:
+            for index in starts:
+                if not event_definitions(self.nodes[index]):
+                    yield index
+            return
+        for index, node in enumerate(self.nodes):
+            if self.incoming[index] or self.kinds[index] in ('eventsubprocess', 'boundary'):
+                continue
+            if getattr(node, 'isForCompensation', False):
+                continue
+            yield index
+            
+    def initial_variables(self, variables=None):
+        '''
+        Return the Variables of a new scope holding the defaults of the container overridden by variables.
+        '''
+        return self.layout.new(variables)
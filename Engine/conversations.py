@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Runtime of Conversations.
+
+A ConversationInstance groups the process instances exchanging the Messages of one ConversationNode.
+The CorrelationKeys of a Conversation are only extracted from the payload of the Messages until the conversation is known :
+the instances taking part in a ConversationInstance are then bound to it, so that their next Messages are
+correlated by a single lookup on (ConversationNode, instance), without evaluating any retrieval Expression.
+A ConversationInstance is closed as soon as the last of its instances ends.
+'''
+
+from itertools import count
+
+from Engine.compiler import message_key, compile_expression
+from Conversation.models import CallConversation, SubConversation
+
+class ConversationInstance(object):
+    '''
+    An active Conversation between process instances.
+    '''
+    __slots__ = ('id', 'node', 'keys', 'instances')
+    
+    def __init__(self, id, node):
+        '''
+        id:int
+            Identifier of the conversation, unique within a ConversationRuntime.
+            
+        node:ConversationNode
+            The Conversation, SubConversation or CallConversation carried out.
+            
+        keys:set
+            (CorrelationKey id, values) of the conversation.
+            
+        instances:dict
+            Participant id -> ProcessInstance taking part in the conversation.
+        '''
+        self.id = id
+        self.node = node
+        self.keys = set()
+        self.instances = {}
+        
+    def __repr__(self):
+        return '<ConversationInstance %s of %s>'%(self.id, self.node.id)
+        
+class ConversationRuntime(object):
+    '''
+    Correlation of the Messages of Collaborations to ConversationInstances.
+    '''
+    def __init__(self):
+        '''
+        flows:dict
+            MessageFlow id -> ConversationNode grouping it.
+            
+        extractors:dict
+            (ConversationNode id, Message id) -> (CorrelationKey id, compiled messagePaths) list
+            of the CorrelationKeys that can be extracted from that Message.
+            
+        by_key:dict
+            (ConversationNode id, CorrelationKey id, values) -> ConversationInstance.
+            
+        by_instance:dict
+            (ConversationNode id, ProcessInstance id) -> ConversationInstance.
+            
+        active:dict
+            ConversationInstance id -> ConversationInstance.
+            
+        joined:dict
+            ProcessInstance id -> the ConversationInstances it is bound to.
+            
+        extractions:int
+            Number of payloads the CorrelationKeys have been extracted from.
+        '''
+        super(ConversationRuntime, self).__init__()
+        self.flows = {}
+        self.extractors = {}
+        self.by_key = {}
+        self.by_instance = {}
+        self.active = {}
+        self.joined = {}
+        self.extractions = 0
+        self._ids = count(1)
+        
+    def add(self, collaboration):
+        '''
+        Compile the ConversationNodes of collaboration.
+        '''
+        for node in collaboration.conversations:
+            self._add_node(node, collaboration.correlationKeys)
+            
+    def _add_node(self, node, keys):
+        '''
+        A SubConversation without CorrelationKeys correlates with the keys of its parent.
+        The Message Flows of the Collaboration called by a CallConversation belong to the CallConversation.
+        '''
+        keys = node.correlationKeys or keys
+        flows = node.messageFlowRefs
+        if isinstance(node, CallConversation) and node.calledCollaborationRef is not None:
+            flows = node.calledCollaborationRef.messageFlow
+        for flow in flows:
+            self.flows[flow.id] = node
+        for key in keys:
+            paths = {}
+            for property in key.correlationPropertyRef:
+                for retrieval in property.correlationPropertyRetrievalExpression:
+                    paths.setdefault(message_key(retrieval.messageRef), []).append(compile_expression(retrieval.messagePath))
+            for message, codes in paths.items():
+                if len(codes) == len(key.correlationPropertyRef) and None not in codes:
+                    self.extractors.setdefault((node.id, message), []).append((key.id, tuple(codes)))
+        if isinstance(node, SubConversation):
+            for child in node.conversationNodes:
+                self._add_node(child, keys)
+                
+    def correlate(self, flow, message, payload, sender=None, participant=None):
+        '''
+        Return the ConversationInstance of a Message going down flow (None if flow is not part of a Conversation),
+        starting a new one when neither the sender nor the CorrelationKeys of the payload are known.
+        
+        flow:str
+            Id of the MessageFlow.
+            
+        message:str
+            Id of the Message.
+            
+        payload:dict|Variables
+            Content of the Message, the CorrelationKeys are extracted from it.
+            
+        sender:ProcessInstance
+            The instance sending the Message, bound to the conversation as participant.
+        '''
+        node = self.flows.get(flow)
+        if node is None:
+            return None
+        if sender is not None:
+            conversation = self.by_instance.get((node.id, sender.id))
+            if conversation is not None:
+                return conversation
+        keys = self._extract(node, message, payload)
+        conversation = None
+        for key in keys:
+            conversation = self.by_key.get(key)
+            if conversation is not None:
+                break
+        if conversation is None:
+            conversation = ConversationInstance(next(self._ids), node)
+            self.active[conversation.id] = conversation
+        for key in keys:
+            if key not in conversation.keys:
+                conversation.keys.add(key)
+                self.by_key[key] = conversation
+        if sender is not None and participant is not None:
+            self.bind(conversation, participant, sender)
+        return conversation
+        
+    def _extract(self, node, message, payload):
+        extractors = self.extractors.get((node.id, message))
+        if not extractors or payload is None:
+            return []
+        self.extractions += 1
+        keys = []
+        for key, codes in extractors:
+            try:
+                values = tuple(eval(code, {}, payload) for code in codes)
+            except (NameError, KeyError):
+                continue
+            keys.append((node.id, key, values))
+        return keys
+        
+    def bind(self, conversation, participant, instance):
+        '''
+        Make instance the process instance of participant in conversation (reopening conversation if it was closed
+        while a Message of it was still queued).
+        '''
+        conversation.instances[participant] = instance
+        self.by_instance[(conversation.node.id, instance.id)] = conversation
+        self.joined.setdefault(instance.id, []).append(conversation)
+        if conversation.id not in self.active:
+            self.active[conversation.id] = conversation
+            for key in conversation.keys:
+                self.by_key.setdefault(key, conversation)
+        
+    def close(self, conversation):
+        '''
+        Forget conversation and its cached keys.
+        '''
+        self.active.pop(conversation.id, None)
+        for key in conversation.keys:
+            if self.by_key.get(key) is conversation:
+                del self.by_key[key]
+        for instance in conversation.instances.values():
+            if self.by_instance.get((conversation.node.id, instance.id)) is conversation:
+                del self.by_instance[(conversation.node.id, instance.id)]
+            joined = self.joined.get(instance.id)
+            if joined is not None and conversation in joined:
+                joined.remove(conversation)
+                if not joined:
+                    del self.joined[instance.id]
+                    
+    def ended(self, instance):
+        '''
+        Close the conversations of instance whose other instances have ended too (see Engine.ended).
+        '''
+        for conversation in self.joined.pop(instance.id, ()):
+            if not any(other.state == 'Active' for other in conversation.instances.values()):
+                self.close(conversation)
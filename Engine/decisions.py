@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Decision tables evaluated by Business Rule Tasks.
+
+A DecisionTable is registered in Engine.rules under the id or the implementation of the Business Rule Tasks using it.
+The rules of a table are compiled per input column into indexes giving, for an input value, the set of the rules
+it satisfies as a bitset (an int, bit i standing for rule i) :
+    - a hash index for equality and membership conditions,
+    - an interval index, the sorted bounds of the intervals splitting the axis into regions, each region holding
+      the rules whose interval covers it : the region of a value is found by bisection,
+    - the rules without condition on the column.
+Matching an input is one lookup per column and an intersection of bitsets, whatever the number of rules.
+'''
+
+from bisect import bisect_left
+
+from Core.Common.models import FormalExpression
+from Core.Common.ErrorModels import EngineError
+from Engine.compiler import compile_expression
+
+HitPolicy = ['FIRST', 'UNIQUE', 'ANY', 'COLLECT']
+
+class Interval(object):
+    '''
+    Condition of a rule satisfied by the values between low and high.
+    '''
+    __slots__ = ('low', 'high', 'low_closed', 'high_closed')
+    
+    def __init__(self, low=None, high=None, low_closed=True, high_closed=False):
+        '''
+        low:object (default=None)
+        
+        high:object (default=None)
+            Bounds of the interval, None for no bound.
+            
+        low_closed:bool (default=True)
+        
+        high_closed:bool (default=False)
+            Whether the bounds belong to the interval.
+        '''
+        self.low = low
+        self.high = high
+        self.low_closed = low_closed
+        self.high_closed = high_closed
+        
+    def __repr__(self):
+        return '%s%s..%s%s'%('[' if self.low_closed else '(', self.low, self.high, ']' if self.high_closed else ')')
+        
+class ColumnIndex(object):
+    '''
+    Index of the conditions of the rules on one input column.
+    '''
+    def __init__(self, conditions):
+        '''
+        conditions:list
+            Condition of each rule : None for any value, an Interval, a set/frozenset/list of accepted values,
+            or the accepted value.
+        '''
+        super(ColumnIndex, self).__init__()
+        self.any = 0
+        self.equal = {}
+        intervals = {}
+        for rule, condition in enumerate(conditions):
+            bit = 1 << rule
+            if condition is None:
+                self.any |= bit
+            elif isinstance(condition, Interval):
+                key = (condition.low, condition.high, condition.low_closed, condition.high_closed)
+                intervals[key] = intervals.get(key, 0) | bit
+            elif isinstance(condition, (set, frozenset, list, tuple)):
+                for value in condition:
+                    self.equal[value] = self.equal.get(value, 0) | bit
+            else:
+                self.equal[condition] = self.equal.get(condition, 0) | bit
+        self.bounds = []
+        self.regions = []
+        if intervals:
+            self._index_intervals(intervals)
+            
+    def _index_intervals(self, intervals):
+        '''
+        The bounds b0 < b1 < ... < bn-1 split the axis into 2n+1 regions : region 2i is the gap before bi,
+        region 2i+1 is the point bi and region 2n the gap after bn-1.
+        Distinct intervals hold distinct rules (a rule has one condition per column) : their bitsets are disjoint,
+        so that the rules of each region are obtained by a prefix sum over the starts and ends of the intervals.
+        '''
+        bounds = sorted(set(bound for low, high, low_closed, high_closed in intervals
+                            for bound in (low, high) if bound is not None))
+        position = dict((bound, index) for index, bound in enumerate(bounds))
+        size = 2 * len(bounds) + 1
+        delta = [0] * (size + 1)
+        for (low, high, low_closed, high_closed), rules in intervals.items():
+            if low is None:
+                start = 0
+            else:
+                start = 2 * position[low] + (1 if low_closed else 2)
+            if high is None:
+                end = size
+            else:
+                end = 2 * position[high] + (2 if high_closed else 1)
+            if start < end:
+                delta[start] += rules
+                delta[end] -= rules
+        regions = []
+        current = 0
+        for region in range(size):
+            current += delta[region]
+            regions.append(current)
+        self.bounds = bounds
+        self.regions = regions
+        
+    def match(self, value):
+        '''
+        Return the bitset of the rules satisfied by value.
+        '''
+        rules = self.any
+        try:
+            rules |= self.equal.get(value, 0)
+        except TypeError:
+            pass
+        if self.bounds and value is not None:
+            index = bisect_left(self.bounds, value)
+            if index < len(self.bounds) and self.bounds[index] == value:
+                rules |= self.regions[2 * index + 1]
+            else:
+                rules |= self.regions[2 * index]
+        return rules
+        
+class DecisionTable(object):
+    '''
+    Decision table : the first (or every) rule whose conditions are all satisfied by the inputs gives the outputs.
+    '''
+    def __init__(self, inputs, outputs, rules, hitPolicy='FIRST'):
+        '''
+        inputs:list
+            Input of each column : the name of a variable, or a FormalExpression evaluated with the inputs of the task.
+            
+        outputs:str list
+            Name of each output.
+            
+        rules:(conditions, output values) list
+            The rules in priority order, with one condition per input (see ColumnIndex) and one value per output.
+            
+        hitPolicy:HitPolicy enum (default='FIRST') {'FIRST'|'UNIQUE'|'ANY'|'COLLECT'}
+            FIRST: the outputs of the first matching rule.
+            UNIQUE: the outputs of the matching rule, several matching rules are an error.
+            ANY: the outputs of the matching rules, which must be the same.
+            COLLECT: the list of the values of each output in the matching rules.
+        '''
+        super(DecisionTable, self).__init__()
+        if hitPolicy not in HitPolicy:
+            raise EngineError('hitPolicy %s is not a HitPolicy'%hitPolicy)
+        for conditions, values in rules:
+            if len(conditions) != len(inputs) or len(values) != len(outputs):
+                raise EngineError('Rule %r does not match the columns of the table'%((conditions, values),))
+        self.inputs = [compile_expression(input) if isinstance(input, FormalExpression) else input for input in inputs]
+        self.outputs = list(outputs)
+        self.values = [tuple(values) for conditions, values in rules]
+        self.hitPolicy = hitPolicy
+        self.all = (1 << len(rules)) - 1
+        self.columns = [ColumnIndex([conditions[column] for conditions, values in rules]) for column in range(len(inputs))]
+        
+    def __call__(self, variables):
+        return self.evaluate(variables)
+        
+    def read(self, variables):
+        '''
+        Return the value of each input column in variables.
+        '''
+        return [variables.get(input) if isinstance(input, basestring) else eval(input, {}, variables)
+                for input in self.inputs]
+                
+    def evaluate(self, variables):
+        '''
+        Return the outputs of the table for variables (a mapping), as a dict (None when no rule matches).
+        '''
+        rules = self.all
+        for column, value in zip(self.columns, self.read(variables)):
+            rules &= column.match(value)
+            if not rules:
+                break
+        return self.result(rules)
+        
+    def evaluate_many(self, variables_list):
+        '''
+        Return the outputs of the table for each item of variables_list.
+        Each column is matched once per distinct input value of the batch.
+        '''
+        rows = [self.read(variables) for variables in variables_list]
+        masks = [self.all] * len(rows)
+        for column_index, column in enumerate(self.columns):
+            matched = {}
+            for row, values in enumerate(rows):
+                if not masks[row]:
+                    continue
+                value = values[column_index]
+                try:
+                    rules = matched.get(value)
+                    if rules is None:
+                        rules = matched[value] = column.match(value)
+                except TypeError:
+                    rules = column.match(value)
+                masks[row] &= rules
+        return [self.result(rules) for rules in masks]
+        
+    def result(self, rules):
+        if not rules:
+            return None
+        first = (rules & -rules).bit_length() - 1
+        if self.hitPolicy == 'FIRST':
+            return dict(zip(self.outputs, self.values[first]))
+        matching = [rule for rule in range(first, rules.bit_length()) if rules >> rule & 1]
+        if self.hitPolicy == 'COLLECT':
+            return dict((output, [self.values[rule][index] for rule in matching])
+                        for index, output in enumerate(self.outputs))
+        if self.hitPolicy == 'UNIQUE' and len(matching) > 1:
+            raise EngineError('Rules %s of a UNIQUE table match the same inputs'%matching)
+        if self.hitPolicy == 'ANY' and len(set(self.values[rule] for rule in matching)) > 1:
+            raise EngineError('Rules %s of an ANY table give different outputs'%matching)
+        return dict(zip(self.outputs, self.values[first]))
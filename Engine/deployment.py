@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Deployment of versioned Definitions.
+
+Each deploy of Definitions under a key creates a new Deployment version, compiled and validated by a background worker :
+the request path never compiles. Once compiled, the version is published to the engine by the thread driving it
+(see DeploymentManager.publish) and, when activated, becomes the active version of its key in a single assignment,
+so that the next starts use it while the running instances go on with the CompiledProcess they were started with.
+The previous active version is then draining : the manager counts the running instances of each version through the
+hooks of the engine (Engine.started, Engine.ended, Engine.migrated), and unloads a draining version from the engine
+as soon as its last instance ends.
+
+Deployment statuses (see TODO) :
+    - DEV, INT, PROD : the active version can be started,
+    - SIMU : the active version can only be simulated (see Engine.simulation),
+    - STOPPED : no new instance, the running ones go on.
+'''
+
+from collections import deque
+from multiprocessing.pool import ThreadPool
+from threading import Event, Lock
+
+from Core.Common.ErrorModels import EngineError
+from Process.models import Process
+from Engine.compiler import CompiledProcess
+from Engine.simulation import Simulation
+from Engine.forms import FormCache
+
+DeploymentStatus = ['DEV', 'INT', 'SIMU', 'PROD', 'STOPPED']
+
+class Deployment(object):
+    '''
+    A version of Definitions deployed under a key.
+    '''
+    def __init__(self, key, version, definitions, status):
+        '''
+        key:str
+            Name of the deployed application, shared by its versions.
+            
+        version:int
+            Version number, from 1.
+            
+        definitions:Definitions
+            The deployed Definitions.
+            
+        status:DeploymentStatus enum {'DEV'|'INT'|'SIMU'|'PROD'|'STOPPED'}
+        
+        state:str {'Compiling'|'Ready'|'Failed'|'Active'|'Draining'|'Unloaded'}
+            Stage of the version in its lifecycle.
+            
+        live:int
+            Number of running instances of the version.
+            
+        activating:bool
+            Whether the version is activated once published.
+            
+        processes:dict
+            Process id -> Process of the Definitions.
+            
+        compiled:dict
+            Process -> CompiledProcess of the version (called elements included).
+            
+        error:Exception
+            The compilation or validation error of a Failed version.
+        '''
+        super(Deployment, self).__init__()
+        self.key = key
+        self.version = version
+        self.definitions = definitions
+        self.status = status
+        self.state = 'Compiling'
+        self.processes = dict((element.id, element) for element in definitions.rootElements if isinstance(element, Process))
+        self.compiled = {}
+        self.live = 0
+        self.error = None
+        self.activating = False
+        self.ready = Event()
+        
+    def __repr__(self):
+        return '<Deployment %s v%s %s (%s)>'%(self.key, self.version, self.status, self.state)
+        
+class DeploymentManager(object):
+    '''
+    Versions of the Definitions deployed on an engine.
+    '''
+    def __init__(self, engine, workers=1):
+        '''
+        engine:Engine
+            The engine running the instances.
+            
+        workers:int (default=1)
+            Number of background compilation threads.
+            
+        deployments:dict
+            key -> Deployment list, oldest version first.
+            
+        active:dict
+            key -> active Deployment.
+            
+        forms:FormCache
+            Form schemas of the User Tasks, built when their version is compiled.
+            
+        versions:dict
+            CompiledProcess -> the published Deployment it belongs to.
+            
+        compiled:deque
+            Deployments compiled by the workers and not yet published.
+        '''
+        super(DeploymentManager, self).__init__()
+        self.engine = engine
+        self.workers = workers
+        self.deployments = {}
+        self.active = {}
+        self.forms = FormCache()
+        self.versions = {}
+        self.compiled = deque()
+        self._pool = None
+        self._lock = Lock()
+        engine.started.append(self._started)
+        engine.ended.append(self._ended)
+        engine.migrated.append(self._migrated)
+        
+    ##########################################################
+    # Deployment
+    
+    def deploy(self, definitions, status='DEV', key=None, activate=True, wait=False):
+        '''
+        Create a new version of definitions under key (by default, the id of the Definitions), compile it in the background
+        and activate it once published (if activate). Return the Deployment at once (or once published, if wait).
+        '''
+        if status not in DeploymentStatus:
+            raise EngineError('Unknown deployment status %s'%status)
+        key = key or definitions.id or definitions.name
+        with self._lock:
+            versions = self.deployments.setdefault(key, [])
+            deployment = Deployment(key, len(versions) + 1, definitions, status)
+            deployment.activating = activate
+            versions.append(deployment)
+            if self._pool is None:
+                self._pool = ThreadPool(self.workers)
+        self._pool.apply_async(self._compile, (deployment,))
+        if wait:
+            self.wait(deployment)
+        return deployment
+        
+    def wait(self, deployment, timeout=None):
+        '''
+        Wait for the compilation of deployment and publish it, raise its error if it failed.
+        '''
+        deployment.ready.wait(timeout)
+        self.publish()
+        if deployment.error is not None:
+            raise deployment.error
+        return deployment
+        
+    def publish(self):
+        '''
+        Publish the compiled versions to the engine and activate the ones deployed to be activated.
+        Called by the thread driving the engine (the other methods of the manager call it) : the workers never
+        change the engine.
+        '''
+        compiled = self.compiled
+        while compiled:
+            deployment = compiled.popleft()
+            if deployment.error is not None:
+                continue
+            for process, version in deployment.compiled.items():
+                self.engine.register(process, version)
+            for process in deployment.processes.values():
+                self.versions[deployment.compiled[process]] = deployment
+            deployment.state = 'Ready'
+            if deployment.activating:
+                self.activate(deployment)
+                
+    def _compile(self, deployment):
+        '''
+        Compile deployment in a worker, then queue it to be published.
+        '''
+        try:
+            for process in deployment.processes.values():
+                compiled = deployment.compiled[process] = CompiledProcess(process)
+                if not compiled.start_nodes and not compiled.start_messages:
+                    raise EngineError('Process %s has no start node'%process.id)
+            for compiled in list(deployment.compiled.values()):
+                self._resolve(deployment, compiled)
+            self.forms.precompute(deployment.compiled.values())
+        except Exception as error:
+            deployment.error = error
+            deployment.state = 'Failed'
+        self.compiled.append(deployment)
+        deployment.ready.set()
+        
+    def _resolve(self, deployment, compiled):
+        '''
+        Compile the elements called by compiled and its Sub-Processes ahead of the first call.
+        '''
+        for node, kind in enumerate(compiled.kinds):
+            if kind == 'call' and node not in compiled.children:
+                called = compiled.nodes[node].calledElementRef
+                if called is None:
+                    raise EngineError('Call Activity %s has no calledElementRef'%compiled.nodes[node].id)
+                child = deployment.compiled.get(called)
+                if child is None:
+                    child = deployment.compiled[called] = CompiledProcess(called)
+                    self._resolve(deployment, child)
+                compiled.children[node] = child
+        for child in compiled.children.values():
+            if child.depth:
+                self._resolve(deployment, child)
+                
+    def activate(self, deployment):
+        '''
+        Make the Ready deployment the active version of its key, the previous one draining.
+        '''
+        self.publish()
+        if deployment.state not in ('Ready', 'Draining'):
+            raise EngineError('%r cannot be activated'%deployment)
+        with self._lock:
+            previous = self.active.get(deployment.key)
+            deployment.state = 'Active'
+            self.active[deployment.key] = deployment
+            if previous is not None and previous is not deployment:
+                previous.state = 'Draining'
+        if previous is not None and previous is not deployment and not previous.live:
+            self._unload(previous)
+        
+    def status(self, key, status):
+        '''
+        Change the status of the active version of key.
+        '''
+        if status not in DeploymentStatus:
+            raise EngineError('Unknown deployment status %s'%status)
+        self._active(key).status = status
+        
+    def _active(self, key):
+        self.publish()
+        deployment = self.active.get(key)
+        if deployment is None:
+            raise EngineError('No active version of %s'%key)
+        return deployment
+        
+    ##########################################################
+    # Instances
+    
+    def process(self, key, process_id):
+        '''
+        Return the Process process_id of the active version of key, if it can be started.
+        '''
+        deployment = self._active(key)
+        if deployment.status in ('SIMU', 'STOPPED'):
+            raise EngineError('%s is in %s status, it cannot be started'%(key, deployment.status))
+        return deployment.processes[process_id]
+        
+    def start(self, key, process_id, variables=None, message=None):
+        return self.engine.start(self.process(key, process_id), variables, message)
+        
+    def start_many(self, key, process_id, variables_iterable, message=None):
+        return self.engine.start_many(self.process(key, process_id), variables_iterable, message)
+        
+    def simulate(self, key, process_id, arrivals, **kwargs):
+        '''
+        Return the Simulation of the Process process_id of the active version of key (see Engine.simulation.Simulation).
+        '''
+        deployment = self._active(key)
+        if deployment.status == 'STOPPED':
+            raise EngineError('%s is STOPPED'%key)
+        return Simulation(deployment.processes[process_id], arrivals, **kwargs)
+        
+    def _started(self, instances):
+        if not instances:
+            return
+        deployment = self.versions.get(instances[0].process)
+        if deployment is not None:
+            deployment.live += len(instances)
+            
+    def _ended(self, instance):
+        deployment = self.versions.get(instance.process)
+        if deployment is not None:
+            deployment.live -= 1
+            if not deployment.live and deployment.state == 'Draining':
+                self._unload(deployment)
+                
+    def _migrated(self, instances, source, target):
+        self._started(instances)
+        deployment = self.versions.get(source)
+        if deployment is not None:
+            deployment.live -= len(instances)
+            if not deployment.live and deployment.state == 'Draining':
+                self._unload(deployment)
+                
+    def drain(self):
+        '''
+        Unload from the engine the draining versions without running instances. Return them.
+        Draining versions are unloaded as their last instance ends : drain only unloads the ones which had no instance.
+        '''
+        draining = [deployment for versions in self.deployments.values() for deployment in versions
+                    if deployment.state == 'Draining' and not deployment.live]
+        for deployment in draining:
+            self._unload(deployment)
+        return draining
+        
+    def _unload(self, deployment):
+        engine = self.engine
+        for process, compiled in deployment.compiled.items():
+            if engine.compiled.get(process) is compiled:
+                del engine.compiled[process]
+            engine.indexes.pop(compiled, None)
+            self.versions.pop(compiled, None)
+        self.forms.discard(deployment.compiled.values())
+        deployment.state = 'Unloaded'
+        
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
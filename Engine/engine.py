@@ -0,0 +1,854 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+The Engine compiles Processes and manages their instances.
+
+Tokens are moved by behaviours chosen at compile time (see Engine.compiler.node_kind).
+A token entering a node is pushed on the ready list of its instance; Engine.run pops the ready tokens
+and applies the behaviour of their node until every remaining token waits for an external trigger.
+'''
+
+import time
+from itertools import count, islice
+
+from Engine.compiler import CompiledProcess, message_key
+from Engine.instances import ProcessInstance, Frame, CompensationFrame
+from Engine.compensation import CompensationLog, CompensationVariables
+from Engine.persistence import MemoryStore
+from Engine.services import Invoker
+from Engine.categories import CategoryIndex
+from Core.Common.ErrorModels import EngineError, ThrownError, ThrownEscalation
+
+class Engine(object):
+    '''
+    Entry point of the execution of BPMN processes.
+    '''
+    def __init__(self, store=None):
+        '''
+        store:MemoryStore|SQLiteStore (default=MemoryStore())
+            Persistence of the instances records.
+            
+        bus:MessageBus
+            The message bus receiving the Messages sent by the instances (None until a MessageBus is attached).
+            
+        services:Invoker
+            Bindings of the Operations invoked by the Service Tasks.
+            
+        rules:dict
+            Business Rule Task id or implementation -> function(inputs) returning the outputs of the task.
+            
+        cache:ResultCache
+            Results of the cacheable Service and Business Rule Tasks (None to disable caching).
+            
+        tasks:TaskList
+            Lifecycle of the User and Manual Tasks (None until a TaskList is attached).
+            
+        recorder:TraceRecorder
+            Log of the nondeterministic inputs of the instances, for their replay (None when not recording).
+            
+        profiling:Instrumentation
+            The profiling hooks bound on the engine (None when not profiling).
+            
+        auditing:AuditLog
+            Buffer of the audit records and monitoring events of the audited and monitored elements (None to discard them).
+            
+        instances:dict
+            id -> the Active instances. An instance is removed once it has ended : only the store keeps it.
+            
+        started:callable list
+            Called with the list of the new instances of each start, before they run.
+            
+        ended:callable list
+            Called with each instance once it has ended (Completed, Failed or Terminated).
+            
+        migrated:callable list
+            Called with (instances, source, target) after each batch of instances moved from the CompiledProcess source
+            to target (see Engine.migration).
+        '''
+        super(Engine, self).__init__()
+        self.store = store if store is not None else MemoryStore()
+        self.bus = None
+        self.services = Invoker()
+        self.rules = {}
+        self.cache = None
+        self.tasks = None
+        self.recorder = None
+        self.profiling = None
+        self.auditing = None
+        self._calls = []
+        self.compiled = {}
+        self._versions = {}
+        self.indexes = {}
+        self.instances = {}
+        self.started = []
+        self.ended = []
+        self.migrated = []
+        self._ids = count(1)
+        self.behaviours = {'pass': self._pass,
+                           'wait': self._wait,
+                           'script': self._script,
+                           'subprocess': self._subprocess,
+                           'call': self._call,
+                           'exclusive': self._exclusive,
+                           'parallel': self._parallel,
+                           'terminate': self._terminate,
+                           'throw': self._throw_event,
+                           'compensate': self._compensate,
+                           'send': self._send,
+                           'service': self._service,
+                           'rule': self._rule,
+                           'boundary': self._pass}
+        
+    def compile(self, process):
+        '''
+        Return the CompiledProcess of process, compiling it on first use only.
+        '''
+        compiled = self.compiled.get(process)
+        if compiled is None:
+            compiled = CompiledProcess(process)
+            self.register(process, compiled)
+        return compiled
+        
+    def register(self, process, compiled):
+        '''
+        Add compiled, the CompiledProcess of process, to the compiled processes as the next version of its process id
+        (the versions of a process id are told apart by the monitoring).
+        '''
+        compiled.version = self._versions[process.id] = self._versions.get(process.id, 0) + 1
+        self.compiled[process] = compiled
+        
+    ##########################################################
+    # Instances
+    
+    def start(self, process, variables=None, message=None):
+        '''
+        Instantiate process, place a token on each of its start nodes and run it.
+        
+        variables:dict
+            Initial values overriding the defaults of the process properties.
+            
+        message:Message|str
+            The Message (or its id) instantiating the process : the tokens are placed on its Message Start Events
+            instead of the None Start Events.
+        '''
+        compiled = self.compile(process)
+        instance = ProcessInstance(next(self._ids), compiled, self._start_nodes(compiled, message),
+                                   compiled.initial_variables(variables))
+        self._count_started(compiled, instance.tokens, 1)
+        self.instances[instance.id] = instance
+        for started in self.started:
+            started([instance])
+        if self.recorder is not None:
+            self.recorder.started(instance, variables, message)
+        if compiled.audit:
+            self._audit(instance, instance, None, 'started')
+        self.run(instance)
+        self._invoke()
+        self.store.save(instance)
+        return instance
+        
+    def start_many(self, process, variables_iterable, message=None, created=None):
+        '''
+        Instantiate process once per item of variables_iterable.
+        The process is compiled, its variable layout and defaults built and its start nodes resolved once for the whole batch,
+        and the batch is persisted in a single write.
+        Return the list of the new instances.
+        
+        variables_iterable:dict iterable
+            Initial values of each instance (None for the defaults only).
+            
+        message:Message|str
+            The Message instantiating the process (see start).
+            
+        created:callable
+            Called with the list of the new instances before they run.
+        '''
+        compiled = self.compile(process)
+        start_nodes = self._start_nodes(compiled, message)
+        initial_variables = compiled.initial_variables
+        variables_list = list(variables_iterable)
+        ids = list(islice(self._ids, len(variables_list)))
+        instances = [ProcessInstance(id, compiled, start_nodes, initial_variables(variables))
+                     for id, variables in zip(ids, variables_list)]
+        self._count_started(compiled, start_nodes, len(instances))
+        self.instances.update(zip(ids, instances))
+        for started in self.started:
+            started(instances)
+        if self.recorder is not None:
+            for instance, variables in zip(instances, variables_list):
+                self.recorder.started(instance, variables, message)
+        if compiled.audit:
+            for instance in instances:
+                self._audit(instance, instance, None, 'started')
+        if created is not None:
+            created(instances)
+        run = self.run
+        for instance in instances:
+            run(instance)
+        self._invoke()
+        self.store.save_many(instances)
+        return instances
+        
+    def _count_started(self, compiled, start_nodes, number):
+        started = compiled.counters.started
+        for node in start_nodes:
+            started[node] += number
+            
+    def _start_nodes(self, compiled, message):
+        if message is None:
+            return compiled.start_nodes
+        start_nodes = compiled.start_messages.get(message_key(message))
+        if not start_nodes:
+            raise EngineError('%s has no Start Event for Message %s'%(compiled.id, message_key(message)))
+        return tuple(start_nodes)
+        
+    def complete(self, instance, node_id, variables=None):
+        '''
+        Complete the waiting node node_id (User Task, Manual Task, Receive Task, catch Event) of instance.
+        
+        variables:dict
+            Values produced by the completion, set in the scope of the node
+            (in the data outputs of the node if it has Data Associations).
+        '''
+        if not self._resume(instance, node_id, variables):
+            raise EngineError('No token waiting on %s in %s'%(node_id, instance))
+        self._invoke()
+        self.store.save(instance)
+        
+    def complete_many(self, completions):
+        '''
+        Complete a batch of waiting nodes; the instances are persisted in a single write.
+        Return, for each completion, True if a token was waiting on the node.
+        
+        completions:(instance, node_id, variables) iterable
+        '''
+        return self._resume_many((instance, node_id, variables, None) for instance, node_id, variables in completions)
+        
+    def resume_many(self, resumptions):
+        '''
+        Complete a batch of waiting tokens, each one given by its scope and node rather than by the id of its node,
+        which several frames of an Event Sub-Process may wait on (see Engine.tasks); the instances are persisted
+        in a single write.
+        Return, for each resumption, True if the token was still waiting.
+        
+        resumptions:(instance, scope, node, variables) iterable
+        '''
+        items = []
+        for instance, scope, node, variables in resumptions:
+            scopes = instance.scopes()
+            position = next((index for index, active in enumerate(scopes) if active is scope), None)
+            if position is None:
+                items.append((instance, None, variables, None))
+            else:
+                items.append((instance, scope.process.nodes[node].id, variables, position))
+        return self._resume_many(items)
+        
+    def _resume_many(self, items):
+        done = []
+        touched = {}
+        for instance, node_id, variables, position in items:
+            if node_id is not None and self._resume(instance, node_id, variables, position):
+                touched[instance.id] = instance
+                done.append(True)
+            else:
+                done.append(False)
+        self._invoke()
+        if touched:
+            self.store.save_many(touched.values())
+        return done
+        
+    def _resume(self, instance, node_id, variables, position=None):
+        '''
+        Complete the token waiting on node_id in the first scope holding one (in the scope at position in
+        instance.scopes() only, if given).
+        '''
+        if self.recorder is not None:
+            self.recorder.completed(instance, node_id, variables, position)
+        scopes = instance.scopes()
+        if position is not None:
+            scopes = scopes[position:position + 1]
+        for scope in scopes:
+            node = scope.process.node_index.get(node_id)
+            if node is not None and node in scope.tokens and scope.process.kinds[node] == 'wait':
+                if variables:
+                    self._namespace(scope, node).update(variables)
+                self._leave(instance, scope, node)
+                self.run(instance)
+                return True
+        return False
+        
+    def message(self, instance, message, variables=None):
+        '''
+        Deliver a Message to instance.
+        The Message completes the first node waiting for it or, if none, starts the Event Sub-Processes it triggers.
+        Return True if the Message has been consumed.
+        
+        message:Message|str
+            The Message or its id.
+        
+        variables:dict
+            Payload of the Message, set in the scope receiving it.
+        '''
+        if self._deliver(instance, message_key(message), variables):
+            self._invoke()
+            self.store.save(instance)
+            return True
+        return False
+        
+    def message_many(self, deliveries):
+        '''
+        Deliver a batch of Messages; the instances which consumed a Message are persisted in a single write.
+        Return, for each delivery, True if its Message has been consumed.
+        
+        deliveries:(instance, message, variables) iterable
+        '''
+        consumed = []
+        touched = {}
+        for instance, message, variables in deliveries:
+            if self._deliver(instance, message_key(message), variables):
+                touched[instance.id] = instance
+                consumed.append(True)
+            else:
+                consumed.append(False)
+        self._invoke()
+        if touched:
+            self.store.save_many(touched.values())
+        return consumed
+        
+    def _deliver(self, instance, key, variables):
+        if self.recorder is not None:
+            self.recorder.delivered(instance, key, variables)
+        if instance.state != 'Active':
+            return False
+        scopes = instance.scopes()
+        for scope in scopes:
+            for node in scope.process.message_waits.get(key, ()):
+                if node in scope.tokens:
+                    if variables:
+                        self._namespace(scope, node).update(variables)
+                    self._leave(instance, scope, node)
+                    self.run(instance)
+                    return True
+        for scope in scopes:
+            for node, start, interrupting in scope.process.message_starts.get(key, ()):
+                if interrupting:
+                    self._cancel(instance, scope)
+                if variables:
+                    scope.variables.update(variables)
+                scope.tokens.append(node)
+                scope.process.counters.started[node] += 1
+                self._open(instance, scope, node, scope.process.children[node], scope.variables, (start,))
+                self.run(instance)
+                return True
+        return False
+        
+    ##########################################################
+    # Monitoring
+    
+    def _audit(self, instance, scope, node, transition):
+        '''
+        Emit the audit records and monitoring events of the transition of node in scope (of the instance itself if node is None).
+        A record is (time, channel, process id, instance id, element id, transition).
+        '''
+        auditing = self.auditing
+        if auditing is None:
+            return
+        if node is None:
+            element, entries = scope.process.container, scope.process.audit
+        else:
+            element, entries = scope.process.nodes[node], scope.process.audits[node]
+        now = time.time()
+        for channel, sink, transitions in entries:
+            if transitions is None or transition in transitions:
+                auditing.emit(sink, (now, channel, instance.process.id, instance.id, element.id, transition))
+                
+    def categories(self, process):
+        '''
+        Return the CategoryIndex of process, built on first use only.
+        '''
+        compiled = self.compile(process)
+        index = self.indexes.get(compiled)
+        if index is None:
+            index = self.indexes[compiled] = CategoryIndex(compiled)
+        return index
+        
+    def load(self, process, labels=None):
+        '''
+        Return the number of live tokens of the instances of process per CategoryValue label (see CategoryIndex.load).
+        '''
+        return self.categories(process).load(labels)
+        
+    ##########################################################
+    # Token moves
+    
+    def run(self, instance):
+        '''
+        Process the ready tokens of instance until all of them wait or the instance ends.
+        '''
+        ready = instance.ready
+        behaviours = self.behaviours
+        while ready:
+            scope, node = ready.pop()
+            process = scope.process
+            if node in process.mappings:
+                if scope.data is None:
+                    scope.data = {}
+                scope.data[node] = process.mappings[node].enter(scope.variables)
+            if node in process.audits:
+                self._audit(instance, scope, node, 'entered')
+            behaviours[process.kinds[node]](instance, scope, node)
+            
+    def _namespace(self, scope, node):
+        '''
+        Return the namespace of the implementation of node : its data if it has Data Associations, else the variables of scope.
+        '''
+        if scope.data and node in scope.data:
+            return scope.data[node]
+        return scope.variables
+        
+    def _enter(self, instance, scope, node):
+        scope.process.counters.started[node] += 1
+        scope.tokens.append(node)
+        instance.ready.append((scope, node))
+        
+    def _select(self, scope, node, first=False):
+        '''
+        Return the outgoing flows of node whose condition is True (the first one only if first),
+        or the default flow of node if there is none.
+        '''
+        process = scope.process
+        conditions = process.conditions
+        default = process.default_flow[node]
+        selected = []
+        for flow in process.outgoing[node]:
+            if flow == default:
+                continue
+            condition = conditions[flow]
+            if condition is None or eval(condition, {}, scope.variables):
+                selected.append(flow)
+                if first:
+                    break
+        if not selected:
+            if default is not None:
+                return [default]
+            if process.outgoing[node]:
+                raise EngineError('No outgoing Sequence Flow of %s can be taken'%process.nodes[node].id)
+        return selected
+        
+    def _leave(self, instance, scope, node, flows=None):
+        '''
+        Move the token of node down flows (by default, the outgoing flows whose condition is True).
+        The scope completes when its last token is consumed.
+        '''
+        process = scope.process
+        if scope.data and node in scope.data:
+            process.mappings[node].leave(scope.data.pop(node), scope.variables)
+        if flows is None:
+            flows = self._select(scope, node)
+        if node in process.compensations:
+            if instance.compensations is None:
+                instance.compensations = CompensationLog()
+            instance.compensations.record(scope, node)
+        tokens = scope.tokens
+        tokens.remove(node)
+        counters = process.counters
+        counters.completed[node] += 1
+        if node in process.audits:
+            self._audit(instance, scope, node, 'completed')
+        #_enter inlined for each flow
+        taken = counters.taken
+        flow_target = process.flow_target
+        ready = instance.ready
+        for flow in flows:
+            target = flow_target[flow]
+            taken[flow] += 1
+            tokens.append(target)
+            ready.append((scope, target))
+        if not scope.tokens:
+            self._complete(instance, scope)
+            
+    def _complete(self, instance, scope):
+        if scope is instance:
+            instance.compensations = None
+            self._end(instance, 'Completed')
+            return
+        instance.frames.remove(scope)
+        parent = scope.parent
+        self._release(instance, scope)
+        if parent.data and scope.node in parent.data and scope.variables is not parent.variables:
+            parent.process.mappings[scope.node].collect(parent.data[scope.node], scope.variables)
+        if scope.pending:
+            self._open_compensation(instance, scope.parent, scope.node, scope.pending)
+            return
+        self._leave(instance, scope.parent, scope.node)
+        
+    def _open(self, instance, scope, node, process, variables, starts):
+        '''
+        Start a Frame running process for the activity node of scope.
+        '''
+        frame = Frame(process, variables, scope, node)
+        instance.frames.append(frame)
+        if not starts:
+            self._complete(instance, frame)
+        for start in starts:
+            self._enter(instance, frame, start)
+        return frame
+        
+    def _drop(self, instance, cancelled, scope, node=None):
+        '''
+        Remove the frames started in scope (by node only, if given), the frames they contain,
+        and their ready tokens. cancelled is the set of the ids of the scopes already removed.
+        '''
+        frames = []
+        for frame in instance.frames:
+            if id(frame.parent) in cancelled or (frame.parent is scope and node in (None, frame.node)):
+                cancelled.add(id(frame))
+                self._count_cancelled(instance, frame)
+                self._release(instance, frame)
+            else:
+                frames.append(frame)
+        instance.frames[:] = frames
+        instance.ready[:] = [item for item in instance.ready if id(item[0]) not in cancelled]
+        
+    def _cancel(self, instance, scope):
+        '''
+        Remove all the tokens of scope and the frames it contains.
+        '''
+        self._drop(instance, set([id(scope)]), scope)
+        self._count_cancelled(instance, scope)
+        del scope.tokens[:]
+        scope.joins.clear()
+        scope.data = None
+        
+    def _cancel_node(self, instance, scope, node):
+        '''
+        Remove the token of the activity node of scope and the frames it started.
+        '''
+        self._drop(instance, set(), scope, node)
+        scope.tokens.remove(node)
+        scope.process.counters.cancelled[node] += 1
+        if node in scope.process.audits:
+            self._audit(instance, scope, node, 'cancelled')
+        if scope.data:
+            scope.data.pop(node, None)
+        ready = instance.ready
+        if (scope, node) in ready:
+            ready.remove((scope, node))
+            
+    def _count_cancelled(self, instance, scope):
+        cancelled = scope.process.counters.cancelled
+        audits = scope.process.audits
+        for node in scope.tokens:
+            cancelled[node] += 1
+            if node in audits:
+                self._audit(instance, scope, node, 'cancelled')
+            
+    def _release(self, instance, frame):
+        '''
+        Drop the compensation tracker of the own variables of a removed frame.
+        '''
+        if instance.compensations is not None and frame.variables is not frame.parent.variables:
+            instance.compensations.release(frame.variables)
+            
+    def _alive(self, instance, scope):
+        if scope is instance:
+            return instance.state == 'Active'
+        return scope in instance.frames
+        
+    ##########################################################
+    # Errors and Escalations
+    
+    def _throw(self, instance, scope, node, kind, code, variables=None):
+        '''
+        Throw an Error or an Escalation from node and start its handler.
+        The handler is found in the precomputed table of node; the scope hierarchy is only climbed
+        to leave a called element whose tables do not catch the code.
+        Return True if a handler has been started. An Error without handler makes the instance fail.
+        
+        kind:str {'error'|'escalation'}
+        
+        code:str
+            errorCode or escalationCode (None when the thrown Event has no reference).
+        '''
+        while True:
+            table = scope.process.handlers[node]
+            entry = table.get((kind, code)) or table.get((kind, None))
+            if entry is not None:
+                break
+            for i in range(scope.process.depth):
+                scope = scope.parent
+            if scope is instance:
+                if kind == 'error':
+                    self._fail(instance, code)
+                return False
+            node = scope.node
+            scope = scope.parent
+        up, target, start, interrupting = entry
+        for i in range(up):
+            scope = scope.parent
+        if variables:
+            scope.variables.update(variables)
+        if start is None:
+            if interrupting:
+                self._cancel_node(instance, scope, scope.process.attached[target])
+            self._enter(instance, scope, target)
+        else:
+            if interrupting:
+                self._cancel(instance, scope)
+            scope.tokens.append(target)
+            self._open(instance, scope, target, scope.process.children[target], scope.variables, (start,))
+        return True
+        
+    def _raised(self, instance, scope, node, thrown):
+        '''
+        Throw the ThrownError or ThrownEscalation raised by the implementation of node.
+        Return True if the token of node has not been removed by the handler and must go on.
+        '''
+        if isinstance(thrown, ThrownError):
+            self._throw(instance, scope, node, 'error', thrown.code, thrown.variables)
+        else:
+            self._throw(instance, scope, node, 'escalation', thrown.code, thrown.variables)
+        return self._alive(instance, scope) and node in scope.tokens
+        
+    def _fail(self, instance, code):
+        self._cancel(instance, instance)
+        instance.fault = code
+        self._end(instance, 'Failed')
+        
+    def _end(self, instance, state):
+        '''
+        The ended instance is dropped from the Active instances : the store persists it with its final state.
+        '''
+        instance.state = state
+        self.instances.pop(instance.id, None)
+        if instance.process.audit:
+            self._audit(instance, instance, None, state.lower())
+        for ended in self.ended:
+            ended(instance)
+        
+    ##########################################################
+    # Behaviours
+    
+    def _pass(self, instance, scope, node):
+        self._leave(instance, scope, node)
+        
+    def _wait(self, instance, scope, node):
+        if self.tasks is not None and node in scope.process.humans:
+            self.tasks.open(instance, scope, node)
+        
+    def _script(self, instance, scope, node):
+        try:
+            exec(scope.process.scripts[node], {}, self._namespace(scope, node))
+        except (ThrownError, ThrownEscalation) as thrown:
+            if not self._raised(instance, scope, node, thrown):
+                return
+        self._leave(instance, scope, node)
+        
+    def _subprocess(self, instance, scope, node):
+        child = scope.process.children[node]
+        self._open(instance, scope, node, child, scope.variables, child.start_nodes)
+        
+    def _call(self, instance, scope, node):
+        '''
+        The called element is compiled once by the engine and its CompiledProcess is kept on the calling node,
+        so that every later call (from any instance) reuses it without lookup.
+        '''
+        process = scope.process
+        child = process.children.get(node)
+        if child is None:
+            called = process.nodes[node].calledElementRef
+            if called is None:
+                raise EngineError('Call Activity %s has no calledElementRef'%process.nodes[node].id)
+            child = process.children[node] = self.compile(called)
+        variables = None
+        if scope.data and node in scope.data:
+            variables = process.mappings[node].call(scope.data[node])
+        self._open(instance, scope, node, child, child.initial_variables(variables), child.start_nodes)
+        
+    def _send(self, instance, scope, node):
+        '''
+        The Message is posted with the data inputs of the node as payload (no payload without Data Associations).
+        The data of the node is not used once the node is left, so that it is handed over to the receiver without copy.
+        '''
+        if self.bus is not None:
+            payload = scope.data.get(node) if scope.data else None
+            self.bus.post(scope.process.nodes[node], scope.process.sends[node], payload, sender=instance)
+        self._leave(instance, scope, node)
+        
+    def _cached(self, scope, node, owner):
+        '''
+        Return (cache key, cached result) of node, (None, None) if node is not cacheable.
+        '''
+        if self.cache is None or node not in scope.process.caches:
+            return None, None
+        key = self.cache.key(owner, self._namespace(scope, node), scope.process.cache_inputs[node])
+        if key is None:
+            return None, None
+        return key, self.cache.get(key)
+        
+    def _service(self, instance, scope, node):
+        '''
+        The call is queued : the public methods invoke the queued calls once their runs are over (see _invoke).
+        A cached result completes the node at once.
+        '''
+        key, result = self._cached(scope, node, scope.process.nodes[node].operationRef.id)
+        if result is not None:
+            if self.recorder is not None:
+                self.recorder.outcome(instance, scope, node, True, result, cached=True)
+            self._namespace(scope, node).update(result)
+            self._leave(instance, scope, node)
+            return
+        self._calls.append((instance, scope, node, key))
+        
+    def _invoke(self):
+        '''
+        Invoke the queued Service Task calls, the calls of the same Operation being handed together to its adapter,
+        then move their tokens on. The reply is set in the data of the node (or its scope), a fault is thrown as an Error.
+        '''
+        calls = self._calls
+        if calls and self.recorder is not None:
+            self.recorder.invoked()
+        while calls:
+            batch = calls[:]
+            del calls[:]
+            operations = {}
+            for item in batch:
+                instance, scope, node, key = item
+                operation = scope.process.nodes[node].operationRef
+                operations.setdefault(operation, []).append(item)
+            for operation, items in operations.items():
+                results = self._invoke_distinct(operation, items)
+                for (instance, scope, node, key), (ok, value) in zip(items, results):
+                    if self.recorder is not None:
+                        self.recorder.outcome(instance, scope, node, ok, value)
+                    if ok and key is not None:
+                        self.cache.put(key, value, scope.process.caches[node])
+                    if not self._alive(instance, scope) or node not in scope.tokens:
+                        continue
+                    if ok:
+                        self._namespace(scope, node).update(value)
+                    elif not self._raised(instance, scope, node, value):
+                        self.run(instance)
+                        continue
+                    self._leave(instance, scope, node)
+                    self.run(instance)
+                    
+    def _invoke_distinct(self, operation, items):
+        '''
+        Invoke operation once per distinct cache key of items (once per item without key) and return the result of each item.
+        '''
+        first = {}
+        sent = []
+        for position, (instance, scope, node, key) in enumerate(items):
+            if key is None or key not in first:
+                if key is not None:
+                    first[key] = len(sent)
+                sent.append(position)
+        payloads = [self._namespace(items[position][1], items[position][2]) for position in sent]
+        results = self.services.invoke_many(operation, payloads)
+        if len(sent) == len(items):
+            return results
+        by_position = dict(zip(sent, results))
+        return [by_position[position] if position in by_position else results[first[item[3]]]
+                for position, item in enumerate(items)]
+        
+    def _rule(self, instance, scope, node):
+        '''
+        The rules registered for the id of the task, or else for its implementation, are evaluated with the inputs of the task.
+        '''
+        task = scope.process.nodes[node]
+        rules = self.rules.get(task.id) or self.rules.get(task.implementation)
+        if rules is None:
+            raise EngineError('No business rules for %s'%task.id)
+        key, result = self._cached(scope, node, task.id)
+        if result is None:
+            try:
+                result = rules(self._namespace(scope, node))
+            except (ThrownError, ThrownEscalation) as thrown:
+                if self.recorder is not None:
+                    self.recorder.outcome(instance, scope, node, False, thrown)
+                if not self._raised(instance, scope, node, thrown):
+                    return
+                result = None
+            else:
+                if self.recorder is not None:
+                    self.recorder.outcome(instance, scope, node, True, result)
+            if result is not None and key is not None:
+                self.cache.put(key, result, scope.process.caches[node])
+        elif self.recorder is not None:
+            self.recorder.outcome(instance, scope, node, True, result, cached=True)
+        if result:
+            self._namespace(scope, node).update(result)
+        self._leave(instance, scope, node)
+        
+    def _exclusive(self, instance, scope, node):
+        self._leave(instance, scope, node, self._select(scope, node, first=True))
+        
+    def _parallel(self, instance, scope, node):
+        expected = len(scope.process.incoming[node])
+        if expected > 1:
+            arrived = scope.joins.get(node, 0) + 1
+            if arrived < expected:
+                scope.joins[node] = arrived
+                return
+            del scope.joins[node]
+            for i in range(expected - 1):
+                scope.tokens.remove(node)
+            scope.process.counters.completed[node] += expected - 1
+        self._leave(instance, scope, node, scope.process.outgoing[node])
+        
+    def _terminate(self, instance, scope, node):
+        self._cancel(instance, scope)
+        if scope is instance:
+            self._end(instance, 'Terminated')
+            return
+        self._complete(instance, scope)
+        
+    def _throw_event(self, instance, scope, node):
+        for kind, code in scope.process.throws[node]:
+            self._throw(instance, scope, node, kind, code)
+        if self._alive(instance, scope) and node in scope.tokens:
+            self._leave(instance, scope, node)
+            
+    def _compensate(self, instance, scope, node):
+        '''
+        Replay, most recent first, the compensation handlers of the activities completed in scope
+        (or of the activity referenced by the Event), then go on.
+        '''
+        records = []
+        if instance.compensations is not None:
+            records = instance.compensations.take(scope, scope.process.compensate_targets[node])
+        if records:
+            self._open_compensation(instance, scope, node, records)
+        else:
+            self._leave(instance, scope, node)
+            
+    def _open_compensation(self, instance, scope, node, records):
+        owner, activity, snapshot = records[0]
+        frame = CompensationFrame(owner.process, CompensationVariables(owner.variables, snapshot), scope, node, records[1:])
+        instance.frames.append(frame)
+        self._enter(instance, frame, owner.process.compensations[activity])
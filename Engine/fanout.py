@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Fan-out of Messages to multi-instance Participants.
+
+A Participant with a ParticipantMultiplicity stands for several partners (e.g. the suppliers receiving a request for quotation).
+Each partner is a member : a callable member(message id, payload) returning its reply.
+A Message sent to the Participant is sent to all its members at once over a bounded pool of worker threads;
+the replies are aggregated as they arrive and handed to the sender as soon as the completion condition holds,
+without waiting for the slowest members. Only the members run in the worker threads : the engine is only
+driven by the thread dispatching the MessageBus.
+'''
+
+from multiprocessing.pool import ThreadPool
+from Queue import Queue, Empty
+from time import time
+
+from Engine.compiler import compile_expression
+from Core.Common.ErrorModels import EngineError
+
+def invoke(index, member, message, payload):
+    '''
+    Call member in a worker thread and return (index, True, reply) or (index, False, exception).
+    '''
+    try:
+        return index, True, member(message, payload)
+    except Exception as error:
+        return index, False, error
+        
+class Aggregation(object):
+    '''
+    Replies to one Message sent to a multi-instance Participant.
+    '''
+    __slots__ = ('participant', 'message', 'payload', 'sender', 'owner', 'condition', 'total', 'replies', 'failures', 'done')
+    
+    def __init__(self, participant, message, payload, sender, owner, condition, total):
+        '''
+        participant:str
+            Id of the multi-instance Participant.
+            
+        sender:ProcessInstance
+            The instance receiving the aggregated replies (None for a Message sent from outside the engine).
+            
+        owner:str
+            Id of the Participant of the sender.
+            
+        condition:code
+            Compiled completion condition (None to wait for the quorum of the Participant).
+            
+        total:int
+            Number of members the Message is sent to.
+            
+        replies:list
+            Replies received so far, in arrival order.
+            
+        failures:list
+            Exceptions raised by the members.
+        '''
+        self.participant = participant
+        self.message = message
+        self.payload = payload
+        self.sender = sender
+        self.owner = owner
+        self.condition = condition
+        self.total = total
+        self.replies = []
+        self.failures = []
+        self.done = False
+        
+    def complete(self, quorum):
+        '''
+        Return True when the completion condition holds or when every member has answered.
+        The condition is evaluated with the names of multi-instance Activities (nrOfInstances, nrOfCompletedInstances,
+        nrOfActiveInstances) and replies.
+        '''
+        completed = len(self.replies)
+        if completed + len(self.failures) == self.total:
+            return True
+        if self.condition is None:
+            return completed >= quorum
+        return bool(eval(self.condition, {}, {'nrOfInstances': self.total,
+                                              'nrOfCompletedInstances': completed,
+                                              'nrOfActiveInstances': self.total - completed - len(self.failures),
+                                              'replies': self.replies}))
+                                              
+class FanOut(object):
+    '''
+    Concurrent delivery of the Messages of a MessageBus to its multi-instance Participants.
+    '''
+    def __init__(self, bus, size=8, result='replies', timeout=30.0):
+        '''
+        bus:MessageBus
+            The bus routing the Messages. The FanOut is attached to it.
+            
+        size:int (default=8)
+            Number of worker threads, i.e. maximum number of members called at the same time.
+            
+        result:str (default='replies')
+            Name of the variable receiving the list of the replies in the sender.
+            
+        timeout:float (default=30.0)
+            Seconds a dispatch waits, overall, for its Messages to complete : the Messages still incomplete then
+            are handed over with the replies received so far.
+            
+        members:dict
+            Participant id -> member list.
+            
+        quorums:dict
+            Participant id -> number of replies completing a Message without completion condition
+            (the minimum of the ParticipantMultiplicity, or all the members when it is 0).
+            
+        pending:Aggregation list
+            Messages posted and not yet dispatched.
+        '''
+        super(FanOut, self).__init__()
+        if size < 1:
+            raise EngineError('size of a FanOut must be greater than 0')
+        if timeout is None or timeout <= 0:
+            raise EngineError('timeout of a FanOut must be greater than 0')
+        self.bus = bus
+        self.size = size
+        self.result = result
+        self.timeout = timeout
+        self.members = {}
+        self.quorums = {}
+        self.pending = []
+        self._conditions = {}
+        self._pool = None
+        bus.fanout = self
+        
+    def register(self, participant, members):
+        '''
+        Declare the members of a multi-instance Participant; their number must comply with its ParticipantMultiplicity.
+        '''
+        multiplicity = participant.participantMultiplicityRef
+        if multiplicity is None:
+            raise EngineError('Participant %s is not multi-instance'%participant.id)
+        members = list(members)
+        if len(members) < multiplicity.minimum or (multiplicity.maximum is not None and len(members) > multiplicity.maximum):
+            raise EngineError('%d members do not comply with the multiplicity of %s'%(len(members), participant.id))
+        multiplicity.numParticipants = len(members)
+        self.members[participant.id] = members
+        self.quorums[participant.id] = multiplicity.minimum or len(members)
+        
+    def post(self, source, route, message, payload, sender, owner):
+        '''
+        Queue a Message sent to a multi-instance Participant. The completion condition is the one of the
+        MultiInstanceLoopCharacteristics of the sending node, if any.
+        '''
+        key = getattr(source, 'id', source)
+        condition = self._conditions.get(key)
+        if condition is None and key not in self._conditions:
+            loop = getattr(source, 'loopCharacteristics', None)
+            condition = self._conditions[key] = compile_expression(getattr(loop, 'completionCondition', None))
+        self.pending.append(Aggregation(route.participant, message, payload, sender, owner, condition,
+                                        len(self.members[route.participant])))
+                                        
+    def dispatch(self):
+        '''
+        Send the pending Messages to all their members at once and hand the replies over to the senders
+        as soon as each aggregation completes. Return the number of dispatched Messages.
+        '''
+        pending, self.pending = self.pending, []
+        if not pending:
+            return 0
+        if self._pool is None:
+            self._pool = ThreadPool(self.size)
+        results = Queue()
+        for index, aggregation in enumerate(pending):
+            for member in self.members[aggregation.participant]:
+                self._pool.apply_async(invoke, (index, member, aggregation.message, aggregation.payload),
+                                       callback=results.put)
+        deadline = time() + self.timeout
+        waiting = len(pending)
+        while waiting:
+            try:
+                index, ok, value = results.get(True, max(deadline - time(), 0))
+            except Empty:
+                break
+            aggregation = pending[index]
+            if aggregation.done:
+                continue
+            if ok:
+                aggregation.replies.append(value)
+            else:
+                aggregation.failures.append(value)
+            if aggregation.complete(self.quorums[aggregation.participant]):
+                self._reply([aggregation])
+                waiting -= 1
+        if waiting:
+            self._reply([aggregation for aggregation in pending if not aggregation.done])
+        return len(pending)
+        
+    def _reply(self, aggregations):
+        '''
+        Deliver the replies to the senders, on the MessageFlow going back from the Participant to the sender.
+        '''
+        bus = self.bus
+        deliveries = []
+        for aggregation in aggregations:
+            aggregation.done = True
+            if aggregation.sender is None:
+                continue
+            for route in bus.routes.get(aggregation.participant, ()):
+                if route.participant == aggregation.owner:
+                    deliveries.append((route, route.message, {self.result: aggregation.replies}, aggregation.sender, None))
+                    break
+        if deliveries:
+            consumed = bus.engine.message_many((instance, key, payload) for route, key, payload, instance, conversation in deliveries)
+            bus.undeliver(item for item, ok in zip(deliveries, consumed) if not ok)
+            
+    def close(self):
+        '''
+        Stop the worker threads.
+        '''
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
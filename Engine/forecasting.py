@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Workload forecast of the open instances.
+
+The forecast never looks at the instances one by one : the open instances are aggregated by node (the waiting tokens of
+the NodeCounters) and the expected number of tokens in each node is propagated through the compiled graph, time bucket
+after time bucket, as a Markov chain :
+    - a timed node (an Activity waiting for a trigger) releases in each bucket the share 1 - exp(-bucket / mean duration)
+      of its tokens, the mean duration being learnt by the LoadMonitor (or given),
+    - an instantaneous node (Gateway, Script Task, Event...) releases its tokens at once,
+    - the released tokens are split on the outgoing flows by the branch probabilities, learnt from the flow counters,
+      a joining Parallel Gateway merging the tokens of its incoming flows.
+The cost depends on the size of the graph and on the number of buckets, not on the number of instances.
+Two figures are forecast per node and bucket : the expected arrivals, and the certain ones, i.e. reaching the node only
+through flows taken for sure (parallel or unconditional flows).
+'''
+
+from math import exp
+
+from Core.Common.ErrorModels import EngineError
+from HumanInteraction.models import UserTask
+
+#Kinds of the nodes releasing their tokens at once
+Instantaneous = set(['pass', 'script', 'exclusive', 'parallel', 'terminate', 'throw', 'send', 'compensate', 'boundary'])
+
+class Forecast(object):
+    '''
+    Expected arrivals per node and time bucket.
+    '''
+    def __init__(self, bucket, buckets, expected, certain):
+        '''
+        bucket:float
+            Duration of a bucket in seconds.
+            
+        buckets:int
+            Number of buckets.
+            
+        expected:dict
+            node id -> expected arrivals in each bucket.
+            
+        certain:dict
+            node id -> arrivals in each bucket of the tokens reaching the node for sure.
+        '''
+        self.bucket = bucket
+        self.buckets = buckets
+        self.expected = expected
+        self.certain = certain
+        
+    def total(self, node_id):
+        return sum(self.expected[node_id])
+        
+class Forecaster(object):
+    '''
+    Learns the branch probabilities and the durations of a process and forecasts the arrivals of its open instances.
+    '''
+    def __init__(self, engine, monitor=None, default=3600.0, prior=1.0):
+        '''
+        engine:Engine
+            The engine running the instances.
+            
+        monitor:LoadMonitor (default=None)
+            Source of the mean durations of the nodes (see LoadMonitor.stats).
+            
+        default:float (default=3600.0)
+            Mean duration in seconds of the timed nodes without history.
+            
+        prior:float (default=1.0)
+            Weight, in tokens, of the uniform split of the diverging flows before any history.
+            
+        durations:dict
+            node id -> mean duration in seconds, overriding the learnt one.
+        '''
+        super(Forecaster, self).__init__()
+        self.engine = engine
+        self.monitor = monitor
+        self.default = default
+        self.prior = prior
+        self.durations = {}
+        
+    ##########################################################
+    # Learning
+    
+    def probabilities(self, compiled):
+        '''
+        Return the probability of each flow of compiled to be taken by a token leaving its source node,
+        and whether it is taken for sure.
+        '''
+        counters = compiled.counters
+        taken = counters.taken
+        probabilities = [0.0] * len(compiled.flows)
+        certain = [False] * len(compiled.flows)
+        for node, flows in enumerate(compiled.outgoing):
+            if not flows:
+                continue
+            if compiled.kinds[node] == 'parallel' or (len(flows) == 1 and compiled.conditions[flows[0]] is None):
+                for flow in flows:
+                    probabilities[flow] = 1.0
+                    certain[flow] = True
+            elif compiled.kinds[node] == 'exclusive':
+                total = sum(taken[flow] for flow in flows)
+                for flow in flows:
+                    probabilities[flow] = (taken[flow] + self.prior / len(flows)) / (total + self.prior)
+            else:
+                total = counters.completed[node]
+                for flow in flows:
+                    if compiled.conditions[flow] is None and flow != compiled.default_flow[node]:
+                        probabilities[flow] = 1.0
+                        certain[flow] = True
+                    else:
+                        probabilities[flow] = (taken[flow] + self.prior * 0.5) / (total + self.prior)
+        return probabilities, certain
+        
+    def means(self, compiled):
+        '''
+        Return the mean duration in seconds of each node of compiled (0 for the instantaneous ones).
+        '''
+        learnt = {}
+        if self.monitor is not None:
+            learnt = self.monitor.stats().get((compiled.id, compiled.version), {})
+        means = []
+        for node, kind in zip(compiled.nodes, compiled.kinds):
+            if node.id in self.durations:
+                means.append(self.durations[node.id])
+            elif kind in Instantaneous:
+                means.append(0.0)
+            elif learnt.get(node.id, {}).get('time') is not None:
+                means.append(learnt[node.id]['time'])
+            else:
+                means.append(self.default)
+        return means
+        
+    ##########################################################
+    # Forecast
+    
+    def forecast(self, process, horizon, bucket=3600.0, tokens=None, targets=None):
+        '''
+        Return the Forecast of the arrivals in the next horizon seconds, per bucket of bucket seconds.
+        
+        tokens:dict (default=None)
+            node id -> number of tokens, the open instances aggregated by node
+            (by default, the tokens waiting in the nodes of the process according to its counters).
+            
+        targets:str list (default=None)
+            Ids of the nodes whose arrivals are forecast (by default, the User Tasks).
+        '''
+        compiled = self.engine.compile(process)
+        if bucket <= 0:
+            raise EngineError('The forecast bucket must be positive')
+        buckets = int(-(-horizon // bucket))
+        if tokens is None:
+            vector = [max(count, 0) for count in compiled.counters.read()[3]]
+        else:
+            vector = [0.0] * len(compiled.nodes)
+            for node_id, count in tokens.items():
+                vector[compiled.node_index[node_id]] = count
+        if targets is None:
+            targets = [node.id for node in compiled.nodes if isinstance(node, UserTask)]
+        targets = [compiled.node_index[node_id] for node_id in targets]
+        probabilities, certain = self.probabilities(compiled)
+        leaving = [1.0 if mean <= 0 else 1.0 - exp(-bucket / mean) for mean in self.means(compiled)]
+        expected = self._propagate(compiled, vector, probabilities, leaving, buckets, targets)
+        sure = self._propagate(compiled, vector, [1.0 if flag else 0.0 for flag in certain], leaving, buckets, targets)
+        nodes = compiled.nodes
+        return Forecast(bucket, buckets,
+                        dict((nodes[node].id, expected[node]) for node in targets),
+                        dict((nodes[node].id, sure[node]) for node in targets))
+        
+    def _propagate(self, compiled, vector, probabilities, leaving, buckets, targets):
+        '''
+        Return node index -> arrivals per bucket of the nodes of targets.
+        '''
+        vector = list(vector)
+        arrivals = dict((node, [0.0] * buckets) for node in targets)
+        timed = [node for node, share in enumerate(leaving) if share < 1.0]
+        outgoing, flow_target = compiled.outgoing, compiled.flow_target
+        merge = [len(flows) if kind == 'parallel' and len(flows) > 1 else 1
+                 for kind, flows in zip(compiled.kinds, compiled.incoming)]
+        for index in range(buckets):
+            released = {}
+            for node in timed:
+                mass = vector[node] * leaving[node]
+                if mass:
+                    vector[node] -= mass
+                    released[node] = mass
+            for node in range(len(vector)):
+                if leaving[node] >= 1.0 and vector[node]:
+                    released[node] = released.get(node, 0.0) + vector[node]
+                    vector[node] = 0.0
+            moves = 0
+            while released:
+                node, mass = released.popitem()
+                for flow in outgoing[node]:
+                    share = mass * probabilities[flow]
+                    if share < 1e-9:
+                        continue
+                    target = flow_target[flow]
+                    share /= merge[target]
+                    if target in arrivals:
+                        arrivals[target][index] += share
+                    if leaving[target] >= 1.0:
+                        released[target] = released.get(target, 0.0) + share
+                    else:
+                        vector[target] += share
+                moves += 1
+                if moves > 100 * len(vector):
+                    #cycle of instantaneous nodes : the remaining tokens wait for the next bucket
+                    for node, mass in released.items():
+                        vector[node] += mass
+                    break
+        return arrivals
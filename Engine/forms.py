@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Form schemas of the User Tasks.
+
+The form of a User Task is derived from its ioSpecification : its DataInputs are shown read-only, its DataOutputs are
+the fields to fill in, required unless they are optional in every OutputSet. The type of each field comes from the
+ItemDefinition of the data (its structureRef and isCollection) and is given as a JSON Schema.
+Schemas are built once per task definition, when the process is deployed, and served with an ETag : a worklist UI
+sends back the ETag it holds and gets the schema only if it changed.
+'''
+
+import hashlib
+import json
+
+from HumanInteraction.models import UserTask
+
+#structureRef -> JSON Schema of the values
+JSONTypes = {int: {'type': 'integer'}, long: {'type': 'integer'}, float: {'type': 'number'},
+             bool: {'type': 'boolean'}, str: {'type': 'string'}, unicode: {'type': 'string'},
+             dict: {'type': 'object'}, list: {'type': 'array'},
+             'xsd:string': {'type': 'string'}, 'xsd:boolean': {'type': 'boolean'},
+             'xsd:int': {'type': 'integer'}, 'xsd:integer': {'type': 'integer'}, 'xsd:long': {'type': 'integer'},
+             'xsd:decimal': {'type': 'number'}, 'xsd:float': {'type': 'number'}, 'xsd:double': {'type': 'number'},
+             'xsd:date': {'type': 'string', 'format': 'date'}, 'xsd:dateTime': {'type': 'string', 'format': 'date-time'},
+             'xsd:anyURI': {'type': 'string', 'format': 'uri'}}
+
+def value_schema(itemDefinition, isCollection=False):
+    '''
+    Return the JSON Schema of the values of itemDefinition.
+    A structureRef which is a list or a tuple enumerates the allowed values, a dict maps field names to ItemDefinitions.
+    '''
+    schema = {}
+    if itemDefinition is not None:
+        structure = itemDefinition.structureRef
+        isCollection = isCollection or itemDefinition.isCollection
+        if isinstance(structure, (list, tuple)):
+            schema = {'enum': list(structure)}
+        elif isinstance(structure, dict):
+            schema = {'type': 'object',
+                      'properties': dict((name, value_schema(item)) for name, item in structure.items())}
+        elif structure in JSONTypes:
+            schema = dict(JSONTypes[structure])
+    if isCollection:
+        schema = {'type': 'array', 'items': schema}
+    return schema
+    
+def form_schema(task):
+    '''
+    Return the JSON Schema of the form of the User Task task.
+    '''
+    schema = {'title': task.name or task.id, 'type': 'object', 'properties': {}, 'required': []}
+    if task.documentation:
+        schema['description'] = task.documentation[0].text
+    specification = task.ioSpecification
+    if specification is None:
+        return schema
+    properties = schema['properties']
+    for data in specification.dataInputs:
+        field = value_schema(data.itemSubjectRef, data.isCollection)
+        field['readOnly'] = True
+        properties[data.name or data.id] = field
+    optional = None
+    for outputSet in specification.outputSets:
+        names = set(id(data) for data in outputSet.optionalOutputRefs)
+        optional = names if optional is None else optional & names
+    for data in specification.dataOutputs:
+        name = data.name or data.id
+        properties[name] = value_schema(data.itemSubjectRef, data.isCollection)
+        if optional is None or id(data) not in optional:
+            schema['required'].append(name)
+    return schema
+    
+class FormCache(object):
+    '''
+    Serialized form schemas of the User Tasks, with their ETags.
+    '''
+    def __init__(self):
+        '''
+        forms:dict
+            id of a UserTask -> (UserTask, ETag, JSON document) of its form.
+        '''
+        super(FormCache, self).__init__()
+        self.forms = {}
+        
+    def precompute(self, compiled_processes):
+        '''
+        Build the forms of the User Tasks of compiled_processes and of their embedded Sub-Processes.
+        '''
+        for task in self._tasks(compiled_processes):
+            self.add(task)
+            
+    def discard(self, compiled_processes):
+        '''
+        Forget the forms of the User Tasks of compiled_processes (once unloaded).
+        '''
+        for task in self._tasks(compiled_processes):
+            self.forms.pop(id(task), None)
+            
+    def _tasks(self, compiled_processes):
+        stack = list(compiled_processes)
+        while stack:
+            compiled = stack.pop()
+            for node in compiled.humans:
+                if isinstance(compiled.nodes[node], UserTask):
+                    yield compiled.nodes[node]
+            stack.extend(child for child in compiled.children.values() if child.depth)
+            
+    def add(self, task):
+        document = json.dumps(form_schema(task), sort_keys=True, separators=(',', ':'))
+        etag = '"%s"'%hashlib.sha1(document.encode('utf-8')).hexdigest()
+        self.forms[id(task)] = (task, etag, document)
+        return etag, document
+        
+    def get(self, task, etag=None):
+        '''
+        Return (ETag, JSON document) of the form of task (a UserTask or a HumanTask),
+        the document being None when etag is still the current one.
+        '''
+        if hasattr(task, 'scope'):
+            task = task.scope.process.nodes[task.node]
+        form = self.forms.get(id(task))
+        if form is None or form[0] is not task:
+            form = (task,) + self.add(task)
+        if etag == form[1]:
+            return form[1], None
+        return form[1], form[2]
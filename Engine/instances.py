@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Runtime records of process instances.
+
+A process instance is the root scope of its execution. Embedded Sub-Processes, Event Sub-Processes and
+called elements run in Frames : lightweight scopes stored in the instance that created them.
+Every scope has the same attributes (process, tokens, joins, variables, data, parent, node), so that the engine
+moves tokens the same way whatever the scope.
+'''
+
+InstanceState = ['Active', 'Completed', 'Failed', 'Terminated']
+
+def dump_data(scope):
+    if not scope.data:
+        return None
+    return dict((node, data.dump()) for node, data in scope.data.items())
+
+class Frame(object):
+    '''
+    A Frame is the scope of a Sub-Process or of a called element within a ProcessInstance.
+    '''
+    __slots__ = ('process', 'tokens', 'joins', 'variables', 'data', 'parent', 'node')
+    
+    pending = None
+    
+    def __init__(self, process, variables, parent, node):
+        '''
+        process:CompiledProcess
+            The compiled definition executed in the frame, shared by all the frames running it.
+            
+        variables:Variables
+            Values visible in the frame. Embedded Sub-Processes share the variables of their parent scope.
+            
+        parent:ProcessInstance|Frame
+            The scope containing the activity that started the frame.
+            
+        node:int
+            Index, in the parent scope, of the activity that started the frame.
+            
+        data:dict
+            node index -> data inputs and outputs (Variables) of the running Activities with Data Associations
+            (None while there is none).
+        '''
+        self.process = process
+        self.tokens = []
+        self.joins = {}
+        self.variables = variables
+        self.data = None
+        self.parent = parent
+        self.node = node
+        
+    def __repr__(self):
+        return '<Frame %s>'%self.process.id
+        
+class CompensationFrame(Frame):
+    '''
+    A CompensationFrame runs the compensation handler of one Activity on CompensationVariables :
+    it reads the variables snapshotted when the Activity completed and writes the live variables of its scope.
+    When it completes, the next pending handler is started, then the compensation throw Event goes on.
+    '''
+    __slots__ = ('pending',)
+    
+    def __init__(self, process, variables, parent, node, pending):
+        '''
+        pending:(scope, activity index, Snapshot) list
+            The records still to compensate after this one, most recent first.
+        '''
+        super(CompensationFrame, self).__init__(process, variables, parent, node)
+        self.pending = pending
+        
+class ProcessInstance(object):
+    '''
+    A ProcessInstance is the runtime record of one execution of a CompiledProcess.
+    Tokens are stored as node indexes of the CompiledProcess.
+    '''
+    __slots__ = ('id', 'process', 'state', 'tokens', 'joins', 'variables', 'data', 'frames', 'ready', 'fault', 'compensations')
+    
+    parent = None
+    node = None
+    
+    def __init__(self, id, process, tokens, variables, state='Active'):
+        '''
+        id:int
+            Identifier of the instance, unique within an Engine.
+            
+        process:CompiledProcess
+            The compiled definition executed by the instance.
+        
+        tokens:int list
+            Node indexes where the tokens of the instance are located.
+            
+        variables:Variables
+            Values of the variables of the instance.
+            
+        state:InstanceState enum (default='Active') {'Active'|'Completed'|'Failed'|'Terminated'}
+        
+        joins:dict
+            node index -> number of tokens arrived on a joining Parallel Gateway.
+        
+        data:dict
+            node index -> data inputs and outputs of the running Activities with Data Associations.
+            
+        frames:Frame list
+            The active child scopes of the instance.
+            
+        ready:(scope, node index) list
+            Tokens entered in a node and not yet processed by the engine.
+            
+        fault:str
+            errorCode of the Error that made the instance fail.
+            
+        compensations:CompensationLog
+            The compensable Activities completed by the instance (None until the first one completes).
+        '''
+        self.id = id
+        self.process = process
+        self.tokens = []
+        self.joins = {}
+        self.variables = variables
+        self.data = None
+        self.state = state
+        self.frames = []
+        self.ready = [(self, node) for node in tokens]
+        self.fault = None
+        self.compensations = None
+        self.tokens.extend(tokens)
+        
+    def __repr__(self):
+        return '<ProcessInstance %s of %s (%s)>'%(self.id, self.process.id, self.state)
+        
+    def scopes(self):
+        '''
+        Return the root scope followed by the active frames.
+        '''
+        return [self] + self.frames
+        
+    def dump(self):
+        '''
+        Return the execution state of the instance as plain data, frames being referred by their position.
+        The variables of a frame sharing the variables of its parent are dumped as None.
+        '''
+        scopes = self.scopes()
+        position = dict((id(scope), index) for index, scope in enumerate(scopes))
+        frames = [(frame.process.id, position[id(frame.parent)], frame.node, frame.tokens, frame.joins,
+                   None if frame.variables is frame.parent.variables else frame.variables.dump(), dump_data(frame))
+                  for frame in self.frames]
+        return self.tokens, self.joins, self.variables.dump(), dump_data(self), frames
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Data Associations of Activities.
+
+The DataInputAssociations and DataOutputAssociations of an Activity are compiled once into operations between slots :
+the data inputs and outputs of the Activity have their own VariableLayout, and an association without transformation
+nor assignment is a plain copy from a slot of the scope to a slot of the Activity (or back).
+Expressions are only evaluated for the associations which have a transformation or assignments.
+'''
+
+class DataMapping(object):
+    '''
+    Compiled Data Associations of one Activity.
+    '''
+    def __init__(self, layout, inputs, outputs):
+        '''
+        layout:VariableLayout
+            Slots of the data inputs and data outputs of the Activity.
+            
+        inputs:(name, slot) list
+            Data inputs of the Activity, passed by name to a called element.
+            
+        outputs:(name, slot) list
+            Data outputs of the Activity, collected by name from a called element.
+            
+        input_copies:(scope slot, activity slot) list
+        
+        input_expressions:(code, activity slot) list
+            Transformations and assignments evaluated in the scope of the Activity.
+            
+        output_copies:(activity slot, scope slot) list
+        
+        output_expressions:(code, scope slot) list
+            Transformations and assignments evaluated in the data of the Activity.
+        '''
+        super(DataMapping, self).__init__()
+        self.layout = layout
+        self.inputs = inputs
+        self.outputs = outputs
+        self.input_copies = []
+        self.input_expressions = []
+        self.output_copies = []
+        self.output_expressions = []
+        
+    def enter(self, variables):
+        '''
+        Return the data of the Activity filled from the variables of its scope.
+        '''
+        data = self.layout.new()
+        values = data.values
+        get_slot = variables.get_slot
+        for source, target in self.input_copies:
+            values[target] = get_slot(source)
+        for code, target in self.input_expressions:
+            values[target] = eval(code, {}, variables)
+        return data
+        
+    def leave(self, data, variables):
+        '''
+        Write the data outputs of the Activity in the variables of its scope.
+        '''
+        values = variables.values
+        get_slot = data.get_slot
+        for source, target in self.output_copies:
+            values[target] = get_slot(source)
+        for code, target in self.output_expressions:
+            values[target] = eval(code, {}, data)
+            
+    def call(self, data):
+        '''
+        Return the data inputs of the Activity by name, as initial values of a called element.
+        '''
+        get_slot = data.get_slot
+        return dict((name, get_slot(slot)) for name, slot in self.inputs)
+        
+    def collect(self, data, variables):
+        '''
+        Fill the data outputs of the Activity from the variables of a completed called element.
+        '''
+        values = data.values
+        for name, slot in self.outputs:
+            values[slot] = variables.get(name)
+            
+    def __repr__(self):
+        return '<DataMapping %s>'%', '.join(self.layout.names)
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Message bus of Collaborations.
+
+The MessageFlows of a Collaboration are compiled into a routing table : source InteractionNode id -> Routes.
+A Message sent by a Participant (or by one of its Activities or Events) is queued in the inbound queue of every
+target Participant, then dispatched by batches : the Messages instantiating a Process are started with a single
+Engine.start_many per batch and the Messages delivered to running instances are persisted with a single write.
+Payloads are handed over as they are, without serialization nor copy : co-hosted Processes share the objects they exchange.
+The Messages of the MessageFlows grouped in Conversations are delivered to the instances of their ConversationInstance
+(see Engine.conversations).
+'''
+
+from collections import deque
+
+from Engine.compiler import message_key
+from Engine.conversations import ConversationRuntime
+from Core.Common.ErrorModels import EngineError
+
+def interaction_nodes(container):
+    '''
+    Yield the FlowElements of container and of its Sub-Processes.
+    '''
+    for element in getattr(container, 'flowElements', []):
+        yield element
+        for child in interaction_nodes(element):
+            yield child
+            
+class Route(object):
+    '''
+    Destination of the Messages going down a MessageFlow.
+    '''
+    __slots__ = ('flow', 'participant', 'process', 'node', 'message')
+    
+    def __init__(self, flow, participant, process, node, message):
+        '''
+        flow:str
+            Id of the MessageFlow.
+            
+        participant:str
+            Id of the target Participant.
+            
+        process:Process
+            The Process of the target Participant (None for a Participant without Process).
+            
+        node:str
+            Id of the target Activity or Event (None when the MessageFlow targets the Pool).
+            
+        message:str
+            Id of the Message of the MessageFlow (None to route any Message).
+        '''
+        self.flow = flow
+        self.participant = participant
+        self.process = process
+        self.node = node
+        self.message = message
+        
+    def __repr__(self):
+        return '<Route %s/%s>'%(self.participant, self.node or '')
+        
+class MessageBus(object):
+    '''
+    In-process delivery of the Messages exchanged between the Participants of Collaborations.
+    The bus is not thread safe : it is driven by the thread driving its Engine.
+    '''
+    def __init__(self, engine, collaborations=(), capacity=1000, batch=100):
+        '''
+        engine:Engine
+            The engine running the Processes of the Participants. The bus is attached to it.
+            
+        collaborations:Collaboration list
+            Collaborations to route (see add).
+            
+        capacity:int (default=1000)
+            Number of Messages an inbound queue holds before send dispatches it.
+            
+        batch:int (default=100)
+            Maximum number of Messages dispatched together.
+            
+        routes:dict
+            source InteractionNode id -> Route list. The routes of the Activities and Events of a Participant
+            are also routes of the Participant.
+            
+        owners:dict
+            FlowNode id -> id of the Participant whose Process contains the node.
+            
+        queues:dict
+            Participant id -> inbound deque of (Route, message id, payload, instance, ConversationInstance).
+            
+        undelivered:deque
+            Queued items of the Messages no instance consumed, the last capacity ones only (see take_undelivered).
+            
+        lost:int
+            Undelivered items discarded because undelivered was full.
+            
+        conversations:ConversationRuntime
+            The ConversationInstances of the Conversations of the routed Collaborations, closed as their instances end.
+            
+        fanout:FanOut
+            Delivery to the multi-instance Participants (None until a FanOut is attached).
+        '''
+        super(MessageBus, self).__init__()
+        if capacity < 1 or batch < 1:
+            raise EngineError('capacity and batch of a MessageBus must be greater than 0')
+        self.engine = engine
+        self.capacity = capacity
+        self.batch = batch
+        self.routes = {}
+        self.owners = {}
+        self.queues = {}
+        self.undelivered = deque()
+        self.lost = 0
+        self.conversations = ConversationRuntime()
+        self.fanout = None
+        for collaboration in collaborations:
+            self.add(collaboration)
+        engine.bus = self
+        engine.ended.append(self.conversations.ended)
+        
+    def add(self, collaboration):
+        '''
+        Compile the MessageFlows of collaboration into the routing table.
+        '''
+        processes = {}
+        for participant in collaboration.participants:
+            self.queues.setdefault(participant.id, deque())
+            processes[participant.id] = participant.processRef
+            if participant.processRef is not None:
+                for element in interaction_nodes(participant.processRef):
+                    self.owners[element.id] = participant.id
+        for flow in collaboration.messageFlow:
+            target = flow.targetRef.id
+            participant = target if target in processes else self.owners.get(target)
+            if participant is None:
+                raise EngineError('Target of MessageFlow %s is not a Participant nor in the Process of a Participant'%flow.id)
+            node = None if target == participant else target
+            message = flow.messageRef or getattr(flow.targetRef, 'messageRef', None)
+            route = Route(flow.id, participant, processes[participant], node,
+                          message_key(message) if message is not None else None)
+            self.routes.setdefault(flow.sourceRef.id, []).append(route)
+            owner = self.owners.get(flow.sourceRef.id)
+            if owner is not None:
+                self.routes.setdefault(owner, []).append(route)
+        self.conversations.add(collaboration)
+            
+    ##########################################################
+    # Sending
+    
+    def send(self, source, message, payload=None, instance=None, sender=None):
+        '''
+        Queue message on the MessageFlows of source and return the number of queued deliveries.
+        An inbound queue full at capacity is dispatched before, so that producers cannot outrun the receivers.
+        
+        source:InteractionNode|str
+            The Participant, Activity or Event sending the Message (or its id).
+            
+        message:Message|str
+            The Message or its id.
+            
+        payload:dict|Variables
+            Content of the Message, set in the receiving scope.
+            
+        instance:ProcessInstance
+            The instance receiving the Message; by default the instance of the target Participant in the conversation
+            of the Message or, out of any conversation, a new instance of the target Process.
+            
+        sender:ProcessInstance
+            The instance sending the Message, bound to the conversation of the Message.
+        '''
+        queued = self.post(source, message, payload, instance, sender)
+        for participant, queue in self.queues.items():
+            while len(queue) > self.capacity:
+                self.dispatch_participant(participant)
+        return queued
+        
+    def post(self, source, message, payload=None, instance=None, sender=None):
+        '''
+        Queue message without dispatching : used by the Engine while it runs an instance.
+        '''
+        key = message_key(message)
+        node = source
+        source = getattr(source, 'id', source)
+        owner = self.owners.get(source, source)
+        routes = self.routes.get(source)
+        if routes is None:
+            routes = self.routes.get(owner)
+        fanout = self.fanout
+        queued = 0
+        for route in routes or ():
+            if route.message is None or key is None or route.message == key:
+                if fanout is not None and route.participant in fanout.members:
+                    fanout.post(node, route, key or route.message, payload, sender, owner)
+                    queued += 1
+                    continue
+                conversation = None
+                if instance is None:
+                    conversation = self.conversations.correlate(route.flow, key or route.message, payload, sender, owner)
+                self.queues[route.participant].append((route, key or route.message, payload, instance, conversation))
+                queued += 1
+        return queued
+        
+    ##########################################################
+    # Dispatching
+    
+    def dispatch(self, limit=None):
+        '''
+        Dispatch the inbound queues by batches until they are empty (Messages sent while dispatching included),
+        or until limit Messages have been dispatched. Return the number of dispatched Messages.
+        '''
+        dispatched = 0
+        while limit is None or dispatched < limit:
+            done = dispatched
+            if self.fanout is not None:
+                dispatched += self.fanout.dispatch()
+            for participant, queue in self.queues.items():
+                if limit is not None and dispatched >= limit:
+                    break
+                if queue:
+                    count = self.batch if limit is None else min(self.batch, limit - dispatched)
+                    dispatched += self.dispatch_participant(participant, count)
+            if dispatched == done:
+                break
+        return dispatched
+        
+    def dispatch_participant(self, participant, count=None):
+        '''
+        Dispatch one batch of the inbound queue of participant. Return the number of dispatched Messages.
+        A Message of a conversation whose target instance is started by the same batch is delivered to that instance.
+        '''
+        queue = self.queues[participant]
+        if count is None:
+            count = self.batch
+        items = [queue.popleft() for i in range(min(len(queue), count))]
+        starts = {}
+        starting = set()
+        deliveries = []
+        for item in items:
+            route, key, payload, instance, conversation = item
+            if instance is None and conversation is not None:
+                instance = conversation.instances.get(participant)
+                if instance is None and conversation.id in starting:
+                    deliveries.append(item)
+                    continue
+            if instance is None:
+                starts.setdefault((route.process, key), []).append(item)
+                if conversation is not None:
+                    starting.add(conversation.id)
+            else:
+                deliveries.append((route, key, payload, instance, conversation))
+        engine = self.engine
+        for (process, key), batch in starts.items():
+            if process is None or not engine.compile(process).start_messages.get(key):
+                self.undeliver(batch)
+                for route, key, payload, instance, conversation in batch:
+                    starting.discard(getattr(conversation, 'id', None))
+                continue
+            engine.start_many(process, [item[2] for item in batch], message=key,
+                              created=lambda instances, batch=batch: self._bind(batch, instances))
+        if deliveries:
+            deliveries = [(route, key, payload, instance or conversation.instances.get(participant), conversation)
+                          for route, key, payload, instance, conversation in deliveries]
+            self.undeliver(item for item in deliveries if item[3] is None)
+            deliveries = [item for item in deliveries if item[3] is not None]
+            consumed = engine.message_many((instance, key, payload) for route, key, payload, instance, conversation in deliveries)
+            self.undeliver(item for item, ok in zip(deliveries, consumed) if not ok)
+        return len(items)
+        
+    def undeliver(self, items):
+        '''
+        Keep the (Route, message id, payload, instance, ConversationInstance) items of Messages no instance consumed ;
+        the oldest ones are discarded beyond capacity.
+        '''
+        undelivered = self.undelivered
+        undelivered.extend(items)
+        while len(undelivered) > self.capacity:
+            undelivered.popleft()
+            self.lost += 1
+            
+    def take_undelivered(self):
+        '''
+        Remove and return the undelivered items, oldest first.
+        '''
+        items = list(self.undelivered)
+        self.undelivered.clear()
+        return items
+        
+    def _bind(self, batch, instances):
+        for (route, key, payload, instance, conversation), new in zip(batch, instances):
+            if conversation is not None:
+                self.conversations.bind(conversation, route.participant, new)
+        
+    def pending(self):
+        '''
+        Return the number of queued Messages.
+        '''
+        pending = sum(len(queue) for queue in self.queues.values())
+        if self.fanout is not None:
+            pending += len(self.fanout.pending)
+        return pending
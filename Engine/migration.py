@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Migration of running instances between two compiled versions of a Process.
+
+A MigrationPlan maps the nodes of the source CompiledProcess (and of its embedded Sub-Processes) to the nodes of the
+target one, by FlowNode id unless overridden, and the variable slots of the source layout to the target layout by name.
+The plan is validated once ; each instance is then checked against it (every token, join, data and compensation record
+must be on a mapped node, and a compensation record on a node with a compensation handler in the target) before being
+rewritten in place : tokens, joins, data, frames and variables are re-keyed on the target, so that the instance goes on
+as if it had been started on the target version.
+Instances are migrated and persisted by batches ; a partition (k, n) restricts a run to the instances whose id is k
+modulo n, so that several workers, each owning a partition of the store, migrate in parallel.
+'''
+
+from Core.Common.ErrorModels import EngineError
+from Engine.compiler import CompiledProcess
+from Engine.forecasting import Instantaneous
+
+#Kinds of nodes which MUST be mapped to a node of the same kind
+Structural = set(['parallel', 'subprocess', 'call', 'eventsubprocess'])
+
+def relayout(variables, layout):
+    '''
+    Move variables to layout in place : values are kept by name, the variables not declared by layout become extra ones.
+    '''
+    if variables.layout is layout:
+        return
+    source = variables.layout
+    values = variables.values
+    extra = dict(variables.extra) if variables.extra else {}
+    for name, value in zip(source.names, values):
+        if name not in layout.index:
+            extra[name] = value
+    new = []
+    for slot, name in enumerate(layout.names):
+        old = source.index.get(name)
+        if old is not None:
+            new.append(values[old])
+        elif name in extra:
+            new.append(extra.pop(name))
+        else:
+            new.append(layout.defaults[slot])
+    variables.layout = layout
+    variables.values = new
+    variables.extra = extra or None
+    
+class ScopeMapping(object):
+    '''
+    Node mapping between a source CompiledProcess and a target one.
+    '''
+    def __init__(self, source, target, overrides):
+        '''
+        source:CompiledProcess
+        
+        target:CompiledProcess
+        
+        nodes:list
+            Target node index of each source node (None when unmapped).
+            
+        errors:str list
+            Mappings between incompatible nodes.
+            
+        unmapped:str list
+            Ids of the source nodes which may hold a waiting token but are not mapped : the instances with a token
+            on them cannot be migrated.
+        '''
+        super(ScopeMapping, self).__init__()
+        self.source = source
+        self.target = target
+        self.nodes = []
+        self.errors = []
+        self.unmapped = []
+        for index, node in enumerate(source.nodes):
+            target_id = overrides.get(node.id, node.id)
+            mapped = target.node_index.get(target_id) if target_id is not None else None
+            if target_id is not None and mapped is None and node.id in overrides:
+                self.errors.append('%s is mapped to %s, which is not a node of %s'%(node.id, target_id, target.id))
+            kind = source.kinds[index]
+            if mapped is not None and (kind in Structural or target.kinds[mapped] in Structural) \
+                    and kind != target.kinds[mapped]:
+                self.errors.append('%s (%s) cannot be mapped to %s (%s)'%(node.id, kind, target_id, target.kinds[mapped]))
+            if mapped is None and kind not in Instantaneous:
+                self.unmapped.append(node.id)
+            self.nodes.append(mapped)
+            
+class MigrationReport(object):
+    '''
+    Result of a migration run.
+    '''
+    def __init__(self):
+        '''
+        migrated:int
+            Number of instances migrated.
+            
+        failed:dict
+            instance id -> reason why it was not migrated.
+        '''
+        self.migrated = 0
+        self.failed = {}
+        
+    def __repr__(self):
+        return '<MigrationReport %s migrated, %s failed>'%(self.migrated, len(self.failed))
+        
+class MigrationPlan(object):
+    '''
+    Mapping of a source version of a Process to a target version, and migration of its instances.
+    '''
+    def __init__(self, engine, source, target, overrides=None):
+        '''
+        engine:Engine
+            The engine running the instances.
+            
+        source:Process|CompiledProcess
+        
+        target:Process|CompiledProcess
+            The versions to migrate from and to.
+            
+        overrides:dict (default=None)
+            Source node id -> target node id (None to leave the node unmapped), for the nodes whose id changed.
+            
+        scopes:dict
+            id of a source CompiledProcess (the Process or an embedded Sub-Process) -> its ScopeMapping.
+        '''
+        super(MigrationPlan, self).__init__()
+        self.engine = engine
+        self.source = source if isinstance(source, CompiledProcess) else engine.compile(source)
+        self.target = target if isinstance(target, CompiledProcess) else engine.compile(target)
+        self.overrides = overrides or {}
+        self.scopes = {}
+        self._map(self.source, self.target)
+        
+    def _map(self, source, target):
+        mapping = self.scopes[id(source)] = ScopeMapping(source, target, self.overrides)
+        for node, child in source.children.items():
+            mapped = mapping.nodes[node]
+            if child.depth and mapped is not None:
+                target_child = target.children.get(mapped)
+                if target_child is not None and target_child.depth:
+                    self._map(child, target_child)
+                    
+    @property
+    def errors(self):
+        return [error for mapping in self.scopes.values() for error in mapping.errors]
+        
+    @property
+    def unmapped(self):
+        return [node for mapping in self.scopes.values() for node in mapping.unmapped]
+        
+    ##########################################################
+    # Migration
+    
+    def check(self, instance):
+        '''
+        Return the reason why instance cannot be migrated, or None.
+        '''
+        if instance.process is not self.source:
+            return 'not an instance of %s'%self.source.id
+        scopes = self.scopes
+        for scope in instance.scopes():
+            if scope is not instance:
+                parent = scopes.get(id(scope.parent.process))
+                if parent is not None and parent.nodes[scope.node] is None:
+                    return '%s is not mapped'%scope.parent.process.nodes[scope.node].id
+            mapping = scopes.get(id(scope.process))
+            if mapping is None:
+                if scope.process.depth:
+                    return 'Sub-Process %s is not mapped'%scope.process.id
+                continue
+            for node in set(scope.tokens) | set(scope.joins) | set(scope.data or ()):
+                if mapping.nodes[node] is None:
+                    return 'token on %s, which is not mapped'%scope.process.nodes[node].id
+        live = set(id(scope) for scope in instance.scopes())
+        for scope, node in instance.ready:
+            mapping = scopes.get(id(scope.process))
+            if mapping is not None and mapping.nodes[node] is None:
+                return 'ready token on %s, which is not mapped'%scope.process.nodes[node].id
+        for scope, node, snapshot in self._records(instance):
+            mapping = scopes.get(id(scope.process))
+            if id(scope) not in live or mapping is None:
+                continue
+            if mapping.nodes[node] is None:
+                return 'compensable %s is not mapped'%scope.process.nodes[node].id
+            if mapping.nodes[node] not in mapping.target.compensations:
+                return 'compensable %s has no compensation handler in the target'%scope.process.nodes[node].id
+        return None
+        
+    def _records(self, instance):
+        '''
+        Return the compensation records of instance, the pending ones of its CompensationFrames included.
+        '''
+        records = list(instance.compensations.records) if instance.compensations is not None else []
+        for frame in instance.frames:
+            records.extend(frame.pending or ())
+        return records
+        
+    def apply(self, instance):
+        '''
+        Rewrite instance in place on the target version (instance MUST have been checked).
+        '''
+        scopes = self.scopes
+        previous = dict((id(scope), scopes.get(id(scope.process))) for scope in instance.scopes())
+        for scope in instance.scopes():
+            if scope is not instance:
+                parent = previous[id(scope.parent)]
+                if parent is not None:
+                    scope.node = parent.nodes[scope.node]
+            mapping = previous[id(scope)]
+            if mapping is None:
+                continue
+            nodes = mapping.nodes
+            source, target = mapping.source.counters, mapping.target.counters
+            for node in scope.tokens:
+                source.cancelled[node] += 1
+                target.started[nodes[node]] += 1
+            scope.tokens[:] = [nodes[node] for node in scope.tokens]
+            if scope.joins:
+                joins = dict((nodes[node], arrived) for node, arrived in scope.joins.items())
+                scope.joins.clear()
+                scope.joins.update(joins)
+            if scope.data:
+                data = {}
+                for node, values in scope.data.items():
+                    target_mapping = mapping.target.mappings.get(nodes[node])
+                    if target_mapping is not None:
+                        relayout(values, target_mapping.layout)
+                        data[nodes[node]] = values
+                scope.data = data or None
+            if scope is instance or scope.variables is not scope.parent.variables:
+                relayout(scope.variables, mapping.target.layout)
+            scope.process = mapping.target
+        instance.ready[:] = [(scope, node if previous[id(scope)] is None else previous[id(scope)].nodes[node])
+                             for scope, node in instance.ready]
+        #the records of completed frames keep their source process, and so their source node
+        stores = [frame.pending for frame in instance.frames if frame.pending]
+        if instance.compensations is not None:
+            stores.append(instance.compensations.records)
+        for records in stores:
+            for position, (scope, node, snapshot) in enumerate(records):
+                mapping = previous.get(id(scope))
+                if mapping is not None:
+                    records[position] = (scope, mapping.nodes[node], snapshot)
+                    
+    def migrate(self, instances=None, batch=1000, partition=None):
+        '''
+        Migrate instances (by default, the running instances of the source version) batch by batch,
+        persisting each batch in a single write. Return the MigrationReport.
+        
+        partition:(int, int) (default=None)
+            (k, n) to migrate only the instances whose id is k modulo n.
+        '''
+        errors = self.errors
+        if errors:
+            raise EngineError('Invalid migration plan : %s'%'; '.join(errors))
+        if instances is None:
+            instances = [instance for instance in self.engine.instances.values()
+                         if instance.process is self.source and instance.state == 'Active']
+        if partition is not None:
+            k, n = partition
+            instances = [instance for instance in instances if instance.id % n == k]
+        report = MigrationReport()
+        store = self.engine.store
+        for start in range(0, len(instances), batch):
+            migrated = []
+            for instance in instances[start:start + batch]:
+                reason = self.check(instance)
+                if reason is not None:
+                    report.failed[instance.id] = reason
+                    continue
+                self.apply(instance)
+                migrated.append(instance)
+            if migrated:
+                store.save_many(migrated)
+                for observer in self.engine.migrated:
+                    observer(migrated, self.source, self.target)
+            report.migrated += len(migrated)
+        return report
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Load monitoring of the compiled processes.
+
+Each CompiledProcess holds NodeCounters : per node, the number of tokens started, completed and cancelled, and per flow,
+the number of tokens taken, incremented by the engine as the tokens move (a list item increment, no lock and no event
+record). The tokens entered in a node are the started ones and the ones taken by its incoming flows, the tokens waiting
+in it the entered ones not yet completed nor cancelled.
+A LoadMonitor periodically copies the counters into a ring buffer of snapshots, from which it derives the rates,
+and accumulates the token-seconds spent in each node, from which it derives the mean time in node (Little's law :
+time in node = token-seconds / completed tokens).
+The snapshots are readable through the Python API and in the Prometheus text exposition format.
+'''
+
+import time
+from collections import deque
+from threading import Thread, Event, Lock
+
+class NodeCounters(object):
+    '''
+    Token counters of the nodes and flows of a CompiledProcess.
+    The counters are only incremented, and without lock : a snapshot may be one move late, never wrong.
+    '''
+    __slots__ = ('started', 'taken', 'completed', 'cancelled', 'incoming')
+    
+    def __init__(self, size, incoming):
+        '''
+        size:int
+            Number of nodes.
+            
+        incoming:tuple list
+            Incoming flow indexes of each node.
+            
+        started:int list
+            Tokens entered in each node otherwise than through a flow (Start Events, boundary Events...).
+            
+        taken:int list
+            Tokens moved down each flow.
+            
+        completed:int list
+            Tokens that left each node through its outgoing flows (merged ones included).
+            
+        cancelled:int list
+            Tokens removed from each node by a cancellation (boundary Event, Terminate End Event, Error...).
+        '''
+        self.started = [0] * size
+        self.taken = [0] * sum(len(flows) for flows in incoming)
+        self.completed = [0] * size
+        self.cancelled = [0] * size
+        self.incoming = incoming
+        
+    def read(self):
+        '''
+        Return the (entered, completed, cancelled, waiting) counts of the nodes.
+        '''
+        started, taken = self.started[:], self.taken[:]
+        completed, cancelled = self.completed[:], self.cancelled[:]
+        entered = [count + sum(taken[flow] for flow in flows) for count, flows in zip(started, self.incoming)]
+        waiting = [a - b - c for a, b, c in zip(entered, completed, cancelled)]
+        return entered, completed, cancelled, waiting
+        
+class Snapshot(object):
+    '''
+    Counters of the compiled processes of an engine at a given time.
+    '''
+    __slots__ = ('time', 'counters', 'busy')
+    
+    def __init__(self, time, counters, busy):
+        '''
+        time:float
+            Epoch of the snapshot.
+            
+        counters:dict
+            CompiledProcess key (see compiled_processes) -> (entered, completed, cancelled, waiting) lists.
+            
+        busy:dict
+            CompiledProcess key -> token-seconds spent in each node since the monitor started.
+        '''
+        self.time = time
+        self.counters = counters
+        self.busy = busy
+        
+def compiled_processes(engine):
+    '''
+    Yield (key, CompiledProcess) for the processes compiled by engine and their embedded Sub-Processes,
+    key being (path, version) : the process id followed by the ids of the Sub-Processes ('/' separated),
+    and the version of the process, so that the versions of a process deployed together are counted apart.
+    '''
+    stack = [(compiled.id, compiled.version, compiled) for compiled in engine.compiled.values()]
+    while stack:
+        path, version, compiled = stack.pop()
+        yield (path, version), compiled
+        for child in compiled.children.values():
+            if child.depth:
+                stack.append(('%s/%s'%(path, child.id), version, child))
+                
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    
+class LoadMonitor(object):
+    '''
+    Ring buffer of the snapshots of the node counters of an engine.
+    '''
+    def __init__(self, engine, size=360, interval=10.0):
+        '''
+        engine:Engine
+            The engine to monitor.
+            
+        size:int (default=360)
+            Number of snapshots kept, the oldest ones are dropped first.
+            
+        interval:float (default=10.0)
+            Seconds between two snapshots when the monitor runs in the background (see start).
+            
+        snapshots:Snapshot deque
+            The snapshots, oldest first.
+        '''
+        super(LoadMonitor, self).__init__()
+        self.engine = engine
+        self.interval = interval
+        self.snapshots = deque(maxlen=size)
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread = None
+        
+    def snapshot(self):
+        '''
+        Copy the counters into a new Snapshot and return it.
+        '''
+        with self._lock:
+            now = time.time()
+            previous = self.snapshots[-1] if self.snapshots else None
+            counters = {}
+            busy = {}
+            for key, compiled in compiled_processes(self.engine):
+                counters[key] = compiled.counters.read()
+                waiting = counters[key][3]
+                if previous is not None and key in previous.busy:
+                    elapsed = now - previous.time
+                    last = previous.counters[key][3]
+                    busy[key] = [spent + (before + after) * elapsed / 2.0
+                                 for spent, before, after in zip(previous.busy[key], last, waiting)]
+                else:
+                    busy[key] = [0.0] * len(waiting)
+            snapshot = Snapshot(now, counters, busy)
+            self.snapshots.append(snapshot)
+            return snapshot
+            
+    ##########################################################
+    # Background snapshots
+    
+    def start(self):
+        '''
+        Take a snapshot every interval seconds in a daemon thread.
+        '''
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name='LoadMonitor')
+        self._thread.daemon = True
+        self._thread.start()
+        
+    def _run(self):
+        self.snapshot()
+        while not self._stop.wait(self.interval):
+            self.snapshot()
+            
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            
+    ##########################################################
+    # Queries
+    
+    def stats(self, window=None):
+        '''
+        Return, per compiled process key (path, version), a dict node id -> stats of the node over the last window
+        snapshots (by default, all the buffered ones), the versions unloaded since the last snapshot left out :
+            waiting : tokens in the node at the last snapshot,
+            entered, completed : tokens per second,
+            time : mean seconds spent in the node by the completed tokens (None when no token completed).
+        '''
+        snapshots = list(self.snapshots)
+        if window is not None:
+            snapshots = snapshots[-window - 1:]
+        if not snapshots:
+            return {}
+        processes = dict(compiled_processes(self.engine))
+        first, last = snapshots[0], snapshots[-1]
+        elapsed = last.time - first.time
+        result = {}
+        for key, (entered, completed, cancelled, waiting) in last.counters.items():
+            if key not in processes:
+                continue
+            start = first.counters.get(key)
+            if start is None:
+                start = ([0] * len(entered), [0] * len(entered), None, None)
+                spent_before = [0.0] * len(entered)
+            else:
+                spent_before = first.busy[key]
+            table = {}
+            for index, node in enumerate(processes[key].nodes):
+                done = completed[index] - start[1][index]
+                spent = last.busy[key][index] - spent_before[index]
+                table[node.id] = {'waiting': waiting[index],
+                                  'entered': (entered[index] - start[0][index]) / elapsed if elapsed else 0.0,
+                                  'completed': done / elapsed if elapsed else 0.0,
+                                  'time': spent / done if done else None}
+            result[key] = table
+        return result
+        
+    def prometheus(self):
+        '''
+        Return the last snapshot in the Prometheus text exposition format, labelled by process path and version.
+        '''
+        if not self.snapshots:
+            self.snapshot()
+        snapshot = self.snapshots[-1]
+        processes = dict(compiled_processes(self.engine))
+        metrics = [('bpmn_node_tokens', 'gauge', 'Tokens waiting in the node.', 3),
+                   ('bpmn_node_entered_total', 'counter', 'Tokens entered in the node.', 0),
+                   ('bpmn_node_completed_total', 'counter', 'Tokens completed by the node.', 1),
+                   ('bpmn_node_cancelled_total', 'counter', 'Tokens cancelled in the node.', 2),
+                   ('bpmn_node_token_seconds_total', 'counter', 'Seconds spent by the tokens in the node.', None)]
+        lines = []
+        for name, kind, description, column in metrics:
+            lines.append('# HELP %s %s'%(name, description))
+            lines.append('# TYPE %s %s'%(name, kind))
+            for key in sorted(key for key in snapshot.counters if key in processes):
+                values = snapshot.busy[key] if column is None else snapshot.counters[key][column]
+                for node, value in zip(processes[key].nodes, values):
+                    lines.append('%s{process="%s",version="%s",node="%s"} %s'%(name, escape(key[0]), escape(key[1]),
+                                                                             escape(node.id), repr(value)))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Persistence of process instances.
+Every store implements save(instance), save_many(instances) and load(id);
+save_many MUST write the whole batch at once.
+Task stores keep the human task records (see Engine.tasks) and implement insert_many(records), load(id) and
+swap_many(changes), the compare-and-set of a batch of records on their version.
+'''
+
+import sqlite3
+from itertools import count
+from threading import Lock
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+class MemoryStore(object):
+    '''
+    Volatile store keeping instance records in a dict.
+    '''
+    def __init__(self):
+        super(MemoryStore, self).__init__()
+        self.records = {}
+        
+    def save(self, instance):
+        self.records[instance.id] = instance
+        
+    def save_many(self, instances):
+        self.records.update((instance.id, instance) for instance in instances)
+        
+    def load(self, id):
+        return self.records[id]
+        
+class SQLiteStore(object):
+    '''
+    Store keeping instance records in a sqlite database.
+    The execution state (see ProcessInstance.dump) is pickled in a single blob column.
+    '''
+    def __init__(self, path=':memory:'):
+        '''
+        path:str (default=':memory:')
+            Location of the sqlite database.
+        '''
+        super(SQLiteStore, self).__init__()
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS instances '
+                                '(id INTEGER PRIMARY KEY, process TEXT, state TEXT, data BLOB)')
+        self.connection.commit()
+        
+    def _row(self, instance):
+        data = pickle.dumps(instance.dump(), pickle.HIGHEST_PROTOCOL)
+        return (instance.id, instance.process.id, instance.state, sqlite3.Binary(data))
+        
+    def save(self, instance):
+        self.save_many((instance,))
+        
+    def save_many(self, instances):
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO instances VALUES (?,?,?,?)',
+                                        [self._row(instance) for instance in instances])
+            
+    def load(self, id):
+        '''
+        Return the raw record (id, process id, state, execution state) of an instance.
+        '''
+        row = self.connection.execute('SELECT id, process, state, data FROM instances WHERE id=?', (id,)).fetchone()
+        if row is None:
+            raise KeyError(id)
+        return row[0], row[1], row[2], pickle.loads(bytes(row[3]))
+        
+    def close(self):
+        self.connection.close()
+        
+class MemoryTaskStore(object):
+    '''
+    Volatile store of human task records (id, instance id, node id, state, owner, version).
+    The ids are allocated by the store; records are only changed by compare-and-set on their version.
+    '''
+    def __init__(self):
+        super(MemoryTaskStore, self).__init__()
+        self.records = {}
+        self._ids = count(1)
+        self._lock = Lock()
+        
+    def insert_many(self, records):
+        '''
+        Insert the records (instance id, node id, state, owner, version) of new tasks. Return their allocated ids.
+        '''
+        ids = []
+        with self._lock:
+            for record in records:
+                id = next(self._ids)
+                self.records[id] = (id,) + tuple(record)
+                ids.append(id)
+        return ids
+        
+    def swap_many(self, changes):
+        '''
+        Apply each change (id, expected version, state, owner) if the version of its record is still the expected one,
+        incrementing the version. Return, for each change, True if it has been applied.
+        '''
+        applied = []
+        with self._lock:
+            for id, version, state, owner in changes:
+                record = self.records.get(id)
+                if record is None or record[5] != version:
+                    applied.append(False)
+                    continue
+                self.records[id] = (id, record[1], record[2], state, owner, version + 1)
+                applied.append(True)
+        return applied
+        
+    def load(self, id):
+        return self.records[id]
+        
+class SQLiteTaskStore(object):
+    '''
+    Store of human task records in a sqlite database, shared by the engines using the same file.
+    The ids are allocated by the database and the compare-and-set is a conditional update on the version,
+    so that concurrent engines never overwrite each other.
+    '''
+    def __init__(self, path=':memory:'):
+        '''
+        path:str (default=':memory:')
+            Location of the sqlite database.
+        '''
+        super(SQLiteTaskStore, self).__init__()
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS tasks '
+                                '(id INTEGER PRIMARY KEY AUTOINCREMENT, instance INTEGER, node TEXT, state TEXT, owner TEXT, '
+                                'version INTEGER)')
+        self.connection.commit()
+        self._lock = Lock()
+        
+    def insert_many(self, records):
+        '''
+        Insert the records (instance id, node id, state, owner, version) of new tasks in one transaction.
+        Return their allocated ids.
+        '''
+        with self._lock, self.connection:
+            execute = self.connection.execute
+            return [execute('INSERT INTO tasks (instance, node, state, owner, version) VALUES (?,?,?,?,?)', record).lastrowid
+                    for record in records]
+            
+    def swap_many(self, changes):
+        applied = []
+        with self._lock, self.connection:
+            for id, version, state, owner in changes:
+                cursor = self.connection.execute('UPDATE tasks SET state=?, owner=?, version=version+1 WHERE id=? AND version=?',
+                                                 (state, owner, id, version))
+                applied.append(cursor.rowcount == 1)
+        return applied
+        
+    def load(self, id):
+        row = self.connection.execute('SELECT id, instance, node, state, owner, version FROM tasks WHERE id=?', (id,)).fetchone()
+        if row is None:
+            raise KeyError(id)
+        return tuple(row)
+        
+    def close(self):
+        self.connection.close()
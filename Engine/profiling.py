@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Profiling of the engine.
+
+An Instrumentation wraps the points of the engine where its time goes and calls begin(event, subject) and
+end(event, subject) of its hooks around each of them :
+    'node'       the behaviour of a FlowNode (subject: the FlowNode)
+    'token'      a token leaving a FlowNode down its flows, output Data Associations included (subject: the FlowNode)
+    'expression' the evaluation of the conditions of the outgoing flows of a FlowNode (subject: the FlowNode)
+    'correlate'  the delivery of a Message to an instance (subject: the Message id)
+    'persist'    the write of instances in the store (subject: the number of instances)
+The events nest : the behaviour of an Activity moves its token, which evaluates the conditions of its flows.
+The wrappers are bound on the engine (and its store) when the instrumentation is attached and removed when it is
+detached : an engine without instrumentation runs its own methods, without any test nor call for the hooks.
+
+Two collectors are provided : a NodeTimer aggregating the time spent in each event and FlowNode, and a SamplingProfiler
+sampling the stack of events in a background thread. Both export their stacks in the collapsed format of flamegraph.pl
+(one 'frame;frame;frame weight' line per stack).
+'''
+
+import time
+from threading import Thread, Event
+
+Events = ['node', 'token', 'expression', 'correlate', 'persist']
+
+def label(event, subject):
+    '''
+    Return the frame name of event in the stacks.
+    '''
+    if event == 'node':
+        return '%s:%s'%(subject.__class__.__name__, subject.id)
+    if event == 'persist':
+        return event
+    return '%s:%s'%(event, getattr(subject, 'id', subject))
+    
+def collapsed(stacks):
+    '''
+    Return the lines 'frame;frame;frame weight' of stacks (frame tuple -> weight), heaviest first.
+    '''
+    return '\n'.join('%s %s'%(';'.join(stack), weight)
+                     for stack, weight in sorted(stacks.items(), key=lambda item: -item[1]) if weight)
+    
+class Hooks(object):
+    '''
+    Base of the profiling hooks, which ignores every event.
+    '''
+    def begin(self, event, subject):
+        pass
+        
+    def end(self, event, subject):
+        pass
+        
+class Tee(Hooks):
+    '''
+    Hooks calling several hooks in turn (in reverse order at the end of the events).
+    '''
+    def __init__(self, *hooks):
+        self.hooks = hooks
+        self.reversed = hooks[::-1]
+        
+    def begin(self, event, subject):
+        for hooks in self.hooks:
+            hooks.begin(event, subject)
+            
+    def end(self, event, subject):
+        for hooks in self.reversed:
+            hooks.end(event, subject)
+            
+class Instrumentation(object):
+    '''
+    Binding of profiling hooks on an engine.
+    '''
+    def __init__(self, engine, hooks):
+        '''
+        engine:Engine
+            The profiled engine.
+            
+        hooks:Hooks
+            Called at the begin and end of the events of the engine.
+        '''
+        self.engine = engine
+        self.hooks = hooks
+        self._behaviours = None
+        self._store = None
+        
+    def attach(self):
+        '''
+        Bind the wrappers on the engine : the profiling starts with its next behaviour.
+        '''
+        if self._behaviours is not None:
+            return self
+        engine = self.engine
+        begin, end = self.hooks.begin, self.hooks.end
+        self._behaviours = dict(engine.behaviours)
+        for kind, behaviour in self._behaviours.items():
+            engine.behaviours[kind] = self._node(behaviour, begin, end)
+        engine._leave = self._token(engine._leave, begin, end)
+        engine._select = self._expression(engine._select, begin, end)
+        engine._deliver = self._correlate(engine._deliver, begin, end)
+        self._store = store = engine.store
+        store.save = self._persist(store.save, begin, end, False)
+        store.save_many = self._persist(store.save_many, begin, end, True)
+        engine.profiling = self
+        return self
+        
+    def detach(self):
+        '''
+        Remove the wrappers : the engine runs its own methods again.
+        '''
+        if self._behaviours is None:
+            return
+        engine = self.engine
+        engine.behaviours.update(self._behaviours)
+        del engine._leave, engine._select, engine._deliver
+        del self._store.save, self._store.save_many
+        engine.profiling = None
+        self._behaviours = self._store = None
+        
+    def __enter__(self):
+        return self.attach()
+        
+    def __exit__(self, *args):
+        self.detach()
+        
+    @staticmethod
+    def _node(behaviour, begin, end):
+        def node(instance, scope, node):
+            subject = scope.process.nodes[node]
+            begin('node', subject)
+            try:
+                behaviour(instance, scope, node)
+            finally:
+                end('node', subject)
+        return node
+        
+    @staticmethod
+    def _token(leave, begin, end):
+        def token(instance, scope, node, flows=None):
+            subject = scope.process.nodes[node]
+            begin('token', subject)
+            try:
+                leave(instance, scope, node, flows)
+            finally:
+                end('token', subject)
+        return token
+        
+    @staticmethod
+    def _expression(select, begin, end):
+        def expression(scope, node, first=False):
+            subject = scope.process.nodes[node]
+            begin('expression', subject)
+            try:
+                return select(scope, node, first)
+            finally:
+                end('expression', subject)
+        return expression
+        
+    @staticmethod
+    def _correlate(deliver, begin, end):
+        def correlate(instance, key, variables):
+            begin('correlate', key)
+            try:
+                return deliver(instance, key, variables)
+            finally:
+                end('correlate', key)
+        return correlate
+        
+    @staticmethod
+    def _persist(save, begin, end, many):
+        def persist(instances):
+            if many:
+                instances = list(instances)
+            subject = len(instances) if many else 1
+            begin('persist', subject)
+            try:
+                save(instances)
+            finally:
+                end('persist', subject)
+        return persist
+        
+class NodeTimer(Hooks):
+    '''
+    Wall-clock time of the events, aggregated per event and subject (FlowNode, Message...) and per stack of events.
+    The self time of an event excludes the time of the events nested in it.
+    '''
+    def __init__(self, clock=time.time):
+        '''
+        clock:callable (default=time.time)
+            Returns the current time in seconds.
+            
+        times:dict
+            (event, subject) -> [calls, total time, self time].
+            
+        stacks:dict
+            Stack of frame names (tuple) -> self time.
+        '''
+        self.clock = clock
+        self.times = {}
+        self.stacks = {}
+        self._stack = []
+        self._frames = []
+        
+    def begin(self, event, subject):
+        self._frames.append(label(event, subject))
+        self._stack.append([self.clock(), 0.0])
+        
+    def end(self, event, subject):
+        started, nested = self._stack.pop()
+        elapsed = self.clock() - started
+        if self._stack:
+            self._stack[-1][1] += elapsed
+        key = (event, subject if event != 'persist' else None)
+        times = self.times.get(key)
+        if times is None:
+            times = self.times[key] = [0, 0.0, 0.0]
+        times[0] += 1
+        times[1] += elapsed
+        times[2] += elapsed - nested
+        stack = tuple(self._frames)
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + elapsed - nested
+        self._frames.pop()
+        
+    def nodes(self):
+        '''
+        Return the time table of the FlowNodes : (FlowNode, calls, total time, self time) list, by decreasing self time.
+        The time of a FlowNode is the time of its behaviours, the moves of its tokens included.
+        '''
+        rows = [(subject, calls, total, own) for (event, subject), (calls, total, own) in self.times.items()
+                if event == 'node']
+        rows.sort(key=lambda row: -row[3])
+        return rows
+        
+    def table(self):
+        '''
+        Return the time table of the events : (event, subject, calls, total time, self time) list, by decreasing self time.
+        '''
+        rows = [(event, subject, calls, total, own) for (event, subject), (calls, total, own) in self.times.items()]
+        rows.sort(key=lambda row: -row[4])
+        return rows
+        
+    def collapsed(self):
+        '''
+        Return the stacks in collapsed format, weighted by their self time in microseconds.
+        '''
+        return collapsed(dict((stack, int(own * 1e6)) for stack, own in self.stacks.items()))
+        
+    def reset(self):
+        self.times.clear()
+        self.stacks.clear()
+        
+class SamplingProfiler(Hooks):
+    '''
+    Wall-clock sampling profiler : a background thread samples the stack of events of the engine every interval.
+    Between the events (the engine being idle or out of the profiled points), nothing is sampled.
+    '''
+    def __init__(self, interval=0.001):
+        '''
+        interval:float (default=0.001)
+            Seconds between two samples.
+            
+        samples:dict
+            Stack of frame names (tuple) -> number of samples.
+        '''
+        self.interval = interval
+        self.samples = {}
+        self._frames = []
+        self._stop = Event()
+        self._thread = None
+        
+    def begin(self, event, subject):
+        self._frames.append(label(event, subject))
+        
+    def end(self, event, subject):
+        self._frames.pop()
+        
+    def sample(self):
+        stack = tuple(self._frames)
+        if stack:
+            self.samples[stack] = self.samples.get(stack, 0) + 1
+            
+    def start(self):
+        '''
+        Sample in a daemon thread.
+        '''
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name='SamplingProfiler')
+        self._thread.daemon = True
+        self._thread.start()
+        
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+            
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            
+    def collapsed(self):
+        '''
+        Return the sampled stacks in collapsed format, weighted by their number of samples.
+        '''
+        return collapsed(self.samples)
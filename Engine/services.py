@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Invocation of service Operations.
+
+An Invoker binds each Operation to a transport adapter and an EndPoint. Adapters implement
+call_many(endpoint, operation, payloads) and return one (ok, reply or exception) pair per payload :
+the engine hands them all the calls of the same Operation made by a run, so that they can be sent together.
+Replies become the variables of the outMessageRef of the Operation, and faults the ThrownErrors of its errorRef.
+
+Two adapters are provided : HTTPAdapter, keeping a pool of keep-alive connections per EndPoint, and StubAdapter,
+calling Python functions in process (for tests and co-hosted services).
+
+Each binding can be protected by a Guard : an adaptive (AIMD) limit of the calls sent at once, a bound on the calls
+waiting for it, and a circuit breaker failing fast while the service is down. Rejected calls are thrown as the
+Error of the Operation coded 'ServiceUnavailable' (or with that code if the Operation does not declare it),
+so that BPMN error boundaries handle them.
+'''
+
+import httplib
+import json
+import socket
+import time
+import urlparse
+from threading import Lock
+from multiprocessing.pool import ThreadPool
+from Queue import LifoQueue
+
+from Core.Common.ErrorModels import EngineError, ThrownError, ServiceFault
+
+def call(function, args):
+    '''
+    Return (True, function(*args)) or (False, exception).
+    '''
+    try:
+        return True, function(*args)
+    except Exception as error:
+        return False, error
+        
+def plain(value):
+    '''
+    JSON encoding of the values json does not know (typed arrays, Variables).
+    '''
+    if hasattr(value, 'items'):
+        return dict(value.items())
+    try:
+        return list(value)
+    except TypeError:
+        raise TypeError('%r is not JSON serializable'%value)
+        
+class StubAdapter(object):
+    '''
+    Adapter calling, in process, a Python function per Operation.
+    '''
+    def __init__(self, handlers=None):
+        '''
+        handlers:dict
+            Operation id or name -> function(payload) returning the reply; a function raising a ServiceFault answers with a fault.
+        '''
+        super(StubAdapter, self).__init__()
+        self.handlers = dict(handlers or {})
+        
+    def call_many(self, endpoint, operation, payloads):
+        handler = self.handlers.get(operation.id) or self.handlers.get(operation.name)
+        if handler is None:
+            raise EngineError('No stub for Operation %s'%operation.id)
+        return [call(handler, (payload,)) for payload in payloads]
+        
+class ConnectionPool(object):
+    '''
+    Keep-alive HTTP connections to one EndPoint.
+    '''
+    def __init__(self, url, size=4, timeout=10):
+        '''
+        url:str
+            Base URL of the EndPoint; the name of the Operation is appended to its path.
+            
+        size:int (default=4)
+            Maximum number of open connections.
+            
+        timeout:float (default=10)
+            Socket timeout in seconds.
+        '''
+        super(ConnectionPool, self).__init__()
+        parts = urlparse.urlsplit(url)
+        self.connection_class = httplib.HTTPSConnection if parts.scheme == 'https' else httplib.HTTPConnection
+        self.host = parts.netloc
+        self.path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.idle = LifoQueue(size)
+        for i in range(size):
+            self.idle.put(None)
+            
+    def request(self, method, path, body=None, headers=None):
+        '''
+        Send a request on an idle connection and return (status, body of the response).
+        A connection closed by the server while it was idle is opened again once.
+        '''
+        connection = self.idle.get()
+        try:
+            for attempt in (0, 1):
+                reused = connection is not None
+                if connection is None:
+                    connection = self.connection_class(self.host, timeout=self.timeout)
+                try:
+                    connection.request(method, self.path + path, body, headers or {})
+                    response = connection.getresponse()
+                    return response.status, response.read()
+                except (socket.error, httplib.HTTPException):
+                    connection.close()
+                    connection = None
+                    if not reused or attempt:
+                        raise
+        finally:
+            self.idle.put(connection)
+            
+    def close(self):
+        '''
+        Close the idle connections (the pool opens new ones on demand).
+        '''
+        connections = [self.idle.get() for i in range(self.idle.qsize())]
+        for connection in connections:
+            if connection is not None:
+                connection.close()
+            self.idle.put(None)
+            
+class HTTPAdapter(object):
+    '''
+    Adapter posting the payloads as JSON to the EndPoints of the Operations.
+    The calls of a batch are sent concurrently, each one on a pooled connection of its EndPoint.
+    The reply is the JSON body of a 2xx response; any other status is a fault whose code is the errorCode
+    of the body when it is a JSON object, or the status.
+    '''
+    def __init__(self, urls, size=4, timeout=10):
+        '''
+        urls:dict
+            EndPoint (or its id) -> base URL.
+            
+        size:int (default=4)
+            Connections per EndPoint, and calls of a batch sent at the same time.
+            
+        timeout:float (default=10)
+            Socket timeout in seconds.
+        '''
+        super(HTTPAdapter, self).__init__()
+        self.urls = dict((getattr(endpoint, 'id', endpoint), url) for endpoint, url in urls.items())
+        self.size = size
+        self.timeout = timeout
+        self.pools = {}
+        self._workers = None
+        
+    def pool(self, endpoint):
+        key = getattr(endpoint, 'id', endpoint)
+        pool = self.pools.get(key)
+        if pool is None:
+            if key not in self.urls:
+                raise EngineError('No URL for EndPoint %s'%key)
+            pool = self.pools[key] = ConnectionPool(self.urls[key], self.size, self.timeout)
+        return pool
+        
+    def call(self, pool, operation, payload):
+        body = json.dumps(payload, default=plain)
+        status, data = pool.request('POST', '/' + (operation.name or operation.id), body,
+                                    {'Content-Type': 'application/json', 'Accept': 'application/json'})
+        if 200 <= status < 300:
+            return json.loads(data) if data else None
+        try:
+            reply = json.loads(data) if data else None
+        except ValueError:
+            reply = None
+        if not isinstance(reply, dict):
+            raise ServiceFault(str(status), None)
+        raise ServiceFault(reply.get('errorCode') or str(status), reply)
+        
+    def call_many(self, endpoint, operation, payloads):
+        pool = self.pool(endpoint)
+        if len(payloads) == 1:
+            return [call(self.call, (pool, operation, payloads[0]))]
+        if self._workers is None:
+            self._workers = ThreadPool(self.size)
+        return self._workers.map(lambda payload: call(self.call, (pool, operation, payload)), payloads)
+        
+    def close(self):
+        if self._workers is not None:
+            self._workers.close()
+            self._workers.join()
+            self._workers = None
+        for pool in self.pools.values():
+            pool.close()
+            
+GuardState = ['closed', 'open', 'half-open']
+
+Unavailable = 'ServiceUnavailable'
+
+class Guard(object):
+    '''
+    Concurrency limit and circuit breaker of one Operation at one EndPoint.
+    
+    The limit of calls sent at once grows by one after each batch answered within target seconds
+    and is multiplied by decrease after a slower batch or a failure (AIMD). Calls exceeding backlog are rejected.
+    After threshold consecutive failures the circuit opens : every call is rejected during cooldown seconds,
+    then a single probe call is let through (half-open) and closes the circuit if it succeeds.
+    Faults declared by the errorRef of the Operation are answers of the service, not failures.
+    '''
+    def __init__(self, limit=10, minimum=1, maximum=200, target=1.0, decrease=0.5, backlog=1000, threshold=5, cooldown=30.0):
+        '''
+        limit:int (default=10)
+            Initial number of calls sent at once.
+            
+        minimum:int (default=1)
+        
+        maximum:int (default=200)
+            Bounds of the limit.
+            
+        target:float (default=1.0)
+            Seconds a batch should take.
+            
+        decrease:float (default=0.5)
+            Factor applied to the limit after a slow batch or a failure.
+            
+        backlog:int (default=1000)
+            Maximum number of calls accepted at once, the ones over it are rejected.
+            
+        threshold:int (default=5)
+            Consecutive failures opening the circuit.
+            
+        cooldown:float (default=30.0)
+            Seconds the circuit stays open.
+            
+        state:GuardState enum {'closed'|'open'|'half-open'}
+        
+        calls, failures, rejections:int
+            Counters of the admitted calls, of their failures, and of the rejected calls.
+            
+        latency:float
+            Total seconds spent in the batches (latency_max for the slowest one).
+        '''
+        super(Guard, self).__init__()
+        if not 1 <= minimum <= limit <= maximum:
+            raise EngineError('Limits of a Guard must verify 1 <= minimum <= limit <= maximum')
+        self.limit = limit
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target = target
+        self.decrease = decrease
+        self.backlog = backlog
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.opened = None
+        self.streak = 0
+        self.calls = 0
+        self.failures = 0
+        self.rejections = 0
+        self.batches = 0
+        self.latency = 0.0
+        self.latency_max = 0.0
+        self._lock = Lock()
+        
+    def admit(self, count):
+        '''
+        Return how many of count calls may be sent.
+        '''
+        with self._lock:
+            if self.state == 'open':
+                if time.time() - self.opened < self.cooldown:
+                    admitted = 0
+                else:
+                    self.state = 'half-open'
+                    admitted = 1
+            elif self.state == 'half-open':
+                admitted = 0
+            else:
+                admitted = min(count, self.backlog)
+            self.rejections += count - admitted
+            return min(admitted, count)
+            
+    def record(self, successes, failures, elapsed):
+        '''
+        Account for a batch of successes + failures calls answered in elapsed seconds.
+        '''
+        with self._lock:
+            self.calls += successes + failures
+            self.failures += failures
+            self.batches += 1
+            self.latency += elapsed
+            self.latency_max = max(self.latency_max, elapsed)
+            if failures:
+                self.streak = failures if successes else self.streak + failures
+                if self.state == 'half-open' or self.streak >= self.threshold:
+                    self.state = 'open'
+                    self.opened = time.time()
+            else:
+                self.streak = 0
+                self.state = 'closed'
+            if failures or elapsed > self.target:
+                self.limit = max(self.minimum, int(self.limit * self.decrease))
+            else:
+                self.limit = min(self.maximum, self.limit + 1)
+                
+    def reject(self, count):
+        with self._lock:
+            self.rejections += count
+            
+    def metrics(self):
+        return {'state': self.state,
+                'limit': self.limit,
+                'calls': self.calls,
+                'failures': self.failures,
+                'rejections': self.rejections,
+                'latency_mean': self.latency / self.batches if self.batches else 0.0,
+                'latency_max': self.latency_max}
+                
+class Invoker(object):
+    '''
+    Bindings of the Operations to their adapters.
+    '''
+    def __init__(self):
+        '''
+        bindings:dict
+            Operation id -> (adapter, EndPoint, Guard).
+        '''
+        super(Invoker, self).__init__()
+        self.bindings = {}
+        
+    def bind(self, operation, adapter, endpoint=None, guard=None):
+        '''
+        Invoke operation through adapter, at endpoint.
+        
+        guard:Guard|dict
+            The Guard of the binding, or the settings of a new one (None for an unguarded binding).
+        '''
+        if isinstance(guard, dict):
+            guard = Guard(**guard)
+        self.bindings[operation.id] = (adapter, endpoint, guard)
+        
+    def metrics(self):
+        '''
+        Return (Operation id, EndPoint id) -> metrics of the guarded bindings.
+        '''
+        return dict(((operation, getattr(endpoint, 'id', endpoint)), guard.metrics())
+                    for operation, (adapter, endpoint, guard) in self.bindings.items() if guard is not None)
+                    
+
+    def invoke(self, operation, payload):
+        '''
+        Invoke operation once and return the variables of its reply; raise a ThrownError on fault.
+        '''
+        ok, value = self.invoke_many(operation, [payload])[0]
+        if not ok:
+            raise value
+        return value
+        
+    def invoke_many(self, operation, payloads):
+        '''
+        Invoke operation once per payload and return, for each one, (True, variables of the reply) or (False, ThrownError).
+        '''
+        binding = self.bindings.get(operation.id)
+        if binding is None:
+            raise EngineError('Operation %s is not bound'%operation.id)
+        adapter, endpoint, guard = binding
+        if guard is None:
+            answers = adapter.call_many(endpoint, operation, payloads)
+        else:
+            answers = self._guarded(adapter, endpoint, guard, operation, payloads)
+        results = []
+        for ok, value in answers:
+            if ok:
+                results.append((True, self._output(operation, value)))
+            else:
+                results.append((False, self._error(operation, value)))
+        return results
+        
+    def _guarded(self, adapter, endpoint, guard, operation, payloads):
+        '''
+        Send the admitted calls by chunks of the current limit of guard; the others are answered with an
+        unavailability fault without being sent. An adapter raising for a whole chunk fails each of its calls.
+        '''
+        declared = set(error.errorCode for error in operation.errorRef)
+        admitted = guard.admit(len(payloads))
+        sent = admitted
+        answers = []
+        start = 0
+        while start < admitted:
+            chunk = payloads[start:min(admitted, start + guard.limit)]
+            begin = time.time()
+            try:
+                chunk_answers = adapter.call_many(endpoint, operation, chunk)
+            except Exception as error:
+                chunk_answers = [(False, error)] * len(chunk)
+            failures = sum(1 for ok, value in chunk_answers
+                           if not ok and getattr(value, 'code', None) not in declared)
+            guard.record(len(chunk) - failures, failures, time.time() - begin)
+            answers.extend(chunk_answers)
+            start += len(chunk)
+            if guard.state != 'closed':
+                admitted = start
+        if admitted < sent:
+            guard.reject(sent - admitted)
+        fault = ServiceFault(Unavailable, {'reason': 'circuit %s'%guard.state if guard.state != 'closed' else 'overloaded'})
+        answers.extend((False, fault) for payload in payloads[len(answers):])
+        return answers
+        
+    def _output(self, operation, reply):
+        '''
+        A reply which is not a mapping is the value of the variable named after the outMessageRef.
+        '''
+        if reply is None:
+            return {}
+        if hasattr(reply, 'items'):
+            return reply
+        message = operation.outMessageRef
+        return {getattr(message, 'name', None) or 'result': reply}
+        
+    def _error(self, operation, error):
+        '''
+        A fault is thrown as the Error of the Operation with the same errorCode, or with the fault code if the
+        Operation does not declare it; any other exception is a fault coded after its class.
+        '''
+        if not isinstance(error, ServiceFault):
+            error = ServiceFault(error.__class__.__name__, {'reason': str(error)})
+        for declared in operation.errorRef:
+            if declared.errorCode == error.code:
+                return ThrownError(declared, error.variables)
+        return ThrownError(error.code, error.variables)
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Discrete-event simulation of a Process (SIMU deployment status).
+
+The Simulation runs synthetic instances over the compiled graph of a Process in virtual time : no timer, no I/O,
+the clock jumps from an event to the next one, the events being kept in a heap.
+    - instances arrive with sampled inter-arrival times,
+    - the timed nodes (the Activities and catching Events) hold their tokens for a sampled duration,
+    - the Activities whose ResourceRoles refer to a Resource of limited capacity queue their tokens (first in first out)
+      until a unit of the Resource is free,
+    - a diverging Exclusive Gateway picks one outgoing flow by the branch probabilities, the conditional flows of
+      the other nodes are taken independently with their probability, Parallel Gateways split and join the tokens.
+The conditions and scripts of the Process are not evaluated : the probabilities stand for them.
+Sub-Processes and Call Activities are simulated as timed nodes.
+
+A duration (or inter-arrival time) is given as :
+    - a number : the mean of an exponential distribution,
+    - a tuple : ('constant', value), ('uniform', low, high), ('triangular', low, high, mode), ('normal', mean, deviation)
+      or ('lognormal', mu, sigma),
+    - a callable : function(random) returning the duration.
+'''
+
+import heapq
+import random as random_module
+from collections import deque
+
+from Core.Common.ErrorModels import EngineError
+from Engine.compiler import CompiledProcess, extension_value
+from Engine.forecasting import Instantaneous
+
+def sampler(spec):
+    '''
+    Return a function(random) sampling the durations described by spec.
+    '''
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, long, float)):
+        if spec <= 0:
+            return lambda random: 0.0
+        rate = 1.0 / spec
+        return lambda random: random.expovariate(rate)
+    law, parameters = spec[0], spec[1:]
+    if law == 'constant':
+        return lambda random: parameters[0]
+    if law == 'uniform':
+        return lambda random: random.uniform(*parameters)
+    if law == 'triangular':
+        return lambda random: random.triangular(*parameters)
+    if law == 'normal':
+        return lambda random: max(0.0, random.normalvariate(*parameters))
+    if law == 'lognormal':
+        return lambda random: random.lognormvariate(*parameters)
+    raise EngineError('Unknown distribution %s'%law)
+    
+class ResourcePool(object):
+    '''
+    Units of a Resource during a Simulation.
+    '''
+    __slots__ = ('id', 'capacity', 'free', 'queue', 'changed', 'queued_area', 'busy_area', 'longest', 'served', 'waited')
+    
+    def __init__(self, id, capacity):
+        self.id = id
+        self.capacity = capacity
+        self.free = capacity
+        self.queue = deque()
+        self.changed = 0.0
+        self.queued_area = 0.0
+        self.busy_area = 0.0
+        self.longest = 0
+        self.served = 0
+        self.waited = 0.0
+        
+    def advance(self, now):
+        elapsed = now - self.changed
+        self.queued_area += len(self.queue) * elapsed
+        self.busy_area += (self.capacity - self.free) * elapsed
+        self.changed = now
+        
+class SimulationReport(object):
+    '''
+    Results of a Simulation.
+    '''
+    def __init__(self, horizon, started, completed, cycle, nodes, resources, events):
+        '''
+        horizon:float
+            Simulated seconds.
+            
+        started:int
+        
+        completed:int
+            Instances started and completed.
+            
+        cycle:float
+            Mean duration of the completed instances in seconds (None when no instance completed).
+            
+        throughput:float
+            Completed instances per simulated second.
+            
+        nodes:dict
+            node id -> {'entered': tokens entered, 'completed': tokens completed}.
+            
+        resources:dict
+            Resource id -> {'capacity', 'utilization' (busy share of the units), 'queue' (mean queue length),
+            'longest' (longest queue), 'wait' (mean seconds waited for a unit)}.
+            
+        events:int
+            Number of events processed.
+        '''
+        self.horizon = horizon
+        self.started = started
+        self.completed = completed
+        self.cycle = cycle
+        self.throughput = completed / horizon if horizon else 0.0
+        self.nodes = nodes
+        self.resources = resources
+        self.events = events
+        
+class Simulation(object):
+    '''
+    Event-driven simulation of the instances of a Process.
+    '''
+    def __init__(self, process, arrivals, durations=None, probabilities=None, capacities=None, default=0.0, seed=None):
+        '''
+        process:Process
+            The simulated Process.
+            
+        arrivals:number|tuple|callable
+            Time between two instance arrivals (see sampler).
+            
+        durations:dict (default=None)
+            FlowNode id -> duration of the node (see sampler).
+            
+        probabilities:dict (default=None)
+            SequenceFlow id -> probability to be taken. By default, the outgoing flows of an Exclusive Gateway are equally
+            likely, and the other conditional flows are taken half of the time.
+            
+        capacities:dict (default=None)
+            Resource id -> number of units. By default, the extension attribute 'capacity' of the Resource,
+            and unlimited units without it.
+            
+        default:number|tuple|callable (default=0.0)
+            Duration of the timed nodes not in durations.
+            
+        seed:object (default=None)
+            Seed of the random generator, for reproducible runs.
+        '''
+        super(Simulation, self).__init__()
+        self.compiled = compiled = CompiledProcess(process)
+        self.random = random_module.Random(seed)
+        self.arrivals = sampler(arrivals)
+        durations = durations or {}
+        probabilities = probabilities or {}
+        capacities = capacities or {}
+        self.samplers = []
+        for node, kind in zip(compiled.nodes, compiled.kinds):
+            if node.id in durations:
+                self.samplers.append(sampler(durations[node.id]))
+            elif kind in Instantaneous:
+                self.samplers.append(None)
+            else:
+                self.samplers.append(sampler(default))
+        self.weights = []
+        for flow in compiled.flows:
+            self.weights.append(probabilities.get(flow.id))
+        self.pools = {}
+        self.node_pools = []
+        for node in compiled.nodes:
+            pool = None
+            for role in getattr(node, 'resources', []):
+                resource = role.resourceRef
+                if resource is None:
+                    continue
+                capacity = capacities.get(resource.id, extension_value(resource, 'capacity'))
+                if capacity is None:
+                    continue
+                if resource.id not in self.pools:
+                    self.pools[resource.id] = ResourcePool(resource.id, int(capacity))
+                pool = self.pools[resource.id]
+            self.node_pools.append(pool)
+            if pool is not None and self.samplers[len(self.node_pools) - 1] is None:
+                self.samplers[len(self.node_pools) - 1] = sampler(default)
+        self.merges = [len(flows) if kind == 'parallel' and len(flows) > 1 else 0
+                       for kind, flows in zip(compiled.kinds, compiled.incoming)]
+        
+    ##########################################################
+    # Routing
+    
+    def _next(self, node):
+        '''
+        Return the flows taken by a token leaving node.
+        '''
+        compiled = self.compiled
+        flows = compiled.outgoing[node]
+        kind = compiled.kinds[node]
+        if kind == 'parallel' or len(flows) < 2:
+            return flows
+        weights = self.weights
+        default = compiled.default_flow[node]
+        if kind == 'exclusive':
+            candidates = [flow for flow in flows if flow != default]
+            chosen = [weights[flow] if weights[flow] is not None else 1.0 / len(flows) for flow in candidates]
+            draw = self.random.random()
+            for flow, weight in zip(candidates, chosen):
+                draw -= weight
+                if draw < 0:
+                    return (flow,)
+            return (default if default is not None else candidates[-1],)
+        taken = []
+        for flow in flows:
+            if flow == default:
+                continue
+            if compiled.conditions[flow] is None and weights[flow] is None:
+                taken.append(flow)
+            elif self.random.random() < (0.5 if weights[flow] is None else weights[flow]):
+                taken.append(flow)
+        if not taken and default is not None:
+            taken.append(default)
+        return taken
+        
+    ##########################################################
+    # Run
+    
+    def run(self, horizon, limit=None):
+        '''
+        Simulate horizon seconds of arrivals and return the SimulationReport.
+        Instances still running at the horizon are not completed.
+        
+        limit:int (default=None)
+            Maximum number of instances started.
+        '''
+        compiled = self.compiled
+        kinds = compiled.kinds
+        flow_target = compiled.flow_target
+        samplers = self.samplers
+        node_pools = self.node_pools
+        merges = self.merges
+        random = self.random
+        heap = []
+        push = heapq.heappush
+        pop = heapq.heappop
+        sequence = [0]
+        entered = [0] * len(compiled.nodes)
+        completed = [0] * len(compiled.nodes)
+        joins = {}
+        cycles = [0, 0.0]
+        started = [0]
+        events = 0
+        
+        def schedule(time, instance, node):
+            sequence[0] += 1
+            push(heap, (time, sequence[0], instance, node))
+            
+        def enter(now, instance, nodes):
+            #instance : [start time, live tokens, ended]
+            while nodes:
+                node = nodes.pop()
+                entered[node] += 1
+                if merges[node]:
+                    key = (id(instance), node)
+                    arrived = joins.get(key, 0) + 1
+                    if arrived < merges[node]:
+                        joins[key] = arrived
+                        instance[1] -= 1
+                        continue
+                    del joins[key]
+                sample = samplers[node]
+                if sample is not None:
+                    pool = node_pools[node]
+                    if pool is not None:
+                        pool.advance(now)
+                        if not pool.free:
+                            pool.queue.append((now, instance, node))
+                            if len(pool.queue) > pool.longest:
+                                pool.longest = len(pool.queue)
+                            continue
+                        pool.free -= 1
+                        pool.served += 1
+                    schedule(now + sample(random), instance, node)
+                    continue
+                leave(now, instance, node, nodes)
+                
+        def leave(now, instance, node, nodes):
+            completed[node] += 1
+            if kinds[node] == 'terminate':
+                instance[1] = 0
+            else:
+                flows = self._next(node)
+                instance[1] += len(flows) - 1
+                for flow in flows:
+                    nodes.append(flow_target[flow])
+            if instance[1] == 0 and not instance[2]:
+                instance[2] = True
+                cycles[0] += 1
+                cycles[1] += now - instance[0]
+                
+        starts = compiled.start_nodes
+        if not starts:
+            raise EngineError('%s has no start node to simulate'%compiled.id)
+        schedule(self.arrivals(random), None, None)
+        while heap:
+            now, _, instance, node = pop(heap)
+            if now > horizon:
+                break
+            events += 1
+            if instance is None:
+                if limit is None or started[0] < limit:
+                    started[0] += 1
+                    enter(now, [now, len(starts), False], list(starts))
+                    schedule(now + self.arrivals(random), None, None)
+                continue
+            pool = node_pools[node]
+            if pool is not None:
+                pool.advance(now)
+                if pool.queue:
+                    since, waiting, waiting_node = pool.queue.popleft()
+                    pool.served += 1
+                    pool.waited += now - since
+                    schedule(now + samplers[waiting_node](random), waiting, waiting_node)
+                else:
+                    pool.free += 1
+            if instance[2]:
+                continue
+            nodes = []
+            leave(now, instance, node, nodes)
+            enter(now, instance, nodes)
+            
+        resources = {}
+        for pool in self.pools.values():
+            pool.advance(horizon)
+            resources[pool.id] = {'capacity': pool.capacity,
+                                  'utilization': pool.busy_area / (pool.capacity * horizon) if pool.capacity and horizon else 0.0,
+                                  'queue': pool.queued_area / horizon if horizon else 0.0,
+                                  'longest': pool.longest,
+                                  'wait': pool.waited / pool.served if pool.served else 0.0}
+        nodes = dict((node.id, {'entered': entered[index], 'completed': completed[index]})
+                     for index, node in enumerate(compiled.nodes))
+        return SimulationReport(horizon, started[0], cycles[0], cycles[1] / cycles[0] if cycles[0] else None,
+                                nodes, resources, events)
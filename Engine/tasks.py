@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Lifecycle of the human tasks (User Tasks and Manual Tasks).
+
+When a TaskList is attached to an engine, a HumanTask is opened for every token reaching a User or Manual Task.
+A task is Ready until a user claims it (Reserved), then completed by its owner, which resumes the instance ; its owner
+can release it (Ready again) or delegate it to another user. The tasks of an instance are Exited when it ends ;
+a task whose token is gone otherwise (cancelled by a boundary Event...) is Exited on its next use.
+The ids of the tasks are allocated by the task store, when their records are written.
+
+Every task carries a version, incremented by each change. An operation gives the version it was based on and is applied
+by a compare-and-set of the record in the task store : when two users act on the same task, the first one wins and
+the other one gets a TaskConflict, without any lock held between reading a worklist and acting on it.
+A completion resumes the very token of its task (see Engine.resume_many), and the task is Completed only if that token
+was still waiting ; when the resumption raises, the swapped records are restored.
+Bulk operations check and swap their whole batch in a single write of the task store, and persist the resumed instances
+in a single write of the instance store.
+'''
+
+from Core.Common.ErrorModels import TaskConflict
+from Engine.persistence import MemoryTaskStore
+
+TaskState = ['Ready', 'Reserved', 'Completed', 'Exited']
+
+class HumanTask(object):
+    '''
+    A User or Manual Task waiting for a human performer.
+    '''
+    __slots__ = ('id', 'instance', 'scope', 'node', 'state', 'owner', 'version')
+    
+    def __init__(self, id, instance, scope, node):
+        '''
+        id:int
+            Identifier of the task, allocated by the task store (None until the task is written).
+            
+        instance:ProcessInstance
+        
+        scope:ProcessInstance|Frame
+            The scope holding the token of the task.
+            
+        node:int
+            Index of the task node in the process of scope.
+            
+        state:TaskState enum {'Ready'|'Reserved'|'Completed'|'Exited'}
+        
+        owner:str
+            The user the task is reserved to (None when Ready).
+            
+        version:int
+            Incremented by each change of the task.
+        '''
+        self.id = id
+        self.instance = instance
+        self.scope = scope
+        self.node = node
+        self.state = 'Ready'
+        self.owner = None
+        self.version = 1
+        
+    @property
+    def name(self):
+        element = self.scope.process.nodes[self.node]
+        return element.name or element.id
+        
+    def record(self):
+        return (self.instance.id, self.scope.process.nodes[self.node].id, self.state, self.owner, self.version)
+        
+    def __repr__(self):
+        return '<HumanTask %s %s v%s (%s %s)>'%(self.id, self.name, self.version, self.state, self.owner or '')
+        
+class TaskList(object):
+    '''
+    Human tasks of the instances of an engine.
+    '''
+    def __init__(self, engine, store=None):
+        '''
+        engine:Engine
+            The engine whose User and Manual Tasks are managed : the TaskList attaches itself to it.
+            
+        store:MemoryTaskStore|SQLiteTaskStore (default=MemoryTaskStore())
+            Persistence of the task records.
+            
+        tasks:dict
+            task id -> HumanTask, the Completed and Exited ones being removed.
+            
+        instances:dict
+            instance id -> set of the open HumanTasks of the instance (written or not).
+        '''
+        super(TaskList, self).__init__()
+        self.engine = engine
+        self.store = store if store is not None else MemoryTaskStore()
+        self.tasks = {}
+        self.instances = {}
+        self._opened = []
+        engine.tasks = self
+        engine.ended.append(self._ended)
+        
+    def open(self, instance, scope, node):
+        '''
+        Open the task of the token of scope on node (called by the engine).
+        The records of the opened tasks are written in a batch before the next operation (see flush).
+        '''
+        task = HumanTask(None, instance, scope, node)
+        self.instances.setdefault(instance.id, set()).add(task)
+        self._opened.append(task)
+        return task
+        
+    def flush(self):
+        if self._opened:
+            opened, self._opened = self._opened, []
+            for task, id in zip(opened, self.store.insert_many([task.record() for task in opened])):
+                task.id = id
+                self.tasks[id] = task
+                
+    def _ended(self, instance):
+        '''
+        Exit the tasks of an ended instance : the ones not written yet are only dropped.
+        '''
+        tasks = self.instances.pop(instance.id, None)
+        if not tasks:
+            return
+        if any(task.id is None for task in tasks):
+            self._opened = [task for task in self._opened if task not in tasks]
+            for task in tasks:
+                if task.id is None:
+                    task.state = 'Exited'
+        self._exit_many([task for task in tasks if task.id is not None])
+            
+    ##########################################################
+    # Worklists
+    
+    def worklist(self, user=None, state=None):
+        '''
+        Return the tasks reserved to user (or all the tasks if None) in state (any state if None).
+        '''
+        self.flush()
+        return [task for task in self.tasks.values()
+                if (user is None or task.owner == user) and (state is None or task.state == state)]
+        
+    def ready(self):
+        return self.worklist(state='Ready')
+        
+    ##########################################################
+    # Operations
+    
+    def claim(self, task_id, user, version):
+        return self._one(task_id, version, self._claim, user)
+        
+    def release(self, task_id, user, version):
+        return self._one(task_id, version, self._release, user)
+        
+    def delegate(self, task_id, user, version, to):
+        return self._one(task_id, version, self._delegate, user, to)
+        
+    def complete(self, task_id, user, version, variables=None):
+        return self.complete_many(user, [(task_id, version, variables)], strict=True)[0]
+        
+    def claim_many(self, user, items):
+        '''
+        Claim a batch of (task id, version) for user. Return, for each item, the task or the TaskConflict refusing it.
+        '''
+        return self._many([(task_id, version, None) for task_id, version in items], self._claim, user)
+        
+    def complete_many(self, user, items, strict=False):
+        '''
+        Complete a batch of (task id, version, variables) reserved to user (Ready tasks are claimed on the way).
+        The task records are swapped in one write, then the tokens of the tasks are resumed and the instances persisted
+        in one write. A task whose token is gone in the meantime (cancelled by the completion of another task
+        of the batch) is Exited instead of Completed.
+        Return, for each item, the task or the TaskConflict refusing it (raised instead if strict).
+        '''
+        results = self._swap(self._check(items, self._complete, user))
+        won = [position for position, result in enumerate(results) if not isinstance(result, TaskConflict)]
+        if won:
+            #the won tasks are no longer open, whatever their resumption : the end of their instance must not exit them
+            tasks = [results[position][0] for position in won]
+            for task in tasks:
+                self._forget(task)
+            try:
+                resumed = self.engine.resume_many([(task.instance, task.scope, task.node, items[position][2])
+                                                   for task, position in zip(tasks, won)])
+            except Exception:
+                self._restore(tasks)
+                raise
+            exited = []
+            for position, done in zip(won, resumed):
+                task, state, owner = results[position]
+                if done:
+                    self._apply(task, state, owner)
+                    results[position] = task
+                else:
+                    task.version += 1
+                    exited.append(task)
+                    results[position] = TaskConflict('%r is no longer active'%task)
+            if exited:
+                self._exit_many(exited)
+        return self._results(results, strict)
+        
+    def _one(self, task_id, version, transition, *args):
+        return self._many([(task_id, version, None)], transition, *args, strict=True)[0]
+        
+    def _many(self, items, transition, *args, **kwargs):
+        '''
+        Check the transition of each item against the known state of its task, then compare-and-set the batch in the store.
+        '''
+        results = self._swap(self._check(items, transition, *args))
+        for position, result in enumerate(results):
+            if not isinstance(result, TaskConflict):
+                self._apply(*result)
+                results[position] = result[0]
+        return self._results(results, kwargs.get('strict'))
+        
+    def _check(self, items, transition, *args):
+        '''
+        Return, for each item, the (task, state, owner) the transition leads to, or the TaskConflict refusing it.
+        '''
+        self.flush()
+        results = []
+        for task_id, version, variables in items:
+            task = self.tasks.get(task_id)
+            try:
+                if task is None:
+                    raise TaskConflict('No open task %s'%task_id)
+                if task.version != version:
+                    raise TaskConflict('%r was changed since version %s'%(task, version))
+                if not self._alive(task):
+                    self._exit(task)
+                    raise TaskConflict('%r is no longer active'%task)
+                state, owner = transition(task, *args)
+            except TaskConflict as conflict:
+                results.append(conflict)
+                continue
+            results.append((task, state, owner))
+        return results
+        
+    def _swap(self, results):
+        '''
+        Compare-and-set the checked transitions in the store, in one write : a transition whose record was changed
+        by another engine is replaced by a TaskConflict.
+        '''
+        changes = [(result[0].id, result[0].version, result[1], result[2])
+                   for result in results if not isinstance(result, TaskConflict)]
+        applied = iter(self.store.swap_many(changes)) if changes else iter(())
+        for position, result in enumerate(results):
+            if not isinstance(result, TaskConflict) and not next(applied):
+                results[position] = TaskConflict('%r was changed by another engine'%result[0])
+        return results
+        
+    def _restore(self, tasks):
+        '''
+        Swap back the records of tasks to their known state, after a completion which could not resume them.
+        '''
+        applied = self.store.swap_many([(task.id, task.version + 1, task.state, task.owner) for task in tasks])
+        for task, swapped in zip(tasks, applied):
+            task.version += 2 if swapped else 1
+            self.tasks[task.id] = task
+            self.instances.setdefault(task.instance.id, set()).add(task)
+            
+    def _apply(self, task, state, owner):
+        task.state, task.owner, task.version = state, owner, task.version + 1
+        if state == 'Completed':
+            self._forget(task)
+            
+    def _forget(self, task):
+        self.tasks.pop(task.id, None)
+        tasks = self.instances.get(task.instance.id)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                del self.instances[task.instance.id]
+            
+    def _results(self, results, strict):
+        if strict:
+            for result in results:
+                if isinstance(result, TaskConflict):
+                    raise result
+        return results
+        
+    def _alive(self, task):
+        scope = task.scope
+        if task.instance.state != 'Active' or task.node not in scope.tokens:
+            return False
+        return scope is task.instance or scope in task.instance.frames
+        
+    def _exit(self, task):
+        self._exit_many([task])
+        
+    def _exit_many(self, tasks):
+        applied = self.store.swap_many([(task.id, task.version, 'Exited', task.owner) for task in tasks])
+        for task, swapped in zip(tasks, applied):
+            if swapped:
+                task.version += 1
+            task.state = 'Exited'
+            self._forget(task)
+        
+    ##########################################################
+    # Transitions : (task, arguments) -> (state, owner), or TaskConflict
+    
+    def _claim(self, task, user):
+        if task.state != 'Ready':
+            raise TaskConflict('%r cannot be claimed'%task)
+        return 'Reserved', user
+        
+    def _release(self, task, user):
+        if task.state != 'Reserved' or task.owner != user:
+            raise TaskConflict('%r is not reserved to %s'%(task, user))
+        return 'Ready', None
+        
+    def _delegate(self, task, user, to):
+        if task.state == 'Reserved' and task.owner != user:
+            raise TaskConflict('%r is not reserved to %s'%(task, user))
+        if task.state not in ('Ready', 'Reserved'):
+            raise TaskConflict('%r cannot be delegated'%task)
+        return 'Reserved', to
+        
+    def _complete(self, task, user):
+        if task.state == 'Reserved' and task.owner != user:
+            raise TaskConflict('%r is not reserved to %s'%(task, user))
+        if task.state not in ('Ready', 'Reserved'):
+            raise TaskConflict('%r cannot be completed'%task)
+        return 'Completed', user
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Record and replay of the instances.
+
+Given the same Processes, an instance only depends on the inputs it gets from outside : its initial variables,
+the completions of its waiting nodes (User Tasks, Receive Tasks, catch Events), the Messages delivered to it
+and the outcomes of its Service and Business Rule Tasks (replies, faults, cached results).
+A TraceRecorder attached to an engine (engine.recorder) appends these inputs to a compact binary log,
+together with the points where the engine invokes its queued service calls.
+A ReplayEngine feeds a trace back to the same Processes : the recorded outcomes stand in for the services and rules,
+so that the instances go again through the very same states, without any external system, and the replay can be
+stopped at any record to inspect them.
+
+The records are buffered and written by batches : each batch is a header (encoding, length) followed by the list of
+its records (kind, instance id, payload), marshalled, or pickled when a payload holds other objects than the builtin types.
+The variables of the payloads are copied (shallow copy) when recorded, as the caller may modify them before their batch
+is written ; the values they hold are still referenced and must not be modified in place.
+'''
+
+import marshal
+import struct
+from collections import deque
+from io import BytesIO
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from Core.Common.ErrorModels import EngineError, ThrownError, ThrownEscalation
+from Engine.compiler import message_key
+from Engine.engine import Engine
+
+START, COMPLETE, MESSAGE, OUTCOME, INVOKE = 1, 2, 3, 4, 5
+MARSHAL, PICKLE = 0, 1
+
+Header = struct.Struct('<BI')
+
+class TraceRecorder(object):
+    '''
+    Append-only log of the nondeterministic inputs of the instances of an engine.
+    '''
+    def __init__(self, path=None, engine=None, batch=1024):
+        '''
+        path:str
+            File the trace is written to (None to keep it in memory, see getvalue).
+            
+        engine:Engine
+            The engine to record : the recorder is attached as engine.recorder.
+            
+        batch:int (default=1024)
+            Number of records written together.
+        '''
+        self.path = path
+        self.file = open(path, 'wb') if path is not None else BytesIO()
+        self.batch = batch
+        self.records = 0
+        self._pending = []
+        if engine is not None:
+            engine.recorder = self
+            
+    def _write(self):
+        pending = self._pending
+        if not pending:
+            return
+        try:
+            encoding, data = MARSHAL, marshal.dumps(pending, 2)
+        except ValueError:
+            encoding, data = PICKLE, pickle.dumps(pending, pickle.HIGHEST_PROTOCOL)
+        self.file.write(Header.pack(encoding, len(data)))
+        self.file.write(data)
+        self.records += len(pending)
+        self._pending = []
+        
+    def started(self, instance, variables, message):
+        key = message_key(message) if message is not None else None
+        pending = self._pending
+        pending.append((START, instance.id, (instance.process.id, key, dict(variables) if variables else variables)))
+        if len(pending) >= self.batch:
+            self._write()
+        
+    def completed(self, instance, node_id, variables, position=None):
+        pending = self._pending
+        pending.append((COMPLETE, instance.id, (node_id, dict(variables) if variables else variables, position)))
+        if len(pending) >= self.batch:
+            self._write()
+        
+    def delivered(self, instance, key, variables):
+        pending = self._pending
+        pending.append((MESSAGE, instance.id, (key, dict(variables) if variables else variables)))
+        if len(pending) >= self.batch:
+            self._write()
+        
+    def outcome(self, instance, scope, node, ok, value, cached=False):
+        '''
+        Record the outcome of the Service or Business Rule Task node : (True, outputs) or (False, ThrownError|ThrownEscalation).
+        '''
+        if not ok:
+            value = (isinstance(value, ThrownError), value.code, value.variables)
+        elif isinstance(value, dict):
+            value = dict(value)
+        pending = self._pending
+        pending.append((OUTCOME, instance.id, (scope.process.nodes[node].id, cached, ok, value)))
+        if len(pending) >= self.batch:
+            self._write()
+        
+    def invoked(self):
+        pending = self._pending
+        pending.append((INVOKE, 0, None))
+        if len(pending) >= self.batch:
+            self._write()
+        
+    def getvalue(self):
+        '''
+        Return the trace recorded in memory.
+        '''
+        self._write()
+        return self.file.getvalue()
+        
+    def flush(self):
+        self._write()
+        self.file.flush()
+        
+    def close(self):
+        self._write()
+        if self.path is not None:
+            self.file.close()
+            
+def read_trace(source):
+    '''
+    Yield the records (kind, instance id, payload) of a trace.
+    
+    source:str|file
+        Path of the trace file, or a file-like object.
+    '''
+    file = open(source, 'rb') if isinstance(source, basestring) else source
+    try:
+        read = file.read
+        size = Header.size
+        while True:
+            header = read(size)
+            if len(header) < size:
+                return
+            encoding, length = Header.unpack(header)
+            data = read(length)
+            for record in (marshal.loads(data) if encoding == MARSHAL else pickle.loads(data)):
+                yield record
+    finally:
+        if file is not source:
+            file.close()
+            
+class ReplayEngine(Engine):
+    '''
+    Engine re-executing a trace : the Service and Business Rule Tasks take their recorded outcomes
+    instead of invoking the services and rules.
+    '''
+    def __init__(self, processes, store=None):
+        '''
+        processes:Process list
+            The Processes started in the trace (the Processes they call are found through their Call Activities).
+            
+        replayed:dict
+            Recorded instance id -> ProcessInstance replaying it.
+            
+        outcomes:dict
+            (recorded instance id, node id) -> deque of the recorded outcomes not consumed yet.
+        '''
+        super(ReplayEngine, self).__init__(store)
+        self.processes = dict((process.id, process) for process in processes)
+        self.replayed = {}
+        self.outcomes = {}
+        self._recorded = {}
+        self._invoking = False
+        
+    def preload(self, records):
+        '''
+        Keep the outcomes of the records : an outcome is recorded once the task has run, after the record which triggered it.
+        '''
+        outcomes = self.outcomes
+        for kind, instance_id, payload in records:
+            if kind == OUTCOME:
+                key = (instance_id, payload[0])
+                queue = outcomes.get(key)
+                if queue is None:
+                    queue = outcomes[key] = deque()
+                queue.append(payload[1:])
+                
+    def feed(self, record):
+        '''
+        Apply one record of a trace (the outcomes are preloaded).
+        '''
+        kind, instance_id, payload = record
+        if kind == INVOKE:
+            self._invoking = True
+            try:
+                self._invoke()
+            finally:
+                self._invoking = False
+        elif kind == START:
+            process_id, key, variables = payload
+            process = self.processes.get(process_id)
+            if process is None:
+                raise EngineError('Process %s of the trace is not replayed'%process_id)
+            def created(instances):
+                self.replayed[instance_id] = instances[0]
+                self._recorded[instances[0].id] = instance_id
+            self.start_many(process, [variables], key, created)
+        elif kind == COMPLETE:
+            self._resume(self.replayed[instance_id], *payload)
+        elif kind == MESSAGE:
+            self._deliver(self.replayed[instance_id], payload[0], payload[1])
+            
+    def _invoke(self):
+        '''
+        The queued calls are only invoked where the recorded engine invoked them.
+        '''
+        if self._invoking:
+            super(ReplayEngine, self)._invoke()
+            
+    def _outcome(self, instance, scope, node):
+        try:
+            cached, ok, value = self.outcomes[(self._recorded[instance.id], scope.process.nodes[node].id)].popleft()
+        except (KeyError, IndexError):
+            raise EngineError('No recorded outcome of %s in %s'%(scope.process.nodes[node].id, instance))
+        if not ok:
+            error, code, variables = value
+            value = ThrownError(code, variables) if error else ThrownEscalation(code, variables)
+        return cached, ok, value
+        
+    def _service(self, instance, scope, node):
+        queue = self.outcomes.get((self._recorded[instance.id], scope.process.nodes[node].id))
+        if queue and queue[0][0]:
+            cached, ok, result = queue.popleft()
+            self._namespace(scope, node).update(result)
+            self._leave(instance, scope, node)
+            return
+        self._calls.append((instance, scope, node, None))
+        
+    def _invoke_distinct(self, operation, items):
+        return [self._outcome(instance, scope, node)[1:] for instance, scope, node, key in items]
+        
+    def _rule(self, instance, scope, node):
+        cached, ok, result = self._outcome(instance, scope, node)
+        if not ok:
+            if not self._raised(instance, scope, node, result):
+                return
+            result = None
+        if result:
+            self._namespace(scope, node).update(result)
+        self._leave(instance, scope, node)
+        
+def replay(trace, processes, instance_id=None, until=None):
+    '''
+    Replay trace on a new ReplayEngine and return it.
+    
+    trace:str|file
+        Path of the trace file, or a file-like object.
+        
+    processes:Process list
+        The Processes started in the trace.
+        
+    instance_id:int
+        Recorded id of the only instance to replay (None for all of them) : the instances do not share state
+        but through their Messages, which are recorded as such.
+        
+    until:int
+        Number of records to apply (None for the whole trace), to inspect the instances at any point of their history.
+    '''
+    engine = ReplayEngine(processes)
+    records = list(read_trace(trace))
+    engine.preload(records)
+    for position, record in enumerate(records):
+        if until is not None and position >= until:
+            break
+        if instance_id is None or record[1] in (instance_id, 0):
+            engine.feed(record)
+    return engine
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - Engine
+
+Variables of process instances.
+
+The variables declared by a process (properties of the Process, of its Sub-Processes and of its Activities)
+are given a fixed slot by a VariableLayout when the process is compiled. Each instance only stores a list of values
+addressed by slot : the names, the types and the defaults are held once by the layout.
+Collections are allocated on first access only, in a typed array when the ItemDefinition allows it : only the
+collections of floats are, since an array of C longs would overflow on the Python longs a list accepts, and an array
+of chars would read booleans back as integers.
+Variables which are not declared (undeclared start values, script locals...) are kept in a separate dict.
+'''
+
+from array import array
+
+#structureRef -> array typecode of the collections of that structure (a list for the others)
+Typecodes = {float: 'd'}
+
+class Collection(object):
+    '''
+    Default value of a collection slot, shared by all the instances until the collection is first accessed.
+    '''
+    __slots__ = ('typecode',)
+    
+    def __init__(self, typecode=None):
+        '''
+        typecode:str
+            Typecode of the array storing the items, None to store them in a list.
+        '''
+        self.typecode = typecode
+        
+    def new(self):
+        if self.typecode is None:
+            return []
+        return array(self.typecode)
+        
+    def __repr__(self):
+        return '<Collection %s>'%(self.typecode or 'list')
+        
+class VariableLayout(object):
+    '''
+    Slots of the variables declared by a compiled process.
+    '''
+    def __init__(self):
+        '''
+        names:str list
+            Variable name of each slot.
+            
+        index:dict
+            Variable name -> slot.
+            
+        defaults:list
+            Initial value of each slot (a Collection for the collection slots).
+            
+        items:ItemDefinition list
+            ItemDefinition of each slot (None if not typed).
+        '''
+        super(VariableLayout, self).__init__()
+        self.names = []
+        self.index = {}
+        self.defaults = []
+        self.items = []
+        
+    def __len__(self):
+        return len(self.names)
+        
+    def add(self, name, itemDefinition=None):
+        '''
+        Return the slot of the variable name, declaring it if needed (the first declaration gives the type).
+        '''
+        slot = self.index.get(name)
+        if slot is not None:
+            return slot
+        slot = self.index[name] = len(self.names)
+        self.names.append(name)
+        self.items.append(itemDefinition)
+        self.defaults.append(self._default(itemDefinition))
+        return slot
+        
+    def _default(self, itemDefinition):
+        if itemDefinition is None:
+            return None
+        structure = itemDefinition.structureRef
+        if itemDefinition.isCollection:
+            return Collection(Typecodes.get(structure))
+        if callable(structure):
+            return structure()
+        return None
+        
+    def new(self, values=None):
+        '''
+        Return the Variables of a new instance, initialized with the defaults overridden by values.
+        '''
+        variables = Variables(self, self.defaults[:])
+        if values:
+            variables.update(values)
+        return variables
+        
+class Variables(object):
+    '''
+    Values of the variables of one scope, stored by slot.
+    Variables behaves as a mapping, so that expressions and scripts can use it as their namespace;
+    the engine uses get_slot and set_slot with slots resolved at compile time.
+    '''
+    __slots__ = ('layout', 'values', 'extra')
+    
+    def __init__(self, layout, values):
+        '''
+        layout:VariableLayout
+            The layout shared by all the instances of the process.
+            
+        values:list
+            Value of each slot of layout.
+            
+        extra:dict
+            Values of the variables not declared in layout (None while there is none).
+        '''
+        self.layout = layout
+        self.values = values
+        self.extra = None
+        
+    def get_slot(self, slot):
+        value = self.values[slot]
+        if value.__class__ is Collection:
+            value = self.values[slot] = value.new()
+        return value
+        
+    def set_slot(self, slot, value):
+        self.values[slot] = value
+        
+    def __getitem__(self, name):
+        slot = self.layout.index.get(name)
+        if slot is not None:
+            return self.get_slot(slot)
+        if self.extra is None:
+            raise KeyError(name)
+        return self.extra[name]
+        
+    def __setitem__(self, name, value):
+        slot = self.layout.index.get(name)
+        if slot is not None:
+            self.values[slot] = value
+        elif self.extra is None:
+            self.extra = {name: value}
+        else:
+            self.extra[name] = value
+            
+    def __delitem__(self, name):
+        slot = self.layout.index.get(name)
+        if slot is not None:
+            self.values[slot] = None
+        elif self.extra is None:
+            raise KeyError(name)
+        else:
+            del self.extra[name]
+            
+    def __contains__(self, name):
+        return name in self.layout.index or (self.extra is not None and name in self.extra)
+        
+    def __iter__(self):
+        return iter(self.keys())
+        
+    def __len__(self):
+        return len(self.values) + (len(self.extra) if self.extra else 0)
+        
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+            
+    def keys(self):
+        names = list(self.layout.names)
+        if self.extra:
+            names.extend(self.extra)
+        return names
+        
+    def items(self):
+        '''
+        Return the (name, value) pairs, allocating the collections never accessed.
+        '''
+        values = self.values
+        for slot, value in enumerate(values):
+            if value.__class__ is Collection:
+                values[slot] = value.new()
+        pairs = list(zip(self.layout.names, values))
+        if self.extra:
+            pairs.extend(self.extra.items())
+        return pairs
+        
+    def update(self, values):
+        for name, value in values.items():
+            self[name] = value
+            
+    def dump(self):
+        '''
+        Return the values as plain data : (values by slot, undeclared values).
+        '''
+        values = [None if value.__class__ is Collection else value for value in self.values]
+        return values, self.extra
+        
+    def __repr__(self):
+        return '<Variables %r>'%dict(self.items())
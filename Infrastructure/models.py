@@ -29,6 +29,7 @@ The BPMN Infrastructure package contains two elements that are used for both abs
 '''
 
 from Core.Foundation.models import BaseElement
+from Core.Foundation.extensions import ExtensionRegistry
 from Core.Common.fonctions import residual_args
 
 class Definitions(BaseElement):
@@ -64,8 +65,12 @@ class Definitions(BaseElement):
         imports:Import list
             This attribute is used to import externally defined elements and make them available for use by elements within this Definitions.
         
-        extentions:Extension list
+        extensions:Extension list
             This attribute identifies extensions beyond the attributes and model associations in the base BPMN specification.
+            Extensions which mustUnderstand MUST be understood by the engine (see Core.Foundation.extensions.understand).
+            
+        extensionRegistry:ExtensionRegistry
+            The extension attributes of the Definitions, compiled when they are loaded.
         
         relationships:Relationship list
             This attribute enables the extension and integration of BPMN models into larger system/development Processes.
@@ -81,16 +86,19 @@ class Definitions(BaseElement):
         self.name = name
         self.targetNamespace = targetNamespace
         
-        self.expressionLanguage = kwargs.pop(expressionLanguage,'http://www.w3/org/1999/XPath')
+        self.expressionLanguage = kwargs.pop('expressionLanguage','http://www.w3.org/1999/XPath')
         self.typeLanguage = kwargs.pop('typeLanguage','http://www.w3.org/2001/XMLSchema')
         self.rootElements = kwargs.pop('rootElements',[])
         self.diagrams = kwargs.pop('diagrams',[])
         self.imports = kwargs.pop('imports',[])
-        self.extentions = kwargs.pop('extentions',[])
+        self.extensions = kwargs.pop('extensions', kwargs.pop('extentions',[]))
+        self.extentions = self.extensions
         self.relationships = kwargs.pop('relationships',[])
         
         self.exporter = kwargs.pop('exporter',None)
         self.exporterVersion = kwargs.pop('exporterVersion',None)
+        
+        self.extensionRegistry = ExtensionRegistry(self.extensions, self.rootElements)
         if self.__class__.__name__ == 'Definitions':
             residual_args(self.__init__, **kwargs)
         
@@ -30,6 +30,7 @@ print 'importing Core'
 import Core.Foundation.models
 import Core.Common.models
 import Core.Common.fonctions
+import Core.Common.ErrorModels
 import Core.Service.models
 print 'OK\n'
 print 'importing Conversation'
@@ -49,4 +50,40 @@ import Infrastructure.models
 print 'OK\n'
 print 'importing HumanInteraction'
 import HumanInteraction.models
-print 'OK\n'
\ No newline at end of file
+print 'OK\n'
+print 'importing Data'
+import Data.models
+print 'OK\n'
+print 'importing Engine'
+import Engine.compiler
+import Engine.instances
+import Engine.persistence
+import Engine.compensation
+import Engine.variables
+import Engine.mapping
+import Engine.conversations
+import Engine.messaging
+import Engine.fanout
+import Engine.services
+import Engine.caching
+import Engine.decisions
+import Engine.categories
+import Engine.monitoring
+import Engine.forecasting
+import Engine.simulation
+import Engine.deployment
+import Engine.migration
+import Engine.tasks
+import Engine.forms
+import Engine.trace
+import Engine.profiling
+import Engine.auditing
+import Core.Foundation.extensions
+import Engine.engine
+print 'OK\n'
+
+print 'running tests'
+import unittest
+result = unittest.TextTestRunner().run(unittest.defaultTestLoader.discover('tests', top_level_dir='.'))
+if not result.wasSuccessful():
+    raise SystemExit(1)
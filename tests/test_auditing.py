@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Audit records and their sinks.
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from Process.models import Process
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, EndEvent, SequenceFlow, Auditing, Monitoring
+from Engine.engine import Engine
+from Engine.auditing import AuditLog, RotatingFileSink, SQLiteSink
+
+class FlakySink(object):
+    '''
+    Sink failing its first failures writes.
+    '''
+    def __init__(self, failures):
+        self.failures = failures
+        self.records = []
+        
+    def write(self, records):
+        if self.failures:
+            self.failures -= 1
+            raise IOError('sink down')
+        self.records.extend(records)
+        
+    def close(self):
+        pass
+        
+def audited():
+    s = StartEvent('s'); u = UserTask('u', monitoring=Monitoring('m', transitions=['completed'])); e = EndEvent('e')
+    return Process('p', auditing=Auditing('a'), flowElements=[s, u, e, SequenceFlow('f1', s, u), SequenceFlow('f2', u, e)])
+    
+class AuditLogTest(unittest.TestCase):
+    
+    def test_engine_emits_the_transitions(self):
+        audit, monitoring = SQLiteSink(), FlakySink(0)
+        engine = Engine()
+        log = AuditLog({'audit': audit, 'monitoring': monitoring}, engine)
+        instance = engine.start(audited())
+        engine.complete(instance, 'u')
+        log.stop()
+        rows = audit.connection.execute('SELECT element, transition FROM audit ORDER BY rowid').fetchall()
+        self.assertEqual(rows, [('p', 'started'), ('s', 'entered'), ('s', 'completed'), ('u', 'entered'),
+                                ('u', 'completed'), ('e', 'entered'), ('e', 'completed'), ('p', 'completed')])
+        self.assertEqual([record[4:] for record in monitoring.records], [('u', 'completed')])
+        self.assertEqual((log.written, log.dropped), (9, 0))
+        log.close()
+        
+    def test_failed_batch_is_retried(self):
+        sink = FlakySink(2)
+        log = AuditLog({'audit': sink}, retries=2)
+        for i in range(3):
+            log.emit('audit', i)
+        log.drain()
+        log.emit('audit', 3)
+        log.drain()
+        self.assertEqual((sink.records, log.failures), ([], {'audit': 2}))
+        log.drain()
+        self.assertEqual(sink.records, [0, 1, 2, 3])
+        self.assertEqual((log.written, log.dropped, log.failures), (4, 0, {}))
+        
+    def test_failing_sink_is_dropped_after_its_retries(self):
+        sink = FlakySink(3)
+        log = AuditLog({'audit': sink}, retries=2)
+        log.emit('audit', 0)
+        for i in range(3):
+            log.drain()
+        self.assertEqual((log.dropped, log.failures), (1, {}))
+        log.emit('audit', 1)
+        log.drain()
+        self.assertEqual(sink.records, [1])
+        
+    def test_retried_records_are_dropped_when_the_buffer_is_full(self):
+        log = AuditLog({'other': FlakySink(0)}, capacity=4)
+        class CrowdedSink(FlakySink):
+            def write(self, records):
+                #records emitted by the engine while the sink fails
+                log.emit('other', 'a')
+                log.emit('other', 'b')
+                FlakySink.write(self, records)
+        sink = log.sinks['audit'] = CrowdedSink(1)
+        for i in range(5):
+            log.emit('audit', i)
+        self.assertEqual(log.dropped, 1)
+        log.drain()
+        self.assertEqual(log.dropped, 3)
+        log.drain()
+        self.assertEqual(sink.records, [2, 3])
+        self.assertEqual(log.sinks['other'].records, ['a', 'b'])
+        
+    def test_unknown_sink_is_dropped(self):
+        log = AuditLog({})
+        log.emit('nowhere', 0)
+        self.assertEqual(log.drain(), 1)
+        self.assertEqual(log.dropped, 1)
+        
+class SinkTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        
+    def test_rotating_file(self):
+        path = os.path.join(self.directory, 'audit.log')
+        sink = RotatingFileSink(path, size=30, count=2)
+        for i in range(4):
+            sink.write([(i, 'auditing', 'p', 1, 'u', 'entered')])
+        sink.close()
+        self.assertEqual(sorted(os.listdir(self.directory)), ['audit.log', 'audit.log.1', 'audit.log.2'])
+        with open(path + '.1') as file:
+            self.assertEqual(file.read(), '[3,"auditing","p",1,"u","entered"]\n')
+            
+    def test_sqlite(self):
+        sink = SQLiteSink()
+        sink.write([(1.0, 'auditing', 'p', 1, 'u', 'entered'), (2.0, 'auditing', 'p', 1, 'u', 'completed')])
+        self.assertEqual(sink.connection.execute('SELECT transition FROM audit ORDER BY time').fetchall(),
+                         [('entered',), ('completed',)])
+        sink.close()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Result cache of the idempotent Service and Business Rule Tasks.
+'''
+
+import unittest
+import os
+import shutil
+import tempfile
+import time
+
+from Process.models import Process
+from Activities.models import ServiceTask
+from Core.Common.models import StartEvent, EndEvent, SequenceFlow, Message, ItemDefinition
+from Core.Foundation.models import ExtensionAttributeValue
+from Core.Service.models import Operation
+from Data.models import Property, DataInput, DataOutput, DataInputAssociation, DataOutputAssociation
+from Engine.engine import Engine
+from Engine.services import StubAdapter
+from Engine.caching import ResultCache, CacheExtension
+
+class ResultCacheTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'results')
+        
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        
+    def test_least_recently_used_results_are_evicted(self):
+        cache = ResultCache(size=2)
+        cache.put('a', 1); cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertEqual(list(cache.entries), ['a', 'c'])
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        
+    def test_key_digests_the_inputs(self):
+        cache = ResultCache()
+        self.assertEqual(cache.key('op', {'a': 1, 'b': 2}), cache.key('op', {'b': 2, 'a': 1}))
+        self.assertNotEqual(cache.key('op', {'a': 1}), cache.key('op', {'a': 2}))
+        self.assertIsNone(cache.key('op', {'f': lambda: None}))
+        
+    def test_key_is_canonical_and_restricted_to_the_inputs(self):
+        cache = ResultCache()
+        first = dict(('k%d'%i, i) for i in range(20))
+        second = dict(reversed(first.items()))
+        self.assertEqual(cache.key('op', {'a': first, 's': set('xyz')}), cache.key('op', {'a': second, 's': set('zyx')}))
+        self.assertEqual(cache.key('op', {'a': 1, 'b': 2}, ['a']), cache.key('op', {'a': 1, 'b': 3}, ['a']))
+        
+    def test_results_expire(self):
+        cache = ResultCache(ttl=0.05)
+        cache.put('a', 1); cache.put('b', 2, ttl=60)
+        time.sleep(0.06)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+        
+    def test_purge_removes_the_expired_keys(self):
+        cache = ResultCache(path=self.path)
+        cache.put('a', 1, ttl=0.05); cache.put('b', 2, ttl=0.05); cache.put('c', 3)
+        time.sleep(0.06)
+        self.assertEqual(cache.purge(), 2)
+        self.assertEqual(list(cache.entries), ['c'])
+        self.assertEqual(sorted(cache.shelf.keys()), ['c'])
+        cache.close()
+        
+    def test_shelve_keeps_the_results_across_restarts(self):
+        cache = ResultCache(path=self.path)
+        cache.put('a', {'x': 1})
+        cache.close()
+        cache = ResultCache(path=self.path)
+        self.assertEqual(cache.get('a'), {'x': 1})
+        cache.close()
+        
+class CachedTaskTest(unittest.TestCase):
+    
+    def test_hit_completes_the_task_without_calling_the_service(self):
+        operation = Operation('op', 'tariff', Message('q', 'q'))
+        cacheable = CacheExtension.extensionAttributeDefinitions[0]
+        zone = Property('pz', 'zone')
+        s = StartEvent('s'); e = EndEvent('e')
+        t = ServiceTask('t', operationRef=operation, extensionValues=[ExtensionAttributeValue(cacheable, value=True)],
+                        dataInputAssociations=[DataInputAssociation('a1', DataInput('ti', 'zone'), sourceRef=[zone])],
+                        dataOutputAssociations=[DataOutputAssociation('a2', Property('pt', 'tariff'),
+                                                                      sourceRef=[DataOutput('to', 'tariff')])])
+        process = Process('p', properties=[zone], flowElements=[s, t, e, SequenceFlow('f1', s, t), SequenceFlow('f2', t, e)])
+        calls = []
+        def tariff(payload):
+            calls.append(payload['zone'])
+            return {'tariff': payload['zone'] * 10}
+        engine = Engine()
+        engine.services.bind(operation, StubAdapter({'tariff': tariff}))
+        engine.cache = ResultCache()
+        instances = engine.start_many(process, [{'zone': i % 3} for i in range(9)])
+        self.assertEqual([instance.variables['tariff'] for instance in instances], [0, 10, 20] * 3)
+        self.assertEqual(sorted(calls), [0, 1, 2])
+        
+    def test_key_ignores_the_variables_which_are_not_inputs(self):
+        operation = Operation('op', 'tariff', Message('q', 'q', itemRef=ItemDefinition('iq', structureRef={'zone': int})))
+        cacheable = CacheExtension.extensionAttributeDefinitions[0]
+        s = StartEvent('s'); e = EndEvent('e')
+        t = ServiceTask('t', operationRef=operation, extensionValues=[ExtensionAttributeValue(cacheable, value=True)])
+        process = Process('p', flowElements=[s, t, e, SequenceFlow('f1', s, t), SequenceFlow('f2', t, e)])
+        calls = []
+        def tariff(payload):
+            calls.append(payload['zone'])
+            return {'tariff': payload['zone'] * 10}
+        engine = Engine()
+        engine.services.bind(operation, StubAdapter({'tariff': tariff}))
+        engine.cache = ResultCache()
+        engine.start_many(process, [{'zone': i % 2, 'request': i} for i in range(6)])
+        self.assertEqual(engine.compile(process).cache_inputs, {engine.compile(process).node_index['t']: ('zone',)})
+        self.assertEqual(sorted(calls), [0, 1])
+        
+    def test_task_without_declared_inputs_is_not_cached(self):
+        cacheable = CacheExtension.extensionAttributeDefinitions[0]
+        s = StartEvent('s'); e = EndEvent('e')
+        t = ServiceTask('t', operationRef=Operation('op', 'tariff', Message('q', 'q')),
+                        extensionValues=[ExtensionAttributeValue(cacheable, value=True)])
+        process = Process('p', flowElements=[s, t, e, SequenceFlow('f1', s, t), SequenceFlow('f2', t, e)])
+        self.assertEqual(Engine().compile(process).caches, {})
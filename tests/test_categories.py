@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Category index of the compiled processes and load per CategoryValue.
+'''
+
+import unittest
+
+from Process.models import Process
+from Activities.models import SubProcess
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, EndEvent, ParallelGateway, SequenceFlow, Category, CategoryValue
+from Core.Common.ErrorModels import EngineError
+from Engine.engine import Engine
+
+def categorized():
+    '''
+    Return a process with three User Tasks in parallel, one in a Sub-Process :
+    a is front and high priority, b is back, c (in the Sub-Process) is back and high priority.
+    '''
+    team = Category('c', 'team'); front = CategoryValue('v1', 'front', category=team); back = CategoryValue('v2', 'back', category=team)
+    priority = Category('p', 'prio'); high = CategoryValue('h', 'high', category=priority)
+    s = StartEvent('s'); g = ParallelGateway('g')
+    a = UserTask('a', categoryValueRef=[front, high]); b = UserTask('b', categoryValueRef=[back])
+    ss = StartEvent('ss'); c = UserTask('c', categoryValueRef=[back]); se = EndEvent('se')
+    sub = SubProcess('sub', flowElements=[ss, c, se, SequenceFlow('x1', ss, c), SequenceFlow('x2', c, se)])
+    high.categorizedFlowElements = [c]
+    return Process('p', flowElements=[s, g, a, b, sub, SequenceFlow('f0', s, g), SequenceFlow('f1', g, a),
+                                      SequenceFlow('f2', g, b), SequenceFlow('f3', g, sub)])
+                                      
+class CategoryTest(unittest.TestCase):
+    
+    def test_select_intersects_the_category_values(self):
+        index = Engine().categories(categorized())
+        self.assertEqual(sorted(index.masks), ['prio.high', 'team.back', 'team.front'])
+        self.assertEqual([node.id for node in index.select('team.back', 'prio.high')], ['c'])
+        self.assertEqual([node.id for node in index.select('team')], ['a', 'b', 'c'])
+        self.assertRaises(EngineError, index.select, 'team.ops')
+        
+    def test_load_follows_the_node_counters(self):
+        process = categorized()
+        engine = Engine()
+        instances = engine.start_many(process, [None] * 10)
+        self.assertEqual(engine.load(process), {'team.front': 10, 'team.back': 20, 'prio.high': 20})
+        for instance in instances[:4]:
+            engine.complete(instance, 'a')
+        self.assertEqual(engine.load(process, ['prio.high', 'team.front']), {'prio.high': 16, 'team.front': 6})
+        
+    def test_load_does_not_visit_the_instances(self):
+        process = categorized()
+        engine = Engine()
+        engine.start_many(process, [None] * 3)
+        engine.instances = None
+        self.assertEqual(engine.load(process, ['team.back']), {'team.back': 6})
+        
+    def test_aggregate(self):
+        index = Engine().categories(categorized())
+        stats = dict((position, 1.5) for position, node in enumerate(index.nodes) if node.id in ('a', 'c'))
+        self.assertEqual(index.aggregate(stats), {'team.front': 1.5, 'team.back': 1.5, 'prio.high': 3.0})
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Compensation handlers, replayed on the variables snapshotted when their Activity completed.
+'''
+
+import unittest
+
+from Process.models import Process
+from Activities.models import ScriptTask, CallActivity
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, EndEvent, IntermediateThrowEvent, BoundaryEvent, SequenceFlow, Association
+from Core.Common.models import CompensateEventDefinition
+from Engine.engine import Engine
+
+def compensable(name, script, handler):
+    task = ScriptTask(name, script=script)
+    boundary = BoundaryEvent('b_' + name, task, eventDefinitions=[CompensateEventDefinition('cd_' + name)])
+    undo = ScriptTask('undo_' + name, isForCompensation=True, script=handler)
+    return task, [task, boundary, undo], Association('a_' + name, boundary, undo)
+    
+def compensated(*tasks):
+    '''
+    Return a process running the (name, script, handler) tasks in sequence, then compensating them.
+    '''
+    s = StartEvent('s'); elements = [s]; artifacts = []; previous = s
+    for position, (name, script, handler) in enumerate(tasks):
+        task, nodes, association = compensable(name, script, handler)
+        elements.extend(nodes); elements.append(SequenceFlow('f%d'%position, previous, task))
+        artifacts.append(association); previous = task
+    throw = IntermediateThrowEvent('c', eventDefinitions=[CompensateEventDefinition('cc')]); w = UserTask('w')
+    elements += [throw, w, SequenceFlow('fc', previous, throw), SequenceFlow('fw', throw, w)]
+    return Process('p', flowElements=elements, artifacts=artifacts)
+    
+class CompensationTest(unittest.TestCase):
+    
+    def test_handlers_replay_most_recent_first(self):
+        process = compensated(('t1', 'x = 1', 'undone = undone + [1]'), ('t2', 'x = 2', 'undone = [2]'))
+        instance = Engine().start(process)
+        self.assertEqual(instance.variables['undone'], [2, 1])
+        self.assertEqual(instance.frames, [])
+        
+    def test_handler_reads_the_snapshot(self):
+        process = compensated(('t1', 'x = 1', 'seen = x'), ('t2', 'x = 2', 'pass'))
+        instance = Engine().start(process)
+        self.assertEqual(instance.variables['seen'], 1)
+        
+    def test_handler_writes_the_live_variables(self):
+        process = compensated(('t1', 'x = 1', 'x = -1\nafter = x'))
+        instance = Engine().start(process)
+        self.assertEqual(instance.variables['x'], -1)
+        self.assertEqual(instance.variables['after'], -1)
+        
+    def test_write_of_a_handler_is_seen_by_the_next_ones(self):
+        process = compensated(('t1', 'x = 1', 'seen = total'), ('t2', 'x = 2', 'total = -x'))
+        instance = Engine().start(process)
+        self.assertEqual(instance.variables['total'], -2)
+        self.assertEqual(instance.variables['seen'], -2)
+        
+    def test_value_modified_in_place_is_snapshotted(self):
+        process = compensated(('t1', 'items = [1]', 'seen = list(items)'), ('t2', 'items.append(2)', 'pass'))
+        instance = Engine().start(process)
+        self.assertEqual(instance.variables['seen'], [1])
+        self.assertEqual(instance.variables['items'], [1, 2])
+        
+    def test_tracker_is_released_with_its_frame(self):
+        task, nodes, association = compensable('t', 'y = 1', 'y = 0')
+        s = StartEvent('cs'); e = EndEvent('ce')
+        child = Process('child', flowElements=nodes + [s, e, SequenceFlow('c1', s, task), SequenceFlow('c2', task, e)],
+                        artifacts=[association])
+        s = StartEvent('s'); call = CallActivity('call', calledElementRef=child); w = UserTask('w')
+        process = Process('p', flowElements=[s, call, w, SequenceFlow('f1', s, call), SequenceFlow('f2', call, w)])
+        instance = Engine().start(process)
+        self.assertEqual(len(instance.compensations), 1)
+        self.assertEqual(instance.compensations.trackers, {})
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Correlation of the Messages of Conversations to ConversationInstances.
+'''
+
+import unittest
+
+from Process.models import Process
+from Activities.models import SendTask, ReceiveTask
+from Collaboration.models import Collaboration, Participant, MessageFlow
+from Conversation.models import Conversation
+from Core.Common.models import StartEvent, EndEvent, SequenceFlow, Message, MessageEventDefinition, FormalExpression
+from Core.Common.models import CorrelationKey, CorrelationProperty, CorrelationPropertyRetrievalExpression
+from Data.models import Property, DataInput, DataInputAssociation
+from Engine.engine import Engine
+from Engine.messaging import MessageBus
+
+def order_conversation():
+    '''
+    Return (collaboration, buyer) : each buyer orders from a new seller, which waits for an update from an external
+    Participant (correlated by the order id) before acknowledging the order to its buyer.
+    '''
+    order = Message('order', 'Order'); ack = Message('ack', 'Ack'); update = Message('upd', 'Update')
+    bs = StartEvent('bs'); be = EndEvent('be')
+    send = SendTask('send', None, messageRef=order,
+                    dataInputAssociations=[DataInputAssociation('a1', DataInput('oi', 'oid'), sourceRef=[Property('pq', 'oid')])])
+    receive = ReceiveTask('recv', None, messageRef=ack)
+    buyer = Process('buyer', properties=[Property('pq', 'oid')],
+                    flowElements=[bs, send, receive, be, SequenceFlow('b1', bs, send), SequenceFlow('b2', send, receive),
+                                  SequenceFlow('b3', receive, be)])
+    ss = StartEvent('ss', eventDefinitions=[MessageEventDefinition('md', messageRef=order)])
+    wait = ReceiveTask('w', None, messageRef=update)
+    se = EndEvent('se', eventDefinitions=[MessageEventDefinition('md2', messageRef=ack)])
+    seller = Process('seller', properties=[Property('sq', 'oid')],
+                     flowElements=[ss, wait, se, SequenceFlow('s1', ss, wait), SequenceFlow('s2', wait, se)])
+    pb = Participant('pb', processRef=buyer); ps = Participant('ps', processRef=seller); px = Participant('px')
+    m1 = MessageFlow('m1', 'order', send, ps, messageRef=order)
+    m2 = MessageFlow('m2', 'ack', se, receive, messageRef=ack)
+    m3 = MessageFlow('m3', 'upd', px, wait, messageRef=update)
+    oid = CorrelationProperty('cp', [CorrelationPropertyRetrievalExpression('r1', FormalExpression('e1', 'oid', None), order),
+                                     CorrelationPropertyRetrievalExpression('r2', FormalExpression('e2', 'ref', None), update)],
+                              name='oid')
+    conversation = Conversation('cv', [pb, ps, px], messageFlowRefs=[m1, m2, m3],
+                                correlationKeys=[CorrelationKey('ck', correlationPropertyRef=[oid])])
+    collaboration = Collaboration('c', 'c', participants=[pb, ps, px], messageFlow=[m1, m2, m3], conversations=[conversation])
+    return collaboration, buyer
+    
+class ConversationTest(unittest.TestCase):
+    
+    def setUp(self):
+        collaboration, buyer = order_conversation()
+        self.engine = Engine()
+        self.bus = MessageBus(self.engine, [collaboration], batch=8)
+        self.buyers = self.engine.start_many(buyer, [{'oid': i} for i in range(10)])
+        self.bus.dispatch()
+        self.conversations = self.bus.conversations
+        
+    def test_starting_messages_open_a_conversation_each(self):
+        self.assertEqual(len(self.conversations.active), 10)
+        for conversation in self.conversations.active.values():
+            self.assertEqual(sorted(conversation.instances), ['pb', 'ps'])
+            
+    def test_messages_are_correlated_by_key_then_by_instance(self):
+        for i in range(10):
+            self.bus.send('px', 'upd', {'ref': i})
+        self.bus.dispatch()
+        self.assertEqual(self.bus.take_undelivered(), [])
+        self.assertEqual(set(buyer.state for buyer in self.buyers), set(['Completed']))
+        #the keys of the orders and of the updates only : the acks are correlated by their sender
+        self.assertEqual(self.conversations.extractions, 20)
+        
+    def test_conversation_is_closed_when_its_last_instance_ends(self):
+        self.bus.send('px', 'upd', {'ref': 3})
+        self.bus.dispatch()
+        self.assertEqual(len(self.conversations.active), 9)
+        self.assertEqual(len(self.conversations.by_key), 9)
+        self.assertEqual(len(self.conversations.by_instance), 18)
+        self.assertEqual(len(self.conversations.joined), 18)
+        for i in range(10):
+            if i != 3:
+                self.bus.send('px', 'upd', {'ref': i})
+        self.bus.dispatch()
+        self.assertEqual(self.conversations.active, {})
+        self.assertEqual(self.conversations.by_key, {})
+        self.assertEqual(self.conversations.by_instance, {})
+        self.assertEqual(self.conversations.joined, {})
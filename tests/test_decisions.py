@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Decision tables of Business Rule Tasks.
+'''
+
+import unittest
+
+from Process.models import Process
+from Activities.models import BusinessRuleTask
+from Core.Common.models import StartEvent, EndEvent, SequenceFlow, FormalExpression
+from Core.Common.ErrorModels import EngineError
+from Engine.engine import Engine
+from Engine.decisions import DecisionTable, Interval
+
+def pricing():
+    return DecisionTable(['zone', 'weight'], ['price'],
+                         [(['eu', Interval(0, 10)], [5]),
+                          (['eu', Interval(10, None)], [8]),
+                          ([set(['us', 'ca']), None], [12]),
+                          ([None, None], [20])])
+                          
+class DecisionTableTest(unittest.TestCase):
+    
+    def test_first_matching_rule(self):
+        table = pricing()
+        self.assertEqual(table({'zone': 'eu', 'weight': 3}), {'price': 5})
+        self.assertEqual(table({'zone': 'eu', 'weight': 10}), {'price': 8})
+        self.assertEqual(table({'zone': 'ca', 'weight': 3}), {'price': 12})
+        self.assertEqual(table({'zone': 'jp', 'weight': 3}), {'price': 20})
+        
+    def test_interval_bounds(self):
+        table = DecisionTable(['x'], ['y'], [([Interval(0, 10, True, True)], [1]), ([Interval(5, None, False)], [2])], 'COLLECT')
+        self.assertEqual(table({'x': 10}), {'y': [1, 2]})
+        self.assertEqual(table({'x': 5}), {'y': [1]})
+        self.assertIsNone(table({'x': -1}))
+        
+    def test_hit_policies(self):
+        rules = [([Interval(0, 10)], [1]), ([Interval(5, 20)], [2])]
+        self.assertRaises(EngineError, DecisionTable(['x'], ['y'], rules, 'UNIQUE'), {'x': 6})
+        self.assertRaises(EngineError, DecisionTable(['x'], ['y'], rules, 'ANY'), {'x': 6})
+        self.assertEqual(DecisionTable(['x'], ['y'], rules, 'UNIQUE')({'x': 2}), {'y': 1})
+        self.assertRaises(EngineError, DecisionTable, ['x'], ['y'], rules, 'LAST')
+        self.assertRaises(EngineError, DecisionTable, ['x'], ['y'], [([None, None], [1])])
+        
+    def test_expression_inputs(self):
+        table = DecisionTable([FormalExpression('e', 'weight * 2', None)], ['heavy'], [([Interval(10, None)], [True])])
+        self.assertEqual(table({'weight': 6}), {'heavy': True})
+        
+    def test_evaluate_many_matches_evaluate(self):
+        table = pricing()
+        inputs = [{'zone': zone, 'weight': weight} for zone in ('eu', 'us', 'jp', None) for weight in (0, 9.5, 10, 40)]
+        self.assertEqual(table.evaluate_many(inputs), [table.evaluate(variables) for variables in inputs])
+        
+    def test_business_rule_task(self):
+        engine = Engine()
+        engine.rules['pricing'] = pricing()
+        s = StartEvent('s'); r = BusinessRuleTask('r', implementation='pricing'); e = EndEvent('e')
+        process = Process('p', flowElements=[s, r, e, SequenceFlow('f1', s, r), SequenceFlow('f2', r, e)])
+        instances = engine.start_many(process, [{'zone': 'eu', 'weight': 12}, {'zone': 'us', 'weight': 1}])
+        self.assertEqual([instance.variables['price'] for instance in instances], [8, 12])
+        self.assertTrue(all(instance.state == 'Completed' for instance in instances))
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Deployment versions : background compilation, activation and draining.
+'''
+
+import unittest
+
+from Process.models import Process
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, EndEvent, SequenceFlow
+from Core.Common.ErrorModels import EngineError
+from Infrastructure.models import Definitions
+from Engine.engine import Engine
+from Engine.deployment import DeploymentManager
+from Engine.migration import MigrationPlan
+
+def version(task):
+    s = StartEvent('s'); a = UserTask(task); e = EndEvent('e')
+    process = Process('p', flowElements=[s, a, e, SequenceFlow('f0', s, a), SequenceFlow('f1', a, e)])
+    return Definitions('app', 'App', 'ns', rootElements=[process])
+    
+class DeploymentTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.engine = Engine()
+        self.manager = DeploymentManager(self.engine)
+        
+    def tearDown(self):
+        self.manager.close()
+        
+    def test_new_version_is_used_by_the_next_starts(self):
+        first = self.manager.deploy(version('a'), status='PROD', wait=True)
+        old = self.manager.start('app', 'p')
+        second = self.manager.deploy(version('b'), status='PROD', wait=True)
+        new = self.manager.start('app', 'p')
+        self.assertEqual((first.state, second.state), ('Draining', 'Active'))
+        self.assertEqual([old.process.nodes[node].id for node in old.tokens], ['a'])
+        self.assertEqual([new.process.nodes[node].id for node in new.tokens], ['b'])
+        self.assertEqual((first.live, second.live), (1, 1))
+        
+    def test_empty_batch_starts_nothing(self):
+        deployment = self.manager.deploy(version('a'), status='PROD', wait=True)
+        self.assertEqual(self.manager.start_many('app', 'p', []), [])
+        self.assertEqual(deployment.live, 0)
+        
+    def test_draining_version_is_unloaded_when_its_last_instance_ends(self):
+        first = self.manager.deploy(version('a'), status='PROD', wait=True)
+        instances = self.manager.start_many('app', 'p', [None, None])
+        self.manager.deploy(version('b'), status='PROD', wait=True)
+        self.engine.complete(instances[0], 'a')
+        self.assertEqual((first.state, first.live), ('Draining', 1))
+        self.engine.complete(instances[1], 'a')
+        self.assertEqual((first.state, first.live), ('Unloaded', 0))
+        self.assertNotIn(first.processes['p'], self.engine.compiled)
+        
+    def test_version_without_instances_is_unloaded_at_once(self):
+        first = self.manager.deploy(version('a'), wait=True)
+        self.manager.deploy(version('b'), wait=True)
+        self.assertEqual(first.state, 'Unloaded')
+        
+    def test_migrated_instances_move_to_the_target_version(self):
+        first = self.manager.deploy(version('a'), wait=True)
+        instances = self.manager.start_many('app', 'p', [None] * 3)
+        second = self.manager.deploy(version('a'), wait=True)
+        MigrationPlan(self.engine, instances[0].process, second.compiled[second.processes['p']]).migrate()
+        self.assertEqual((first.state, first.live, second.live), ('Unloaded', 0, 3))
+        
+    def test_workers_do_not_change_the_engine(self):
+        deployment = self.manager.deploy(version('a'))
+        deployment.ready.wait()
+        self.assertEqual(self.engine.compiled, {})
+        self.assertEqual(deployment.state, 'Compiling')
+        self.manager.publish()
+        self.assertEqual(deployment.state, 'Active')
+        self.assertIs(self.engine.compiled[deployment.processes['p']], deployment.compiled[deployment.processes['p']])
+        
+    def test_failed_version_keeps_the_active_one(self):
+        active = self.manager.deploy(version('a'), wait=True)
+        broken = Process('q', flowElements=[SequenceFlow('x', StartEvent('s'), EndEvent('e'))])
+        failed = self.manager.deploy(Definitions('app', 'App', 'ns', rootElements=[broken]))
+        self.assertRaises(Exception, self.manager.wait, failed)
+        self.assertEqual(failed.state, 'Failed')
+        self.assertIs(self.manager.active['app'], active)
+        
+    def test_stopped_version_cannot_be_started(self):
+        self.manager.deploy(version('a'), wait=True)
+        self.manager.status('app', 'STOPPED')
+        self.assertRaises(EngineError, self.manager.start, 'app', 'p')
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Instantiation of processes (Engine.start and Engine.start_many).
+'''
+
+import unittest
+
+from Process.models import Process
+from Activities.models import Task
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, EndEvent, SequenceFlow, ItemDefinition
+from Data.models import Property
+from Engine.engine import Engine
+from Engine.persistence import MemoryStore, SQLiteStore
+
+class CountingStore(MemoryStore):
+    def __init__(self):
+        super(CountingStore, self).__init__()
+        self.writes = 0
+        
+    def save(self, instance):
+        self.writes += 1
+        super(CountingStore, self).save(instance)
+        
+    def save_many(self, instances):
+        self.writes += 1
+        super(CountingStore, self).save_many(instances)
+        
+def waiting_process():
+    s = StartEvent('s'); u = UserTask('u'); e = EndEvent('e')
+    return Process('p', flowElements=[s, u, e, SequenceFlow('f1', s, u), SequenceFlow('f2', u, e)],
+                   properties=[Property('p1', 'count', itemSubjectRef=ItemDefinition('i1', structureRef=int)),
+                               Property('p2', 'items', itemSubjectRef=ItemDefinition('i2', isCollection=True))])
+    
+class StartTest(unittest.TestCase):
+    
+    def test_start_many_initializes_each_instance(self):
+        engine = Engine(CountingStore())
+        instances = engine.start_many(waiting_process(), [{'count': 3}, None, {'count': 5}])
+        self.assertEqual([instance.variables['count'] for instance in instances], [3, 0, 5])
+        self.assertEqual(len(set(instance.id for instance in instances)), 3)
+        self.assertTrue(all(instance.state == 'Active' for instance in instances))
+        instances[0].variables['items'].append(1)
+        self.assertEqual(instances[1].variables['items'], [])
+        
+    def test_start_many_writes_the_batch_once(self):
+        engine = Engine(CountingStore())
+        engine.start_many(waiting_process(), ({'count': i} for i in range(100)))
+        self.assertEqual(engine.store.writes, 1)
+        
+    def test_created_is_called_before_the_instances_run(self):
+        s = StartEvent('s'); e = EndEvent('e')
+        process = Process('p', flowElements=[s, e, SequenceFlow('f', s, e)])
+        states = []
+        Engine().start_many(process, [None, None], created=lambda instances: states.extend(i.state for i in instances))
+        self.assertEqual(states, ['Active', 'Active'])
+        
+    def test_ended_instances_are_dropped(self):
+        engine = Engine(SQLiteStore())
+        ended = []
+        engine.ended.append(ended.append)
+        instances = engine.start_many(waiting_process(), [None, None])
+        self.assertEqual(sorted(engine.instances), sorted(instance.id for instance in instances))
+        engine.complete(instances[0], 'u')
+        self.assertEqual(instances[0].state, 'Completed')
+        self.assertEqual(list(engine.instances), [instances[1].id])
+        self.assertEqual(ended, [instances[0]])
+        self.assertEqual(engine.store.load(instances[0].id)[2], 'Completed')
+        
+    def test_instances_ending_at_start_are_not_kept(self):
+        s = StartEvent('s'); t = Task('t'); e = EndEvent('e')
+        process = Process('p', flowElements=[s, t, e, SequenceFlow('f1', s, t), SequenceFlow('f2', t, e)])
+        engine = Engine()
+        instance = engine.start(process)
+        self.assertEqual(instance.state, 'Completed')
+        self.assertEqual(engine.instances, {})
+        self.assertIs(engine.store.load(instance.id), instance)
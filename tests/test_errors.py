@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Propagation of Errors and Escalations to boundary Events and Event Sub-Processes.
+'''
+
+import unittest
+
+from Process.models import Process
+from Activities.models import ScriptTask, CallActivity, SubProcess
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, EndEvent, IntermediateThrowEvent, BoundaryEvent, SequenceFlow
+from Core.Common.models import Error, Escalation, ErrorEventDefinition, EscalationEventDefinition
+from Engine.engine import Engine
+
+Raising = 'from Core.Common.ErrorModels import ThrownError\nraise ThrownError("BAD", {"why": 1})'
+
+def failing_child():
+    s = StartEvent('cs'); t = ScriptTask('ct', script=Raising); e = EndEvent('ce')
+    return Process('child', flowElements=[s, t, e, SequenceFlow('cf1', s, t), SequenceFlow('cf2', t, e)])
+    
+def names(scope):
+    return [scope.process.nodes[node].id for node in scope.tokens]
+    
+class ErrorTest(unittest.TestCase):
+    
+    def test_error_of_a_called_process_is_caught_by_a_boundary_event(self):
+        error = Error('e1', 'Bad', 'BAD')
+        ss = StartEvent('ss'); call = CallActivity('call', calledElementRef=failing_child()); se = EndEvent('se')
+        sub = SubProcess('sub', flowElements=[ss, call, se, SequenceFlow('sf1', ss, call), SequenceFlow('sf2', call, se)])
+        s = StartEvent('s'); e = EndEvent('e'); h = UserTask('handled'); he = EndEvent('he')
+        b = BoundaryEvent('b', sub, eventDefinitions=[ErrorEventDefinition('ed', errorRef=error)])
+        process = Process('p', flowElements=[s, sub, e, b, h, he, SequenceFlow('f1', s, sub), SequenceFlow('f2', sub, e),
+                                             SequenceFlow('f3', b, h), SequenceFlow('f4', h, he)])
+        instance = Engine().start(process)
+        self.assertEqual(instance.state, 'Active')
+        self.assertEqual(names(instance), ['handled'])
+        self.assertEqual(instance.frames, [])
+        self.assertEqual(instance.variables['why'], 1)
+        
+    def test_unhandled_error_fails_the_instance(self):
+        s = StartEvent('s'); call = CallActivity('c', calledElementRef=failing_child())
+        process = Process('p', flowElements=[s, call, SequenceFlow('f', s, call)])
+        instance = Engine().start(process)
+        self.assertEqual(instance.state, 'Failed')
+        self.assertEqual(instance.fault, 'BAD')
+        self.assertEqual(instance.frames, [])
+        
+    def test_non_interrupting_escalation_starts_an_event_subprocess(self):
+        escalation = Escalation('x1', 'Late', 'LATE')
+        throw = IntermediateThrowEvent('t1', eventDefinitions=[EscalationEventDefinition('xd', escalationRef=escalation)])
+        ss = StartEvent('ss'); w = UserTask('w')
+        sub = SubProcess('sub', flowElements=[ss, throw, w, SequenceFlow('h1', ss, throw), SequenceFlow('h2', throw, w)])
+        es = StartEvent('es', isInterrupting=False, eventDefinitions=[EscalationEventDefinition('xd2')]); eu = UserTask('eu')
+        handler = SubProcess('esp', triggeredByEvent=True, flowElements=[es, eu, SequenceFlow('k', es, eu)])
+        s = StartEvent('s')
+        process = Process('p', flowElements=[s, sub, handler, SequenceFlow('h0', s, sub)])
+        engine = Engine()
+        instance = engine.start(process)
+        self.assertEqual(sorted(sum((names(frame) for frame in instance.frames), [])), ['eu', 'w'])
+        engine.complete(instance, 'eu')
+        engine.complete(instance, 'w')
+        self.assertEqual(instance.state, 'Completed')
+        
+    def test_handler_tables_are_precomputed(self):
+        error = Error('e1', 'Bad', 'BAD')
+        s = StartEvent('s'); u = UserTask('u'); e = EndEvent('e')
+        b = BoundaryEvent('b', u, eventDefinitions=[ErrorEventDefinition('ed', errorRef=error)])
+        process = Process('p', flowElements=[s, u, e, b, SequenceFlow('f1', s, u), SequenceFlow('f2', u, e)])
+        compiled = Engine().compile(process)
+        self.assertEqual(compiled.handlers[compiled.node_index['u']][('error', 'BAD')],
+                         (0, compiled.node_index['b'], None, True))
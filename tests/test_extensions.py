@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Extension attributes compiled by the ExtensionRegistry of Definitions.
+'''
+
+import unittest
+
+from Process.models import Process
+from Activities.models import Task
+from Core.Common.models import StartEvent, EndEvent, SequenceFlow
+from Core.Common.ErrorModels import ModelError
+from Core.Foundation.models import ExtensionDefinition, ExtensionAttributeDefinition, ExtensionAttributeValue, Extension
+from Infrastructure.models import Definitions
+from Engine.compiler import extension_value
+
+def definitions(values, extensions=()):
+    '''
+    Return (Definitions, task, start) of a process whose task holds the extension values.
+    '''
+    s = StartEvent('s'); t = Task('t', extensionValues=list(values)); e = EndEvent('e')
+    process = Process('p', flowElements=[s, t, e, SequenceFlow('f1', s, t), SequenceFlow('f2', t, e)])
+    return Definitions('d', 'n', 'ns', rootElements=[process], extensions=list(extensions)), t, s
+    
+class ExtensionTest(unittest.TestCase):
+    
+    def test_values_are_read_by_name(self):
+        retries = ExtensionAttributeDefinition('retries', 'int')
+        loaded, task, start = definitions([ExtensionAttributeValue(retries, value=3)])
+        self.assertEqual(task.extensionAttributes.get('retries'), 3)
+        self.assertEqual(extension_value(task, 'retries'), 3)
+        self.assertEqual(extension_value(start, 'retries', 1), 1)
+        self.assertIs(start.extensionAttributes, loaded.extensionRegistry.empty)
+        
+    def test_names_need_not_be_identifiers(self):
+        dashed = ExtensionAttributeDefinition('max-retries', 'int'); items = ExtensionAttributeDefinition('items', 'str')
+        loaded, task, start = definitions([ExtensionAttributeValue(dashed, value=2), ExtensionAttributeValue(items, value='a')])
+        self.assertEqual(task.extensionAttributes.get('max-retries'), 2)
+        self.assertEqual(task.extensionAttributes.get('items'), 'a')
+        self.assertEqual(task.extensionAttributes.items(), [('max-retries', 2), ('items', 'a')])
+        
+    def test_same_name_in_two_definitions(self):
+        http = ExtensionAttributeDefinition('timeout', 'float'); queue = ExtensionAttributeDefinition('timeout', 'str')
+        extensions = [Extension(definition=ExtensionDefinition('http', extensionAttributeDefinitions=[http])),
+                      Extension(definition=ExtensionDefinition('queue', extensionAttributeDefinitions=[queue]))]
+        loaded, task, start = definitions([ExtensionAttributeValue(http, value=2.5), ExtensionAttributeValue(queue, value='1h')],
+                                          extensions)
+        attributes = task.extensionAttributes
+        self.assertEqual(attributes.get('timeout', 'http'), 2.5)
+        self.assertEqual(attributes.get('timeout', 'queue'), '1h')
+        self.assertEqual(attributes.get('timeout'), 2.5)
+        self.assertEqual(len(loaded.extensionRegistry.attributes), 2)
+        
+    def test_values_are_type_checked(self):
+        retries = ExtensionAttributeDefinition('retries', 'int')
+        self.assertRaises(ModelError, definitions, [ExtensionAttributeValue(retries, value='three')])
+        
+    def test_extension_which_must_be_understood(self):
+        unknown = ExtensionDefinition('unknown-plugin')
+        self.assertRaises(ModelError, definitions, [], [Extension(True, definition=unknown)])
+        definitions([], [Extension(False, definition=unknown)])
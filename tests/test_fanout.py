@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Fan-out of Messages to the members of multi-instance Participants.
+'''
+
+import unittest
+from time import time, sleep
+
+from Process.models import Process
+from Activities.models import SendTask, ReceiveTask, MultiInstanceLoopCharacteristics
+from Collaboration.models import Collaboration, Participant, MessageFlow, ParticipantMultiplicity
+from Core.Common.models import StartEvent, EndEvent, SequenceFlow, Message, FormalExpression
+from Data.models import Property, DataInput, DataInputAssociation
+from Engine.engine import Engine
+from Engine.messaging import MessageBus
+from Engine.fanout import FanOut
+from Core.Common.ErrorModels import EngineError
+
+def quotation(condition=None):
+    '''
+    Return (collaboration, buyer, suppliers) : the buyer sends a request for quotation to the suppliers and waits for the quotes.
+    '''
+    rfq = Message('rfq', 'RFQ'); quote = Message('quote', 'Quote')
+    loop = None
+    if condition is not None:
+        loop = MultiInstanceLoopCharacteristics('mi', completionCondition=FormalExpression('cc', condition, None))
+    bs = StartEvent('bs'); be = EndEvent('be')
+    send = SendTask('send', None, messageRef=rfq, loopCharacteristics=loop,
+                    dataInputAssociations=[DataInputAssociation('a1', DataInput('oi', 'delay'), sourceRef=[Property('pd', 'delay')])])
+    receive = ReceiveTask('recv', None, messageRef=quote)
+    buyer = Process('buyer', properties=[Property('pd', 'delay')],
+                    flowElements=[bs, send, receive, be, SequenceFlow('b1', bs, send), SequenceFlow('b2', send, receive),
+                                  SequenceFlow('b3', receive, be)])
+    pb = Participant('pb', processRef=buyer)
+    suppliers = Participant('sup', participantMultiplicityRef=ParticipantMultiplicity(0, 10))
+    collaboration = Collaboration('c', 'c', participants=[pb, suppliers],
+                                  messageFlow=[MessageFlow('m1', 'rfq', send, suppliers, messageRef=rfq),
+                                               MessageFlow('m2', 'quote', suppliers, receive, messageRef=quote)])
+    return collaboration, buyer, suppliers
+    
+def supplier(n):
+    def member(message, payload):
+        sleep(payload['delay'] * n)
+        if n == 0:
+            raise ValueError('down')
+        return n
+    return member
+    
+class FanOutTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.fanouts = []
+        
+    def tearDown(self):
+        for fanout in self.fanouts:
+            fanout.close()
+            
+    def deploy(self, members, condition=None, **kwargs):
+        collaboration, buyer, suppliers = quotation(condition)
+        engine = Engine()
+        fanout = FanOut(MessageBus(engine, [collaboration]), size=10, **kwargs)
+        fanout.register(suppliers, members)
+        self.fanouts.append(fanout)
+        return engine, buyer
+        
+    def test_replies_are_aggregated(self):
+        engine, buyer = self.deploy([supplier(n) for n in range(4)])
+        instance = engine.start(buyer, {'delay': 0})
+        self.assertEqual(engine.bus.dispatch(), 1)
+        self.assertEqual(instance.state, 'Completed')
+        self.assertEqual(sorted(instance.variables['replies']), [1, 2, 3])
+        
+    def test_completion_condition_does_not_wait_for_the_slowest(self):
+        engine, buyer = self.deploy([supplier(n) for n in range(1, 6)], 'nrOfCompletedInstances >= 2')
+        instance = engine.start(buyer, {'delay': 0.1})
+        started = time()
+        engine.bus.dispatch()
+        self.assertLess(time() - started, 0.4)
+        self.assertEqual(sorted(instance.variables['replies']), [1, 2])
+        
+    def test_each_message_is_replied_to_as_soon_as_it_completes(self):
+        engine, buyer = self.deploy([supplier(n) for n in range(1, 3)])
+        ended = []
+        engine.ended.append(lambda instance: ended.append((instance.variables['delay'], time())))
+        engine.start_many(buyer, [{'delay': 0.5}, {'delay': 0}])
+        started = time()
+        engine.bus.dispatch()
+        self.assertEqual([delay for delay, at in ended], [0, 0.5])
+        self.assertLess(ended[0][1] - started, 0.3)
+        
+    def test_dispatch_has_an_overall_deadline(self):
+        engine, buyer = self.deploy([supplier(n) for n in range(1, 4)], timeout=0.3)
+        instances = engine.start_many(buyer, [{'delay': 0.2}, {'delay': 0.25}])
+        started = time()
+        engine.bus.dispatch()
+        self.assertLess(time() - started, 0.45)
+        self.assertEqual([instance.variables['replies'] for instance in instances], [[1], [1]])
+        self.assertEqual(engine.bus.fanout.pending, [])
+        
+    def test_reply_no_sender_consumes_is_undelivered(self):
+        engine, buyer = self.deploy([supplier(1)])
+        instance = engine.start(buyer, {'delay': 0})
+        engine.message(instance, 'quote')
+        engine.bus.dispatch()
+        (route, key, payload, sender, conversation), = engine.bus.take_undelivered()
+        self.assertEqual((route.participant, key, payload, sender, conversation), ('pb', 'quote', {'replies': [1]}, instance, None))
+        
+    def test_invalid_fanout(self):
+        collaboration, buyer, suppliers = quotation()
+        bus = MessageBus(Engine(), [collaboration])
+        self.assertRaises(EngineError, FanOut, bus, timeout=None)
+        fanout = FanOut(bus)
+        self.fanouts.append(fanout)
+        self.assertRaises(EngineError, fanout.register, Participant('single'), [supplier(1)])
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Workload forecast of the open instances.
+'''
+
+import unittest
+from math import exp
+
+from Process.models import Process
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, EndEvent, ExclusiveGateway, ParallelGateway, SequenceFlow, FormalExpression
+from Core.Common.ErrorModels import EngineError
+from Data.models import Property
+from Engine.engine import Engine
+from Engine.forecasting import Forecaster
+
+def review():
+    '''
+    Return a process where a User Task a is followed by b when r < 0.7, by c otherwise.
+    '''
+    s = StartEvent('s'); a = UserTask('a'); g = ExclusiveGateway('g'); b = UserTask('b'); c = UserTask('c')
+    e = EndEvent('e'); e2 = EndEvent('e2')
+    fb = SequenceFlow('fb', g, b, conditionExpression=FormalExpression('x', body='r < 0.7', evaluatesToTypeRef=None))
+    fc = SequenceFlow('fc', g, c)
+    g.default = fc
+    return Process('p', properties=[Property('r', 'r')],
+                   flowElements=[s, a, g, b, c, e, e2, SequenceFlow('f0', s, a), SequenceFlow('f1', a, g),
+                                 fb, fc, SequenceFlow('f4', b, e), SequenceFlow('f5', c, e2)])
+                                 
+class ForecastTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.process = review()
+        self.engine = Engine()
+        instances = self.engine.start_many(self.process, [{'r': 0.1 * i} for i in range(10)])
+        for instance in instances:
+            self.engine.complete(instance, 'a')
+        self.forecaster = Forecaster(self.engine)
+        self.forecaster.durations['a'] = 3600.0
+        
+    def test_branch_probabilities_are_learnt(self):
+        compiled = self.engine.compile(self.process)
+        probabilities, certain = self.forecaster.probabilities(compiled)
+        flows = dict((flow.id, index) for index, flow in enumerate(compiled.flows))
+        self.assertAlmostEqual(probabilities[flows['fb']], 7.5 / 11)
+        self.assertAlmostEqual(probabilities[flows['fc']], 3.5 / 11)
+        self.assertTrue(certain[flows['f1']])
+        self.assertFalse(certain[flows['fb']])
+        
+    def test_arrivals_decay_with_the_mean_duration(self):
+        forecast = self.forecaster.forecast(self.process, 3 * 3600, 3600, tokens={'a': 100})
+        self.assertEqual(forecast.buckets, 3)
+        share = 1 - exp(-1)
+        self.assertAlmostEqual(forecast.expected['b'][0], 100 * share * 7.5 / 11)
+        self.assertAlmostEqual(forecast.expected['b'][1], 100 * (1 - share) * share * 7.5 / 11)
+        self.assertEqual(forecast.certain['b'], [0.0] * 3)
+        long = self.forecaster.forecast(self.process, 100 * 3600, 3600, tokens={'a': 100})
+        self.assertAlmostEqual(long.total('b') + long.total('c'), 100)
+        
+    def test_default_tokens_are_the_waiting_ones(self):
+        forecast = self.forecaster.forecast(self.process, 3600, 3600)
+        self.assertEqual(sorted(forecast.expected), ['a', 'b', 'c'])
+        self.assertEqual(forecast.total('b'), 0)
+        
+    def test_certain_arrivals_through_parallel_flows(self):
+        s = StartEvent('s'); a = UserTask('a'); g = ParallelGateway('g'); b = UserTask('b'); c = UserTask('c')
+        process = Process('q', flowElements=[s, a, g, b, c, SequenceFlow('f0', s, a), SequenceFlow('f1', a, g),
+                                             SequenceFlow('f2', g, b), SequenceFlow('f3', g, c)])
+        forecast = Forecaster(self.engine, default=3600.0).forecast(process, 3600, 3600, tokens={'a': 10})
+        self.assertAlmostEqual(forecast.certain['c'][0], 10 * (1 - exp(-1)))
+        self.assertEqual(forecast.certain['b'], forecast.expected['b'])
+        
+    def test_invalid_bucket(self):
+        self.assertRaises(EngineError, self.forecaster.forecast, self.process, 3600, 0)
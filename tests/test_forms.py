@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Form schemas of the User Tasks and their ETags.
+'''
+
+import json
+import unittest
+
+from Process.models import Process
+from Activities.models import SubProcess
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, EndEvent, SequenceFlow, ItemDefinition
+from Core.Foundation.models import Documentation
+from Data.models import InputOutputSpecification, DataInput, DataOutput, InputSet, OutputSet
+from Infrastructure.models import Definitions
+from Engine.engine import Engine
+from Engine.deployment import DeploymentManager
+from Engine.forms import FormCache, form_schema, value_schema
+from Engine.tasks import TaskList
+
+def approval():
+    '''
+    Return a User Task showing an amount, asking for a decision and an optional comment.
+    '''
+    amount = DataInput('di', 'amount', itemSubjectRef=ItemDefinition('money', structureRef=float))
+    decision = DataOutput('do1', 'decision', itemSubjectRef=ItemDefinition('choice', structureRef=('yes', 'no')))
+    comment = DataOutput('do2', 'comments', isCollection=True, itemSubjectRef=ItemDefinition('text', structureRef='xsd:string'))
+    specification = InputOutputSpecification('io', dataInputs=[amount], dataOutputs=[decision, comment],
+                                             inputSets=[InputSet('is', dataInputRefs=[amount])],
+                                             outputSets=[OutputSet('os', dataOutputRefs=[decision, comment],
+                                                                   optionalOutputRefs=[comment])])
+    return UserTask('approve', name='Approve', ioSpecification=specification,
+                    documentation=[Documentation('doc', text='Approve the expense')])
+    
+def definitions():
+    s = StartEvent('s'); a = UserTask('a'); e = EndEvent('e')
+    ss = StartEvent('ss'); b = UserTask('b'); se = EndEvent('se')
+    sub = SubProcess('sub', flowElements=[ss, b, se, SequenceFlow('x1', ss, b), SequenceFlow('x2', b, se)])
+    process = Process('p', flowElements=[s, a, sub, e, SequenceFlow('f0', s, a), SequenceFlow('f1', a, sub),
+                                         SequenceFlow('f2', sub, e)])
+    return Definitions('app', 'App', 'ns', rootElements=[process])
+    
+class FormTest(unittest.TestCase):
+    
+    def test_schema_of_the_io_specification(self):
+        schema = form_schema(approval())
+        self.assertEqual((schema['title'], schema['description']), ('Approve', 'Approve the expense'))
+        self.assertEqual(schema['properties']['amount'], {'type': 'number', 'readOnly': True})
+        self.assertEqual(schema['properties']['decision'], {'enum': ['yes', 'no']})
+        self.assertEqual(schema['properties']['comments'], {'type': 'array', 'items': {'type': 'string'}})
+        self.assertEqual(schema['required'], ['decision'])
+        
+    def test_structured_values(self):
+        address = ItemDefinition('address', structureRef={'city': ItemDefinition('city', structureRef=str)})
+        self.assertEqual(value_schema(address, True),
+                         {'type': 'array', 'items': {'type': 'object', 'properties': {'city': {'type': 'string'}}}})
+        self.assertEqual(value_schema(None), {})
+        
+    def test_document_is_only_sent_when_the_etag_changed(self):
+        task = approval()
+        forms = FormCache()
+        etag, document = forms.get(task)
+        self.assertEqual(json.loads(document)['title'], 'Approve')
+        self.assertEqual(forms.get(task, etag), (etag, None))
+        self.assertEqual(forms.get(task, '"stale"'), (etag, document))
+        other = approval()
+        other.name = 'Approve again'
+        self.assertNotEqual(forms.get(other, etag)[0], etag)
+        
+    def test_forms_are_built_at_deployment(self):
+        engine = Engine()
+        tasklist = TaskList(engine)
+        manager = DeploymentManager(engine)
+        try:
+            deployment = manager.deploy(definitions(), status='PROD', wait=True)
+            self.assertEqual(sorted(form[0].id for form in manager.forms.forms.values()), ['a', 'b'])
+            manager.start('app', 'p')
+            task = tasklist.ready()[0]
+            etag, document = manager.forms.get(task)
+            self.assertEqual(manager.forms.forms[id(task.scope.process.nodes[task.node])][1:], (etag, document))
+            manager.forms.discard(deployment.compiled.values())
+            self.assertEqual(manager.forms.forms, {})
+        finally:
+            manager.close()
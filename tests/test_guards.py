@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Concurrency limits and circuit breakers of the Operation bindings.
+'''
+
+import unittest
+import time
+
+from Core.Common.models import Message, Error
+from Core.Service.models import Operation
+from Core.Common.ErrorModels import ServiceFault
+from Engine.services import Guard, Invoker, StubAdapter, Unavailable
+
+class Broken(object):
+    '''
+    Adapter failing every batch as a whole, as a transport error would.
+    '''
+    def __init__(self):
+        self.batches = 0
+        
+    def call_many(self, endpoint, operation, payloads):
+        self.batches += 1
+        raise IOError('connection refused')
+        
+class GuardTest(unittest.TestCase):
+    
+    def test_limit_is_aimd(self):
+        guard = Guard(limit=4, target=1.0)
+        guard.record(4, 0, 0.1)
+        self.assertEqual(guard.limit, 5)
+        guard.record(5, 0, 2.0)
+        self.assertEqual(guard.limit, 2)
+        guard.record(1, 1, 0.1)
+        self.assertEqual(guard.limit, 1)
+        
+    def test_circuit_opens_after_threshold_failures(self):
+        guard = Guard(threshold=3, cooldown=60)
+        guard.record(0, 2, 0.1)
+        self.assertEqual(guard.state, 'closed')
+        guard.record(0, 1, 0.1)
+        self.assertEqual(guard.state, 'open')
+        self.assertEqual(guard.admit(10), 0)
+        self.assertEqual(guard.rejections, 10)
+        
+    def test_half_open_probe(self):
+        guard = Guard(threshold=1, cooldown=0)
+        guard.record(0, 1, 0.1)
+        self.assertEqual(guard.admit(10), 1)
+        self.assertEqual(guard.state, 'half-open')
+        self.assertEqual(guard.admit(10), 0)
+        guard.record(1, 0, 0.1)
+        self.assertEqual(guard.state, 'closed')
+        self.assertEqual(guard.admit(10), 10)
+        
+class InvokerTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.operation = Operation('op', 'quote', Message('q', 'q'), errorRef=[Error('en', 'Negative', 'NEG')])
+        self.invoker = Invoker()
+        
+    def test_declared_faults_are_not_failures(self):
+        def quote(payload):
+            raise ServiceFault('NEG')
+        self.invoker.bind(self.operation, StubAdapter({'quote': quote}), guard={'threshold': 1})
+        results = self.invoker.invoke_many(self.operation, [{}] * 3)
+        self.assertEqual([ok for ok, value in results], [False] * 3)
+        self.assertEqual(self.invoker.metrics()[('op', None)]['state'], 'closed')
+        
+    def test_adapter_raising_fails_the_calls_and_opens_the_circuit(self):
+        adapter = Broken()
+        self.invoker.bind(self.operation, adapter, guard={'limit': 2, 'threshold': 2, 'cooldown': 60})
+        results = self.invoker.invoke_many(self.operation, [{}] * 5)
+        self.assertEqual(adapter.batches, 1)
+        self.assertEqual([ok for ok, value in results], [False] * 5)
+        self.assertEqual([value.code for ok, value in results], ['IOError'] * 2 + [Unavailable] * 3)
+        guard = self.invoker.bindings['op'][2]
+        self.assertEqual(guard.state, 'open')
+        self.assertEqual(guard.failures, 2)
+        
+    def test_failed_probe_reopens_the_circuit(self):
+        adapter = Broken()
+        self.invoker.bind(self.operation, adapter, guard={'threshold': 1, 'cooldown': 0.05})
+        self.invoker.invoke_many(self.operation, [{}])
+        guard = self.invoker.bindings['op'][2]
+        opened = guard.opened
+        time.sleep(0.06)
+        results = self.invoker.invoke_many(self.operation, [{}, {}])
+        self.assertEqual(adapter.batches, 2)
+        self.assertEqual([value.code for ok, value in results], ['IOError', Unavailable])
+        self.assertEqual(guard.state, 'open')
+        self.assertGreater(guard.opened, opened)
+        self.assertEqual(guard.admit(1), 0)
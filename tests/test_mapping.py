@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Data Input and Output Associations of Activities, compiled to slot copies.
+'''
+
+import unittest
+
+from Process.models import Process
+from Activities.models import ScriptTask, CallActivity
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, EndEvent, SequenceFlow, FormalExpression
+from Data.models import Property, DataObject, DataInput, DataOutput, InputOutputSpecification
+from Data.models import DataInputAssociation, DataOutputAssociation
+from Engine.engine import Engine
+
+def running(*activities, **kwargs):
+    s = StartEvent('s'); e = EndEvent('e'); elements = [s, e] + list(kwargs.pop('data', []))
+    previous = s
+    for position, activity in enumerate(activities):
+        elements += [activity, SequenceFlow('f%d'%position, previous, activity)]
+        previous = activity
+    elements.append(SequenceFlow('fe', previous, e))
+    return Process('p', flowElements=elements, **kwargs)
+    
+class MappingTest(unittest.TestCase):
+    
+    def test_script_task_reads_its_inputs_and_writes_its_outputs(self):
+        amount = Property('pa', 'amount'); total = DataObject('total', name='total')
+        di = DataInput('di', 'x'); do = DataOutput('do', 'y')
+        task = ScriptTask('st', script='y = x * 2',
+                          ioSpecification=InputOutputSpecification('io', dataInputs=[di], dataOutputs=[do]),
+                          dataInputAssociations=[DataInputAssociation('a1', di, sourceRef=[amount])],
+                          dataOutputAssociations=[DataOutputAssociation('a2', total, sourceRef=[do]),
+                                                  DataOutputAssociation('a3', amount, sourceRef=[do],
+                                                                        transformation=FormalExpression('t', body='y + 1', evaluatesToTypeRef=None))])
+        instance = Engine().start(running(task, properties=[amount], data=[total]), {'amount': 5})
+        self.assertEqual(instance.state, 'Completed')
+        self.assertEqual(instance.variables['total'], 10)
+        self.assertEqual(instance.variables['amount'], 11)
+        self.assertNotIn('x', instance.variables)
+        
+    def test_waiting_task_keeps_its_data_until_completed(self):
+        total = Property('pt', 'total'); result = Property('pr', 'result')
+        task = UserTask('u', dataInputAssociations=[DataInputAssociation('a1', DataInput('ui', 'shown'), sourceRef=[total])],
+                        dataOutputAssociations=[DataOutputAssociation('a2', result, sourceRef=[DataOutput('uo', 'answer')])])
+        engine = Engine()
+        instance = engine.start(running(task, properties=[total, result]), {'total': 10})
+        data, = instance.data.values()
+        self.assertEqual(data['shown'], 10)
+        engine.complete(instance, 'u', {'answer': 42})
+        self.assertEqual(instance.state, 'Completed')
+        self.assertEqual(instance.variables['result'], 42)
+        self.assertEqual(instance.data, {})
+        
+    def test_call_activity_passes_its_data_to_the_called_process(self):
+        cs = StartEvent('cs'); ct = ScriptTask('ct', script='out = inp + 100'); ce = EndEvent('ce')
+        child = Process('child', properties=[Property('ci', 'inp'), Property('co', 'out')],
+                        flowElements=[cs, ct, ce, SequenceFlow('c1', cs, ct), SequenceFlow('c2', ct, ce)])
+        amount = Property('pa', 'amount')
+        call = CallActivity('call', calledElementRef=child,
+                            dataInputAssociations=[DataInputAssociation('a1', DataInput('ki', 'inp'), sourceRef=[amount])],
+                            dataOutputAssociations=[DataOutputAssociation('a2', Property('px', 'fromchild'),
+                                                                          sourceRef=[DataOutput('ko', 'out')])])
+        instance = Engine().start(running(call, properties=[amount]), {'amount': 5})
+        self.assertEqual(instance.state, 'Completed')
+        self.assertEqual(instance.variables['fromchild'], 105)
+        self.assertNotIn('out', instance.variables)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Routing of the MessageFlows of Collaborations through the MessageBus.
+'''
+
+import unittest
+
+from Process.models import Process
+from Activities.models import SendTask, ReceiveTask
+from HumanInteraction.models import UserTask
+from Collaboration.models import Collaboration, Participant, MessageFlow
+from Core.Common.models import StartEvent, EndEvent, SequenceFlow, Message, MessageEventDefinition
+from Data.models import Property, DataInput, DataInputAssociation
+from Engine.engine import Engine
+from Engine.messaging import MessageBus
+from Core.Common.ErrorModels import EngineError
+from tests.test_engine import CountingStore
+
+def order_collaboration():
+    '''
+    Return (collaboration, buyer, seller) : the buyer sends an order, which starts a seller, and waits for an ack.
+    '''
+    order = Message('order', 'Order'); ack = Message('ack', 'Ack')
+    qty = Property('pq', 'qty')
+    bs = StartEvent('bs'); be = EndEvent('be')
+    send = SendTask('send', None, messageRef=order,
+                    dataInputAssociations=[DataInputAssociation('a1', DataInput('oi', 'qty'), sourceRef=[qty])])
+    receive = ReceiveTask('recv', None, messageRef=ack)
+    buyer = Process('buyer', properties=[qty], flowElements=[bs, send, receive, be, SequenceFlow('b1', bs, send),
+                                                             SequenceFlow('b2', send, receive), SequenceFlow('b3', receive, be)])
+    ss = StartEvent('ss', eventDefinitions=[MessageEventDefinition('md', messageRef=order)]); work = UserTask('work')
+    se = EndEvent('se', eventDefinitions=[MessageEventDefinition('md2', messageRef=ack)])
+    seller = Process('seller', properties=[Property('sq', 'qty')],
+                     flowElements=[ss, work, se, SequenceFlow('s1', ss, work), SequenceFlow('s2', work, se)])
+    pb = Participant('pb', processRef=buyer); ps = Participant('ps', processRef=seller)
+    collaboration = Collaboration('c', 'c', participants=[pb, ps],
+                                  messageFlow=[MessageFlow('m1', 'order', send, ps, messageRef=order),
+                                               MessageFlow('m2', 'ack', se, receive, messageRef=ack)])
+    return collaboration, buyer, seller
+    
+def running(engine, process):
+    return [instance for instance in engine.instances.values() if instance.process is engine.compile(process)]
+    
+class MessageBusTest(unittest.TestCase):
+    
+    def test_message_flows_are_compiled_into_routes(self):
+        collaboration, buyer, seller = order_collaboration()
+        bus = MessageBus(Engine(), [collaboration])
+        self.assertEqual([(route.participant, route.node) for route in bus.routes['send']], [('ps', None)])
+        self.assertEqual([(route.participant, route.node) for route in bus.routes['se']], [('pb', 'recv')])
+        self.assertEqual(bus.routes['ps'], bus.routes['se'])
+        self.assertEqual(bus.owners['recv'], 'pb')
+        
+    def test_messages_start_instances_by_batches(self):
+        collaboration, buyer, seller = order_collaboration()
+        engine = Engine(CountingStore())
+        bus = MessageBus(engine, [collaboration], batch=10)
+        engine.start_many(buyer, [{'qty': i} for i in range(25)])
+        self.assertEqual(bus.pending(), 25)
+        writes = engine.store.writes
+        self.assertEqual(bus.dispatch(), 25)
+        self.assertEqual(engine.store.writes - writes, 3)
+        self.assertEqual(sorted(instance.variables['qty'] for instance in running(engine, seller)), range(25))
+        
+    def test_uncorrelated_message_is_undelivered(self):
+        collaboration, buyer, seller = order_collaboration()
+        engine = Engine()
+        bus = MessageBus(engine, [collaboration])
+        engine.start(buyer, {'qty': 1})
+        bus.dispatch()
+        engine.complete(running(engine, seller)[0], 'work')
+        self.assertEqual(bus.dispatch(), 1)
+        self.assertEqual(len(bus.undelivered), 1)
+        
+    def test_undelivered_messages_are_bounded(self):
+        collaboration, buyer, seller = order_collaboration()
+        bus = MessageBus(Engine(), [collaboration], capacity=2)
+        for i in range(3):
+            bus.send('ps', 'ack', {'n': i})
+        bus.dispatch()
+        self.assertEqual(bus.lost, 1)
+        self.assertEqual([item[2] for item in bus.take_undelivered()], [{'n': 1}, {'n': 2}])
+        self.assertEqual(len(bus.undelivered), 0)
+        
+    def test_dispatch_stops_at_its_limit(self):
+        collaboration, buyer, seller = order_collaboration()
+        engine = Engine()
+        bus = MessageBus(engine, [collaboration])
+        buyers = engine.start_many(buyer, [{'qty': i} for i in range(10)])
+        for instance in buyers:
+            bus.send('ps', 'ack', instance=instance)
+        self.assertEqual(bus.pending(), 20)
+        self.assertEqual(bus.dispatch(limit=5), 5)
+        self.assertEqual(bus.pending(), 15)
+        self.assertEqual(bus.dispatch_participant('pb', 0), 0)
+        
+    def test_message_to_an_instance_is_delivered(self):
+        collaboration, buyer, seller = order_collaboration()
+        engine = Engine()
+        bus = MessageBus(engine, [collaboration])
+        instance = engine.start(buyer, {'qty': 1})
+        bus.dispatch()
+        bus.send('ps', 'ack', instance=instance)
+        bus.dispatch()
+        self.assertEqual(instance.state, 'Completed')
+        self.assertEqual(bus.take_undelivered(), [])
+        
+    def test_full_queue_is_dispatched_by_send(self):
+        collaboration, buyer, seller = order_collaboration()
+        engine = Engine()
+        bus = MessageBus(engine, [collaboration], capacity=10, batch=4)
+        for qty in range(30):
+            bus.send('pb', 'order', {'qty': qty})
+        self.assertLessEqual(bus.pending(), 10)
+        self.assertEqual(len(running(engine, seller)) + bus.pending(), 30)
+        
+    def test_invalid_capacity(self):
+        self.assertRaises(EngineError, MessageBus, Engine(), capacity=0)
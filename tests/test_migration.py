@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Migration of running instances between compiled versions of a Process.
+'''
+
+import unittest
+
+from Process.models import Process
+from HumanInteraction.models import UserTask
+from Activities.models import ScriptTask, SubProcess
+from Core.Common.models import StartEvent, EndEvent, ParallelGateway, IntermediateThrowEvent, BoundaryEvent, SequenceFlow
+from Core.Common.models import Association, CompensateEventDefinition
+from Data.models import Property
+from Engine.engine import Engine
+from Engine.migration import MigrationPlan
+
+def ordering(version):
+    '''
+    Return a version of a process running a User Task a in parallel with a Sub-Process (User Task c, renamed c2 in
+    version 2). Version 2 declares a new variable y and adds a User Task b before the end.
+    '''
+    s = StartEvent('s'); a = UserTask('a'); g = ParallelGateway('g'); j = ParallelGateway('j'); e = EndEvent('e')
+    ss = StartEvent('ss'); c = UserTask('c' if version == 1 else 'c2'); se = EndEvent('se')
+    sub = SubProcess('sub', flowElements=[ss, c, se, SequenceFlow('x1', ss, c), SequenceFlow('x2', c, se)])
+    elements = [s, g, a, sub, j, e, SequenceFlow('f0', s, g), SequenceFlow('f1', g, a), SequenceFlow('f2', g, sub),
+                SequenceFlow('f3', a, j), SequenceFlow('f4', sub, j)]
+    properties = [Property('x', 'x')]
+    if version == 1:
+        elements.append(SequenceFlow('f5', j, e))
+    else:
+        b = UserTask('b')
+        elements += [b, SequenceFlow('f5', j, b), SequenceFlow('f6', b, e)]
+        properties.insert(0, Property('y', 'y'))
+    return Process('p', properties=properties, flowElements=elements)
+    
+def booking(handler):
+    '''
+    Return a process where a compensable Script Task t is followed by a User Task w, then compensated
+    (t has a compensation handler only if handler).
+    '''
+    s = StartEvent('s'); t = ScriptTask('t', script='booked = 1'); w = UserTask('w'); e = EndEvent('e')
+    c = IntermediateThrowEvent('c', eventDefinitions=[CompensateEventDefinition('cc')])
+    elements = [s, t, w, c, e, SequenceFlow('f0', s, t), SequenceFlow('f1', t, w), SequenceFlow('f2', w, c), SequenceFlow('f3', c, e)]
+    artifacts = []
+    if handler:
+        b = BoundaryEvent('b', t, eventDefinitions=[CompensateEventDefinition('cd')])
+        undo = ScriptTask('undo', isForCompensation=True, script='booked = 0')
+        elements += [b, undo]
+        artifacts.append(Association('a', b, undo))
+    return Process('p', flowElements=elements, artifacts=artifacts)
+    
+def waiting(instance):
+    return sorted(scope.process.nodes[node].id for scope in instance.scopes() for node in scope.tokens)
+    
+class MigrationTest(unittest.TestCase):
+    
+    def test_instances_go_on_with_the_target_version(self):
+        source, target = ordering(1), ordering(2)
+        engine = Engine()
+        instances = engine.start_many(source, [{'x': i} for i in range(5)])
+        engine.complete(instances[0], 'a')
+        plan = MigrationPlan(engine, source, target, overrides={'c': 'c2'})
+        self.assertEqual(plan.errors, [])
+        report = plan.migrate(batch=2)
+        self.assertEqual(report.migrated, 5)
+        instance = instances[0]
+        self.assertIs(instance.process, engine.compile(target))
+        self.assertEqual(waiting(instance), ['c2', 'j', 'sub'])
+        self.assertEqual((instance.variables['x'], instance.variables['y']), (0, None))
+        engine.complete(instance, 'c2')
+        self.assertEqual(waiting(instance), ['b'])
+        engine.complete(instance, 'b')
+        self.assertEqual(instance.state, 'Completed')
+        
+    def test_token_on_an_unmapped_node_is_rejected(self):
+        source, target = ordering(1), ordering(2)
+        engine = Engine()
+        instance = engine.start(source)
+        plan = MigrationPlan(engine, source, target)
+        self.assertIn('c', plan.check(instance))
+        self.assertEqual(plan.migrate().failed.keys(), [instance.id])
+        self.assertIs(instance.process, engine.compile(source))
+        
+    def test_compensable_node_needs_a_handler_in_the_target(self):
+        source = booking(True)
+        engine = Engine()
+        instance = engine.start(source)
+        plan = MigrationPlan(engine, source, booking(False))
+        self.assertEqual(plan.check(instance), 'compensable t has no compensation handler in the target')
+        self.assertEqual(plan.migrate().migrated, 0)
+        
+    def test_compensation_records_are_migrated(self):
+        source, target = booking(True), booking(True)
+        engine = Engine()
+        instance = engine.start(source)
+        self.assertEqual(MigrationPlan(engine, source, target).migrate().migrated, 1)
+        engine.complete(instance, 'w')
+        self.assertEqual(instance.state, 'Completed')
+        self.assertEqual(instance.variables['booked'], 0)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Node counters of the compiled processes and LoadMonitor snapshots.
+'''
+
+import unittest
+import time
+
+from Process.models import Process
+from Activities.models import SubProcess, ScriptTask
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, EndEvent, ParallelGateway, SequenceFlow
+from Engine.engine import Engine
+from Engine.monitoring import LoadMonitor
+
+def parallel():
+    '''
+    Return a process running a User Task a, a Script Task b and a Sub-Process (User Task c) in parallel.
+    '''
+    s = StartEvent('s'); g = ParallelGateway('g'); j = ParallelGateway('j'); e = EndEvent('e')
+    a = UserTask('a'); b = ScriptTask('b', script='x = 1')
+    ss = StartEvent('ss'); c = UserTask('c'); se = EndEvent('se')
+    sub = SubProcess('sub', flowElements=[ss, c, se, SequenceFlow('x1', ss, c), SequenceFlow('x2', c, se)])
+    return Process('p', flowElements=[s, g, a, b, sub, j, e, SequenceFlow('f0', s, g), SequenceFlow('f1', g, a),
+                                      SequenceFlow('f2', g, b), SequenceFlow('f3', g, sub), SequenceFlow('f4', a, j),
+                                      SequenceFlow('f5', b, j), SequenceFlow('f6', sub, j), SequenceFlow('f7', j, e)])
+                                      
+def by_id(compiled, values):
+    return dict((node.id, value) for node, value in zip(compiled.nodes, values))
+    
+class MonitoringTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.process = parallel()
+        self.engine = Engine()
+        self.instances = self.engine.start_many(self.process, [None] * 10)
+        self.monitor = LoadMonitor(self.engine)
+        
+    def test_counters_follow_the_tokens(self):
+        compiled = self.engine.compile(self.process)
+        entered, completed, cancelled, waiting = compiled.counters.read()
+        self.assertEqual(by_id(compiled, waiting), {'s': 0, 'g': 0, 'a': 10, 'b': 0, 'sub': 10, 'j': 10, 'e': 0})
+        self.assertEqual(by_id(compiled, entered)['j'], 10)
+        for instance in self.instances[:4]:
+            self.engine.complete(instance, 'a')
+            self.engine.complete(instance, 'c')
+        entered, completed, cancelled, waiting = compiled.counters.read()
+        self.assertEqual(by_id(compiled, waiting), {'s': 0, 'g': 0, 'a': 6, 'b': 0, 'sub': 6, 'j': 6, 'e': 0})
+        self.assertEqual(by_id(compiled, completed)['e'], 4)
+        
+    def test_stats_over_the_snapshots(self):
+        self.monitor.snapshot()
+        time.sleep(0.1)
+        for instance in self.instances[:5]:
+            self.engine.complete(instance, 'a')
+        self.monitor.snapshot()
+        stats = self.monitor.stats()
+        self.assertEqual(sorted(stats), [('p', 1), ('p/sub', 1)])
+        self.assertEqual(stats['p', 1]['a']['waiting'], 5)
+        self.assertEqual(stats['p/sub', 1]['c']['waiting'], 10)
+        self.assertGreater(stats['p', 1]['a']['completed'], 0)
+        self.assertGreaterEqual(stats['p', 1]['a']['time'], 0.1)
+        self.assertIsNone(stats['p/sub', 1]['c']['time'])
+        
+    def test_snapshots_are_a_ring_buffer(self):
+        monitor = LoadMonitor(self.engine, size=2)
+        first = monitor.snapshot(); monitor.snapshot(); monitor.snapshot()
+        self.assertEqual(len(monitor.snapshots), 2)
+        self.assertNotIn(first, monitor.snapshots)
+        
+    def test_prometheus_exposition(self):
+        text = self.monitor.prometheus()
+        self.assertIn('# TYPE bpmn_node_tokens gauge\n', text)
+        self.assertIn('bpmn_node_tokens{process="p",version="1",node="a"} 10\n', text)
+        self.assertIn('bpmn_node_tokens{process="p/sub",version="1",node="c"} 10\n', text)
+        self.assertIn('bpmn_node_completed_total{process="p",version="1",node="b"} 10\n', text)
+        
+    def test_versions_of_a_process_are_counted_apart(self):
+        s = StartEvent('s'); u = UserTask('u'); e = EndEvent('e')
+        second = Process('p', flowElements=[s, u, e, SequenceFlow('f0', s, u), SequenceFlow('f1', u, e)])
+        self.engine.start(second)
+        self.monitor.snapshot()
+        stats = self.monitor.stats()
+        self.assertEqual(sorted(stats), [('p', 1), ('p', 2), ('p/sub', 1)])
+        self.assertEqual(stats['p', 1]['a']['waiting'], 10)
+        self.assertEqual(stats['p', 2]['u']['waiting'], 1)
+        self.assertIn('bpmn_node_tokens{process="p",version="2",node="u"} 1\n', self.monitor.prometheus())
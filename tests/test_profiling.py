@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Profiling hooks of the engine.
+'''
+
+import unittest
+from itertools import count
+
+from Process.models import Process
+from Activities.models import ScriptTask
+from Core.Common.models import StartEvent, EndEvent, ExclusiveGateway, SequenceFlow, FormalExpression
+from Engine.engine import Engine
+from Engine.profiling import Instrumentation, NodeTimer, SamplingProfiler, Hooks, Tee, collapsed
+
+def routing():
+    s = StartEvent('s'); t = ScriptTask('t', script='x = 1'); g = ExclusiveGateway('g'); e1 = EndEvent('e1'); e2 = EndEvent('e2')
+    return Process('p', flowElements=[s, t, g, e1, e2, SequenceFlow('f1', s, t), SequenceFlow('f2', t, g),
+                                      SequenceFlow('f3', g, e1, conditionExpression=FormalExpression('c1', 'x == 1', 'bool')),
+                                      SequenceFlow('f4', g, e2, conditionExpression=FormalExpression('c2', 'x != 1', 'bool'))])
+    
+class Recorder(Hooks):
+    
+    def __init__(self, name, events):
+        self.name = name
+        self.events = events
+        
+    def begin(self, event, subject):
+        self.events.append(('begin', self.name, event))
+        
+    def end(self, event, subject):
+        self.events.append(('end', self.name, event))
+        
+class ProfilingTest(unittest.TestCase):
+    
+    def test_node_timer_nests_the_events(self):
+        engine = Engine()
+        timer = NodeTimer(clock=count().next)
+        with Instrumentation(engine, timer):
+            engine.start(routing())
+        times = dict(((event, getattr(subject, 'id', subject)), calls) for event, subject, calls, total, own in timer.table())
+        self.assertEqual(times[('node', 't')], 1)
+        self.assertEqual(times[('expression', 'g')], 1)
+        self.assertEqual(times[('persist', None)], 1)
+        stacks = [';'.join(stack) for stack in timer.stacks]
+        self.assertIn('ScriptTask:t;token:t;expression:t', stacks)
+        self.assertIn('ExclusiveGateway:g;expression:g', stacks)
+        for subject, calls, total, own in timer.nodes():
+            self.assertTrue(0 < own <= total)
+        self.assertEqual(len(timer.collapsed().splitlines()), len([own for own in timer.stacks.values() if own]))
+        
+    def test_detached_engine_runs_its_own_methods(self):
+        engine = Engine()
+        behaviours = dict(engine.behaviours)
+        timer = NodeTimer()
+        instrumentation = Instrumentation(engine, timer).attach()
+        self.assertIs(engine.profiling, instrumentation)
+        instrumentation.detach()
+        self.assertEqual(engine.behaviours, behaviours)
+        self.assertNotIn('_leave', vars(engine))
+        self.assertNotIn('save', vars(engine.store))
+        engine.start(routing())
+        self.assertEqual(timer.times, {})
+        
+    def test_tee_ends_in_reverse_order(self):
+        events = []
+        tee = Tee(Recorder('a', events), Recorder('b', events))
+        tee.begin('node', None)
+        tee.end('node', None)
+        self.assertEqual(events, [('begin', 'a', 'node'), ('begin', 'b', 'node'), ('end', 'b', 'node'), ('end', 'a', 'node')])
+        
+    def test_sampling_profiler_counts_the_current_stack(self):
+        profiler = SamplingProfiler()
+        profiler.sample()
+        profiler.begin('correlate', 'order')
+        profiler.begin('persist', 3)
+        profiler.sample()
+        profiler.sample()
+        profiler.end('persist', 3)
+        profiler.sample()
+        profiler.end('correlate', 'order')
+        self.assertEqual(profiler.samples, {('correlate:order', 'persist'): 2, ('correlate:order',): 1})
+        self.assertEqual(profiler.collapsed(), 'correlate:order;persist 2\ncorrelate:order 1')
+        
+    def test_collapsed_skips_the_empty_stacks(self):
+        self.assertEqual(collapsed({('a',): 0, ('a', 'b'): 5}), 'a;b 5')
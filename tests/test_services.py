@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Invocation of service Operations through the StubAdapter and the HTTPAdapter.
+'''
+
+import unittest
+import json
+import threading
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+
+from Process.models import Process
+from Activities.models import ServiceTask
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, EndEvent, BoundaryEvent, SequenceFlow, Message, Error, ErrorEventDefinition
+from Core.Service.models import Operation, EndPoint
+from Core.Common.ErrorModels import ServiceFault
+from Data.models import Property
+from Engine.engine import Engine
+from Engine.services import StubAdapter, HTTPAdapter
+
+class Handler(BaseHTTPRequestHandler):
+    '''
+    Quote service : the price of an amount is twice the amount; a negative amount is a NEG fault,
+    an amount of 13 an HTML error page.
+    '''
+    protocol_version = 'HTTP/1.1'
+    
+    def do_POST(self):
+        self.server.clients.add(self.client_address)
+        amount = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['amount']
+        if amount == 13:
+            status, data = 502, '<html>Bad Gateway</html>'
+        elif amount < 0:
+            status, data = 500, json.dumps({'errorCode': 'NEG'})
+        else:
+            status, data = 200, json.dumps({'price': amount * 2})
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        
+    def log_message(self, *args):
+        pass
+        
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    
+def quote_process(operation, fault):
+    '''
+    Return a process calling operation, the fault Error being caught by a boundary Event.
+    '''
+    s = StartEvent('s'); t = ServiceTask('t', operationRef=operation); e = EndEvent('e'); h = UserTask('h')
+    b = BoundaryEvent('b', t, eventDefinitions=[ErrorEventDefinition('ed', errorRef=fault)])
+    return Process('p', properties=[Property('pa', 'amount'), Property('pp', 'price')],
+                   flowElements=[s, t, e, b, h, SequenceFlow('f1', s, t), SequenceFlow('f2', t, e), SequenceFlow('f3', b, h)])
+                   
+class ServiceTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.fault = Error('en', 'Negative', 'NEG')
+        self.operation = Operation('op', 'quote', Message('q', 'q'), outMessageRef=Message('pr', 'price'), errorRef=[self.fault])
+        self.process = quote_process(self.operation, self.fault)
+        
+    def test_stub_adapter(self):
+        def quote(payload):
+            if payload['amount'] < 0:
+                raise ServiceFault('NEG')
+            return payload['amount'] + 1
+        engine = Engine()
+        engine.services.bind(self.operation, StubAdapter({'quote': quote}))
+        self.assertEqual(engine.start(self.process, {'amount': 1}).variables['price'], 2)
+        failed = engine.start(self.process, {'amount': -1})
+        self.assertEqual([failed.process.nodes[node].id for node in failed.tokens], ['h'])
+        
+class HTTPAdapterTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.server.clients = set()
+        threading.Thread(target=self.server.serve_forever).start()
+        endpoint = EndPoint('ep')
+        self.adapter = HTTPAdapter({endpoint: 'http://127.0.0.1:%d/api'%self.server.server_address[1]}, size=4)
+        self.pool = self.adapter.pool(endpoint)
+        self.operation = Operation('op', 'quote', Message('q', 'q'))
+        
+    def tearDown(self):
+        self.adapter.close()
+        self.server.shutdown()
+        self.server.server_close()
+        
+    def test_reply_is_the_json_body(self):
+        self.assertEqual(self.adapter.call(self.pool, self.operation, {'amount': 4}), {'price': 8})
+        
+    def test_json_error_body_gives_the_fault_code(self):
+        try:
+            self.adapter.call(self.pool, self.operation, {'amount': -1})
+        except ServiceFault as fault:
+            self.assertEqual(fault.code, 'NEG')
+            self.assertEqual(fault.variables, {'errorCode': 'NEG'})
+        else:
+            self.fail('no fault')
+            
+    def test_non_json_error_body_gives_the_status(self):
+        try:
+            self.adapter.call(self.pool, self.operation, {'amount': 13})
+        except ServiceFault as fault:
+            self.assertEqual(fault.code, '502')
+            self.assertIsNone(fault.variables)
+        else:
+            self.fail('no fault')
+            
+    def test_batch_reuses_the_pooled_connections(self):
+        results = self.adapter.call_many('ep', self.operation, [{'amount': i} for i in range(20, 40)])
+        self.assertEqual([reply for ok, reply in results], [{'price': i * 2} for i in range(20, 40)])
+        self.assertLessEqual(len(self.server.clients), 4)
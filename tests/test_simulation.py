@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Discrete-event simulation of process definitions.
+'''
+
+import unittest
+
+from Process.models import Process
+from HumanInteraction.models import UserTask
+from Activities.models import ResourceRole
+from Core.Common.models import StartEvent, EndEvent, ExclusiveGateway, ParallelGateway, SequenceFlow, Resource
+from Core.Common.ErrorModels import EngineError
+from Engine.simulation import Simulation, sampler
+
+def sequence(*tasks):
+    s = StartEvent('s'); e = EndEvent('e'); elements = [s, e] + list(tasks); previous = s
+    for position, task in enumerate(tasks):
+        elements.append(SequenceFlow('f%d'%position, previous, task))
+        previous = task
+    elements.append(SequenceFlow('fe', previous, e))
+    return Process('p', flowElements=elements)
+    
+class SimulationTest(unittest.TestCase):
+    
+    def test_constant_arrivals_and_durations(self):
+        simulation = Simulation(sequence(UserTask('a')), arrivals=('constant', 10.0), durations={'a': ('constant', 25.0)})
+        report = simulation.run(1000)
+        self.assertEqual(report.started, 100)
+        self.assertIn(report.completed, (97, 98))
+        self.assertEqual(report.cycle, 25.0)
+        self.assertEqual(report.nodes['a']['entered'], report.started)
+        
+    def test_limited_resource_queues_the_tokens(self):
+        clerk = Resource('clerk', 'Clerk')
+        task = UserTask('a', resources=[ResourceRole('r', resourceRef=clerk)])
+        simulation = Simulation(sequence(task), arrivals=('constant', 10.0), durations={'a': ('constant', 20.0)},
+                                capacities={'clerk': 1})
+        report = simulation.run(1000)
+        clerk = report.resources['clerk']
+        self.assertEqual(clerk['capacity'], 1)
+        self.assertAlmostEqual(clerk['utilization'], 1.0, 1)
+        self.assertGreater(clerk['longest'], 10)
+        self.assertGreater(report.cycle, 20.0)
+        
+    def test_branch_probabilities(self):
+        s = StartEvent('s'); g = ExclusiveGateway('g'); b = UserTask('b'); c = UserTask('c'); e = EndEvent('e')
+        process = Process('p', flowElements=[s, g, b, c, e, SequenceFlow('f0', s, g), SequenceFlow('fb', g, b),
+                                             SequenceFlow('fc', g, c), SequenceFlow('f4', b, e), SequenceFlow('f5', c, e)])
+        report = Simulation(process, arrivals=1.0, probabilities={'fb': 0.8, 'fc': 0.2}, seed=3).run(10000)
+        share = report.nodes['b']['entered'] / float(report.started)
+        self.assertAlmostEqual(share, 0.8, 1)
+        self.assertEqual(report.nodes['b']['entered'] + report.nodes['c']['entered'], report.started)
+        
+    def test_parallel_join(self):
+        s = StartEvent('s'); g = ParallelGateway('g'); j = ParallelGateway('j'); x = UserTask('x'); y = UserTask('y'); e = EndEvent('e')
+        process = Process('p', flowElements=[s, g, j, x, y, e, SequenceFlow('f0', s, g), SequenceFlow('f1', g, x),
+                                             SequenceFlow('f2', g, y), SequenceFlow('f3', x, j), SequenceFlow('f4', y, j),
+                                             SequenceFlow('f5', j, e)])
+        report = Simulation(process, arrivals=('constant', 10.0), durations={'x': ('constant', 5.0), 'y': ('constant', 7.0)}).run(100)
+        self.assertEqual(report.cycle, 7.0)
+        self.assertEqual(report.nodes['e']['entered'], report.completed)
+        
+    def test_seeded_runs_are_reproducible(self):
+        runs = [Simulation(sequence(UserTask('a')), arrivals=10.0, default=30.0, seed=7).run(5000) for i in range(2)]
+        self.assertEqual([(report.started, report.completed, report.cycle) for report in runs][0],
+                         [(report.started, report.completed, report.cycle) for report in runs][1])
+                         
+    def test_sampler(self):
+        self.assertEqual(sampler(('constant', 3))(None), 3)
+        self.assertEqual(sampler(0)(None), 0.0)
+        self.assertRaises(EngineError, sampler, ('weibull', 1, 2))
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Execution of embedded Sub-Processes, Event Sub-Processes and Call Activities.
+'''
+
+import unittest
+
+from Process.models import Process
+from Activities.models import ScriptTask, CallActivity, SubProcess
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, EndEvent, SequenceFlow, Message, MessageEventDefinition
+from Engine.engine import Engine
+
+def child_process():
+    s = StartEvent('cs'); t = ScriptTask('ct', script='y = 42'); e = EndEvent('ce')
+    return Process('child', flowElements=[s, t, e, SequenceFlow('cf1', s, t), SequenceFlow('cf2', t, e)])
+    
+def calling_process(child):
+    s = StartEvent('s'); call = CallActivity('call', calledElementRef=child); e = EndEvent('e')
+    return Process('p', flowElements=[s, call, e, SequenceFlow('f1', s, call), SequenceFlow('f2', call, e)])
+    
+class SubProcessTest(unittest.TestCase):
+    
+    def test_subprocess_runs_in_a_frame_sharing_the_variables(self):
+        ss = StartEvent('ss'); t = ScriptTask('t', script='x = 1'); u = UserTask('u'); se = EndEvent('se')
+        sub = SubProcess('sub', flowElements=[ss, t, u, se, SequenceFlow('sf1', ss, t), SequenceFlow('sf2', t, u),
+                                              SequenceFlow('sf3', u, se)])
+        s = StartEvent('s'); e = EndEvent('e')
+        process = Process('p', flowElements=[s, sub, e, SequenceFlow('f1', s, sub), SequenceFlow('f2', sub, e)])
+        engine = Engine()
+        instance = engine.start(process)
+        self.assertEqual(len(instance.frames), 1)
+        frame = instance.frames[0]
+        self.assertEqual([frame.process.nodes[node].id for node in frame.tokens], ['u'])
+        self.assertEqual(instance.variables['x'], 1)
+        engine.complete(instance, 'u')
+        self.assertEqual(instance.state, 'Completed')
+        self.assertEqual(instance.frames, [])
+        
+    def test_call_activity_compiles_the_called_process_once(self):
+        child = child_process()
+        process = calling_process(child)
+        engine = Engine()
+        first, second = engine.start_many(process, [None, None])
+        self.assertEqual((first.state, second.state), ('Completed', 'Completed'))
+        compiled = engine.compile(process)
+        self.assertIs(compiled.children[compiled.node_index['call']], engine.compile(child))
+        self.assertNotIn('y', first.variables)
+        
+    def test_event_subprocess_is_started_by_its_message(self):
+        cancel = Message('m1', 'cancel')
+        es = StartEvent('es', eventDefinitions=[MessageEventDefinition('med', messageRef=cancel)]); ee = EndEvent('ee')
+        handler = SubProcess('esp', triggeredByEvent=True, flowElements=[es, ee, SequenceFlow('ef', es, ee)])
+        s = StartEvent('s'); u = UserTask('u'); e = EndEvent('e')
+        process = Process('p', flowElements=[s, u, e, handler, SequenceFlow('f1', s, u), SequenceFlow('f2', u, e)])
+        engine = Engine()
+        instance = engine.start(process)
+        self.assertTrue(engine.message(instance, cancel))
+        self.assertEqual(instance.state, 'Completed')
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Lifecycle of the human tasks and completion of their tokens.
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from Process.models import Process
+from Activities.models import SubProcess, ScriptTask
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, EndEvent, ParallelGateway, SequenceFlow, Message, MessageEventDefinition
+from Core.Common.models import TerminateEventDefinition
+from Core.Common.ErrorModels import TaskConflict
+from Engine.engine import Engine
+from Engine.tasks import TaskList
+from Engine.persistence import SQLiteTaskStore
+
+def review_process(request):
+    '''
+    Return a process waiting on a User Task u, whose non-interrupting Event Sub-Process opens a User Task r
+    for every request Message.
+    '''
+    ms = StartEvent('ms', isInterrupting=False, eventDefinitions=[MessageEventDefinition('md', messageRef=request)])
+    r = UserTask('r'); me = EndEvent('me')
+    handler = SubProcess('esp', triggeredByEvent=True, flowElements=[ms, r, me, SequenceFlow('k1', ms, r),
+                                                                      SequenceFlow('k2', r, me)])
+    s = StartEvent('s'); u = UserTask('u'); e = EndEvent('e')
+    return Process('p', flowElements=[s, u, e, handler, SequenceFlow('f1', s, u), SequenceFlow('f2', u, e)])
+    
+def racing_process():
+    '''
+    Return a process running the User Tasks u and v in parallel, u ending in a Terminate End Event.
+    '''
+    s = StartEvent('s'); g = ParallelGateway('g'); u = UserTask('u'); v = UserTask('v'); e = EndEvent('e')
+    t = EndEvent('t', eventDefinitions=[TerminateEventDefinition('td')])
+    return Process('p', flowElements=[s, g, u, v, t, e, SequenceFlow('f1', s, g), SequenceFlow('f2', g, u),
+                                      SequenceFlow('f3', g, v), SequenceFlow('f4', u, t), SequenceFlow('f5', v, e)])
+    
+def task(tasklist, name, scope=None):
+    return [task for task in tasklist.worklist() if task.name == name and (scope is None or task.scope is scope)][0]
+    
+class TaskListTest(unittest.TestCase):
+    
+    def test_claim_and_complete(self):
+        engine = Engine()
+        tasklist = TaskList(engine)
+        instance = engine.start(racing_process())
+        v = task(tasklist, 'v')
+        v = tasklist.claim(v.id, 'ann', v.version)
+        self.assertEqual((v.state, v.owner, v.version), ('Reserved', 'ann', 2))
+        self.assertEqual(tasklist.worklist('ann'), [v])
+        self.assertRaises(TaskConflict, tasklist.complete, v.id, 'bob', v.version)
+        v = tasklist.complete(v.id, 'ann', v.version, {'ok': True})
+        self.assertEqual(v.state, 'Completed')
+        self.assertEqual(instance.variables['ok'], True)
+        self.assertNotIn(v.id, tasklist.tasks)
+        
+    def test_stale_version_is_refused(self):
+        engine = Engine()
+        tasklist = TaskList(engine)
+        engine.start(racing_process())
+        u = task(tasklist, 'u')
+        tasklist.claim(u.id, 'ann', 1)
+        self.assertRaises(TaskConflict, tasklist.claim, u.id, 'bob', 1)
+        self.assertEqual(task(tasklist, 'u').owner, 'ann')
+        
+    def test_completion_resumes_the_token_of_its_own_frame(self):
+        request = Message('req', 'Request')
+        engine = Engine()
+        tasklist = TaskList(engine)
+        instance = engine.start(review_process(request))
+        engine.message(instance, request)
+        engine.message(instance, request)
+        first, second = instance.frames
+        tasklist.complete(task(tasklist, 'r', second).id, 'ann', 1)
+        self.assertEqual(instance.frames, [first])
+        self.assertEqual([first.process.nodes[node].id for node in first.tokens], ['r'])
+        self.assertEqual(task(tasklist, 'r', first).state, 'Ready')
+        
+    def test_task_cancelled_by_the_batch_is_exited(self):
+        engine = Engine()
+        tasklist = TaskList(engine)
+        instance = engine.start(racing_process())
+        u, v = task(tasklist, 'u'), task(tasklist, 'v')
+        results = tasklist.complete_many('ann', [(u.id, 1, None), (v.id, 1, None)])
+        self.assertIs(results[0], u)
+        self.assertIsInstance(results[1], TaskConflict)
+        self.assertEqual(instance.state, 'Terminated')
+        self.assertEqual((u.state, v.state), ('Completed', 'Exited'))
+        self.assertEqual(tasklist.store.load(v.id)[3], 'Exited')
+        
+    def test_tasks_of_an_ended_instance_are_exited(self):
+        engine = Engine()
+        tasklist = TaskList(engine)
+        instance = engine.start(racing_process())
+        u, v = task(tasklist, 'u'), task(tasklist, 'v')
+        tasklist.complete(u.id, 'ann', 1)
+        self.assertEqual(instance.state, 'Terminated')
+        self.assertEqual(tasklist.worklist(), [])
+        self.assertEqual((v.state, tasklist.store.load(v.id)[3]), ('Exited', 'Exited'))
+        self.assertEqual(tasklist.instances, {})
+        
+    def test_failed_resumption_restores_the_task(self):
+        s = StartEvent('s'); u = UserTask('u'); t = ScriptTask('t', script='raise ValueError()'); e = EndEvent('e')
+        process = Process('p', flowElements=[s, u, t, e, SequenceFlow('f1', s, u), SequenceFlow('f2', u, t),
+                                             SequenceFlow('f3', t, e)])
+        engine = Engine()
+        tasklist = TaskList(engine)
+        engine.start(process)
+        u = tasklist.claim(task(tasklist, 'u').id, 'ann', 1)
+        self.assertRaises(ValueError, tasklist.complete, u.id, 'ann', u.version)
+        self.assertEqual(tasklist.worklist(), [u])
+        self.assertEqual((u.state, u.owner, u.version), ('Reserved', 'ann', 4))
+        self.assertEqual(tasklist.store.load(u.id)[3:], ('Reserved', 'ann', 4))
+        
+class SharedStoreTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        
+    def test_engines_sharing_a_store_get_distinct_ids(self):
+        path = os.path.join(self.directory, 'tasks.db')
+        stores = [SQLiteTaskStore(path), SQLiteTaskStore(path)]
+        tasklists = []
+        for store in stores:
+            engine = Engine()
+            tasklists.append(TaskList(engine, store))
+            engine.start(racing_process())
+        ids = [sorted(task.id for task in tasklist.worklist()) for tasklist in tasklists]
+        self.assertEqual(ids, [[1, 2], [3, 4]])
+        first = task(tasklists[0], 'v')
+        tasklists[0].claim(first.id, 'ann', first.version)
+        self.assertEqual(stores[1].load(first.id)[3:5], ('Reserved', 'ann'))
+        for store in stores:
+            store.close()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Record and replay of the instances.
+'''
+
+import unittest
+from io import BytesIO
+from random import Random
+
+from Process.models import Process
+from Activities.models import ServiceTask, BusinessRuleTask, ReceiveTask, SubProcess
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, EndEvent, BoundaryEvent, ParallelGateway, SequenceFlow, Message, Error
+from Core.Common.models import ErrorEventDefinition, MessageEventDefinition
+from Core.Common.ErrorModels import ThrownError
+from Core.Service.models import Operation
+from Engine.engine import Engine
+from Engine.services import StubAdapter
+from Engine.tasks import TaskList
+from Engine.trace import TraceRecorder, read_trace, replay, START, COMPLETE, MESSAGE, OUTCOME, INVOKE
+
+class Quoting(object):
+    '''
+    A process whose quote service and scoring rule answer at random : a scoring below 0.3 raises an Error
+    ending the instance, else the instance waits on a User Task u then on an update Message.
+    '''
+    def __init__(self):
+        self.random = Random(7)
+        self.update = Message('upd', 'Update')
+        self.operation = Operation('op', 'quote', Message('q', 'q'))
+        bad = Error('eb', 'Bad', 'BAD')
+        s = StartEvent('s'); t = ServiceTask('t', operationRef=self.operation); r = BusinessRuleTask('r', implementation='score')
+        u = UserTask('u'); w = ReceiveTask('w', None, messageRef=self.update); e = EndEvent('e')
+        b = BoundaryEvent('b', r, eventDefinitions=[ErrorEventDefinition('ed', errorRef=bad)]); be = EndEvent('be')
+        self.process = Process('p', flowElements=[s, t, r, u, w, e, b, be, SequenceFlow('f1', s, t), SequenceFlow('f2', t, r),
+                                                  SequenceFlow('f3', r, u), SequenceFlow('f4', u, w), SequenceFlow('f5', w, e),
+                                                  SequenceFlow('f6', b, be)])
+        
+    def quote(self, payload):
+        return {'price': self.random.random()}
+        
+    def score(self, inputs):
+        if inputs['price'] < 0.3:
+            raise ThrownError('BAD')
+        return {'score': self.random.randint(0, 100)}
+        
+    def engine(self):
+        engine = Engine()
+        engine.services.bind(self.operation, StubAdapter({'quote': self.quote}))
+        engine.rules['score'] = self.score
+        return engine
+        
+def states(instances):
+    return [(instance.state, instance.dump()) for instance in instances]
+    
+class TraceTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.quoting = Quoting()
+        engine = self.quoting.engine()
+        tasks = TaskList(engine)
+        self.recorder = TraceRecorder(engine=engine, batch=16)
+        self.instances = engine.start_many(self.quoting.process, [{'amount': i} for i in range(20)])
+        for task in tasks.ready()[:10]:
+            tasks.complete(task.id, 'bob', task.version, {'ok': self.quoting.random.random()})
+        engine.message_many([(instance, self.quoting.update, {'n': 1}) for instance in self.instances[:5]])
+        self.trace = self.recorder.getvalue()
+        
+    def test_records_the_inputs_of_the_instances(self):
+        records = list(read_trace(BytesIO(self.trace)))
+        self.assertEqual(len(records), self.recorder.records)
+        kinds = set(kind for kind, instance_id, payload in records)
+        self.assertEqual(kinds, set([START, COMPLETE, MESSAGE, OUTCOME, INVOKE]))
+        
+    def test_replay_goes_through_the_same_states(self):
+        engine = replay(BytesIO(self.trace), [self.quoting.process])
+        self.assertEqual(states(engine.replayed[instance.id] for instance in self.instances), states(self.instances))
+        self.assertIn('Completed', [instance.state for instance in self.instances])
+        
+    def test_replay_of_one_instance(self):
+        instance = self.instances[3]
+        engine = replay(BytesIO(self.trace), [self.quoting.process], instance_id=instance.id)
+        self.assertEqual(engine.replayed.keys(), [instance.id])
+        self.assertEqual(states(engine.replayed.values()), states([instance]))
+        
+    def test_replay_until_a_record(self):
+        engine = replay(BytesIO(self.trace), [self.quoting.process], until=1)
+        self.assertEqual(len(engine.replayed), 1)
+        
+    def test_task_of_a_frame_is_replayed_in_the_same_frame(self):
+        request = Message('req', 'Request')
+        ms = StartEvent('ms', isInterrupting=False, eventDefinitions=[MessageEventDefinition('md', messageRef=request)])
+        g = ParallelGateway('g'); r = UserTask('r'); v = UserTask('v'); j = ParallelGateway('j'); me = EndEvent('me')
+        handler = SubProcess('esp', triggeredByEvent=True, flowElements=[ms, g, r, v, j, me, SequenceFlow('k1', ms, g),
+                                                                          SequenceFlow('k2', g, r), SequenceFlow('k3', g, v),
+                                                                          SequenceFlow('k4', r, j), SequenceFlow('k5', v, j),
+                                                                          SequenceFlow('k6', j, me)])
+        s = StartEvent('s'); u = UserTask('u'); e = EndEvent('e')
+        process = Process('p', flowElements=[s, u, e, handler, SequenceFlow('f1', s, u), SequenceFlow('f2', u, e)])
+        engine = Engine()
+        tasks = TaskList(engine)
+        recorder = TraceRecorder(engine=engine)
+        instance = engine.start(process, {'x': 0})
+        engine.message(instance, request, {'x': 1})
+        engine.message(instance, request, {'x': 2})
+        first, second = instance.frames
+        for task in tasks.ready():
+            if (task.scope, task.name) in ((first, 'v'), (second, 'r')):
+                tasks.complete(task.id, 'ann', task.version)
+        replayed = replay(BytesIO(recorder.getvalue()), [process]).replayed[instance.id]
+        self.assertEqual(replayed.dump(), instance.dump())
+        self.assertEqual([[frame.process.nodes[node].id for node in frame.tokens] for frame in replayed.frames],
+                         [['r', 'j'], ['v', 'j']])
+        
+    def test_payloads_modified_by_the_caller_are_replayed_as_recorded(self):
+        s = StartEvent('s'); u = UserTask('u'); e = EndEvent('e')
+        process = Process('p', flowElements=[s, u, e, SequenceFlow('f1', s, u), SequenceFlow('f2', u, e)])
+        engine = Engine()
+        recorder = TraceRecorder(engine=engine)
+        variables = {'x': 0}
+        instance = engine.start(process, variables)
+        variables['x'] = 1
+        outputs = {'y': 0}
+        engine.complete(instance, 'u', outputs)
+        outputs['y'] = 1
+        replayed = replay(BytesIO(recorder.getvalue()), [process]).replayed[instance.id]
+        self.assertEqual(states([replayed]), states([instance]))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+# The MIT License (MIT)
+
+# Copyright (c) 2014 Roland Bettinelli
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'''
+BPMN Package - tests
+
+Slot layout of the instance variables.
+'''
+
+import unittest
+from array import array
+
+from Process.models import Process
+from HumanInteraction.models import UserTask
+from Core.Common.models import StartEvent, SequenceFlow, ItemDefinition
+from Data.models import Property
+from Engine.engine import Engine
+from Engine.variables import VariableLayout, Collection
+
+def declaring(*properties):
+    s = StartEvent('s'); w = UserTask('w')
+    return Process('p', properties=list(properties), flowElements=[s, w, SequenceFlow('f', s, w)])
+    
+class VariablesTest(unittest.TestCase):
+    
+    def test_declared_variables_get_slots(self):
+        process = declaring(Property('pa', 'amount'), Property('pb', 'label'))
+        engine = Engine()
+        instance = engine.start(process, {'amount': 5, 'other': 1})
+        layout = engine.compile(process).layout
+        self.assertEqual(layout.names, ['amount', 'label'])
+        self.assertIs(instance.variables.layout, layout)
+        self.assertEqual(instance.variables.values, [5, None])
+        self.assertEqual(instance.variables.extra, {'other': 1})
+        self.assertEqual(instance.variables.dump(), ([5, None], {'other': 1}))
+        
+    def test_typed_defaults(self):
+        layout = VariableLayout()
+        layout.add('count', ItemDefinition('i1', structureRef=int))
+        layout.add('count', ItemDefinition('i2', structureRef=str))
+        self.assertEqual(len(layout), 1)
+        self.assertEqual(layout.new()['count'], 0)
+        
+    def test_collections_are_allocated_on_first_access(self):
+        layout = VariableLayout()
+        slot = layout.add('scores', ItemDefinition('i', isCollection=True, structureRef=float))
+        first, second = layout.new(), layout.new()
+        self.assertIs(first.values[slot].__class__, Collection)
+        scores = first['scores']
+        self.assertIsInstance(scores, array)
+        self.assertEqual(scores.typecode, 'd')
+        self.assertIs(first['scores'], scores)
+        self.assertIs(second.values[slot].__class__, Collection)
+        self.assertEqual(second.dump(), ([None], None))
+        
+    def test_mapping_interface(self):
+        variables = VariableLayout().new({'a': 1})
+        variables['b'] = 2
+        self.assertEqual(sorted(variables.items()), [('a', 1), ('b', 2)])
+        self.assertIn('a', variables)
+        del variables['a']
+        self.assertNotIn('a', variables)
+        self.assertEqual(variables.get('a', 0), 0)
+        
+    def test_collections_of_integers_and_booleans_are_lists(self):
+        layout = VariableLayout()
+        layout.add('ids', ItemDefinition('i1', isCollection=True, structureRef=int))
+        layout.add('flags', ItemDefinition('i2', isCollection=True, structureRef=bool))
+        variables = layout.new()
+        variables['ids'].append(2**70)
+        variables['flags'].append(True)
+        self.assertEqual(variables['ids'], [2**70])
+        self.assertIs(variables['flags'][0], True)
+        
+    def test_items_allocate_the_collections(self):
+        layout = VariableLayout()
+        layout.add('scores', ItemDefinition('i', isCollection=True, structureRef=float))
+        variables = layout.new()
+        (name, scores), = variables.items()
+        self.assertEqual((name, scores.tolist()), ('scores', []))
+        self.assertIs(variables['scores'], scores)